@@ -0,0 +1,195 @@
+"""Admission control: per-class concurrency limits and request body caps.
+
+Requests fall into three classes: uploads (multipart bodies, e.g. proposals
+with files or bulk imports), writes (any other non-GET) and reads. Each
+class has its own concurrency limit and a bounded wait queue, so a burst of
+large uploads cannot take the memory, threads and database connections
+that catalog reads need. A request that finds the queue full, or waits
+longer than ADMISSION_QUEUE_TIMEOUT, gets an immediate 503 with
+Retry-After.
+
+Bodies over the class's limit get a 413. Requests declaring a larger
+Content-Length are refused before the body is read. Chunked bodies are
+counted as they stream in.
+"""
+import asyncio
+import math
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+from . import config
+from .metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTIONS
+
+UPLOADS, WRITES, READS = "uploads", "writes", "reads"
+
+# Never queued or rejected, so health checks and scrapes see the real state
+EXEMPT_PATHS = ("/scholarships/health", "/metrics")
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str):
+        self.reason = reason
+
+
+class BodyTooLarge(HTTPException):
+    """Raised from receive(); FastAPI lets HTTPExceptions from body parsing through."""
+
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=f"Request body exceeds {limit} bytes.")
+
+
+class Gate:
+    """At most `limit` requests at once and `queue` waiting, each waiting at most `timeout`."""
+
+    def __init__(self, name: str, limit: int, queue: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.active = 0
+        # Futures are created on the running loop, so a Gate is not tied to one
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self._enter()
+            return
+        if len(self._waiters) >= self.queue:
+            raise Rejected("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        ADMISSION_QUEUE_DEPTH.labels(self.name).set(len(self._waiters))
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.timeout)
+        except BaseException as e:
+            # Timed out, or the client went away
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended; pass it on
+                self.release()
+            else:
+                waiter.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                raise Rejected("timeout")
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            ADMISSION_QUEUE_DEPTH.labels(self.name).set(len(self._waiters))
+
+    def _enter(self):
+        self.active += 1
+        ADMISSION_IN_FLIGHT.labels(self.name).set(self.active)
+
+    def release(self):
+        self.active -= 1
+        # Hand the slot straight to the oldest waiter
+        while self._waiters and self.active < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._enter()
+                waiter.set_result(None)
+        ADMISSION_IN_FLIGHT.labels(self.name).set(self.active)
+
+
+@dataclass
+class Policy:
+    gate: Gate
+    max_body: int
+
+
+def request_class(scope) -> str:
+    if scope["method"] in ("GET", "HEAD", "OPTIONS"):
+        return READS
+    headers = dict(scope["headers"])
+    if headers.get(b"content-type", b"").startswith(b"multipart/"):
+        return UPLOADS
+    return WRITES
+
+
+def policies(settings: config.Settings) -> Dict[str, Policy]:
+    timeout = settings.admission_queue_timeout
+    return {
+        UPLOADS: Policy(
+            Gate(UPLOADS, settings.admission_uploads_limit, settings.admission_uploads_queue, timeout),
+            settings.admission_upload_body_limit,
+        ),
+        WRITES: Policy(
+            Gate(WRITES, settings.admission_writes_limit, settings.admission_writes_queue, timeout),
+            settings.admission_body_limit,
+        ),
+        READS: Policy(
+            Gate(READS, settings.admission_reads_limit, settings.admission_reads_queue, timeout),
+            settings.admission_body_limit,
+        ),
+    }
+
+
+class AdmissionMiddleware:
+    """Limits concurrent requests per class and caps request bodies."""
+
+    def __init__(self, app, settings: Optional[config.Settings] = None):
+        self.app = app
+        self.settings = settings or config.get_settings()
+        self.policies = policies(self.settings)
+        self.retry_after = str(max(1, math.ceil(self.settings.admission_queue_timeout)))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        name = request_class(scope)
+        policy = self.policies[name]
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > policy.max_body:
+            ADMISSION_REJECTIONS.labels(name, "body_too_large").inc()
+            await self.reject(scope, receive, send, 413, f"Request body exceeds {policy.max_body} bytes.")
+            return
+
+        try:
+            await policy.gate.acquire()
+        except Rejected as e:
+            ADMISSION_REJECTIONS.labels(name, e.reason).inc()
+            await self.reject(
+                scope, receive, send, 503, "Server busy, retry later.", {"Retry-After": self.retry_after}
+            )
+            return
+
+        received = 0
+        started = False
+
+        async def capped_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > policy.max_body:
+                    ADMISSION_REJECTIONS.labels(name, "body_too_large").inc()
+                    raise BodyTooLarge(policy.max_body)
+            return message
+
+        async def tracking_send(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, capped_receive, tracking_send)
+        except BodyTooLarge as e:
+            # Read outside FastAPI's request handling (e.g. by a middleware)
+            if started:
+                raise
+            await self.reject(scope, receive, send, 413, e.detail)
+        finally:
+            policy.gate.release()
+
+    async def reject(self, scope, receive, send, status: int, detail: str, headers: Optional[dict] = None):
+        response = JSONResponse({"detail": detail}, status_code=status, headers=headers)
+        await response(scope, receive, send)
@@ -0,0 +1,297 @@
+"""Bulk import of scholarship proposals from a manifest plus a ZIP of files.
+
+Used by POST /scholarships/proposals/import and runnable offline:
+
+    python -m app.bulk_import manifest.ndjson --files edicts.zip [--dry-run]
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import zipfile
+from typing import IO, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import orjson
+from pydantic import ValidationError
+from sqlmodel import Session, select
+
+from . import config, hooks, models, providers, schemas, uploads
+from . import jury as jury_dashboards
+
+# Rows inserted per transaction
+IMPORT_CHUNK_SIZE = 100
+# Concurrent uploads to the object store
+UPLOAD_CONCURRENCY = 8
+
+# Sync uploaders run in a worker thread, async ones are awaited directly
+Uploader = Callable[[str, bytes], Union[str, Awaitable[str]]]
+
+
+def s3_uploader(aws: providers.Providers, bucket: str) -> Uploader:
+    """Upload bytes under `key` and return a presigned URL, like save_file/get_file_url."""
+
+    async def upload(key: str, content: bytes) -> str:
+        await aws.s3_async.put_object(Bucket=bucket, Key=key, Body=content)
+        return aws.s3.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": bucket, "Key": key},
+            ExpiresIn=100000,
+        )
+
+    return upload
+
+
+def parse_manifest(content: bytes, filename: str) -> List[dict]:
+    if filename.lower().endswith(".csv"):
+        reader = csv.DictReader(io.StringIO(content.decode("utf-8-sig")))
+        # Empty CSV cells mean "not provided"
+        return [{k: v for k, v in row.items() if v not in (None, "")} for row in reader]
+    return [orjson.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def validate_rows(
+    raw_rows: List[dict], archive: Optional[zipfile.ZipFile]
+) -> Tuple[Dict[int, schemas.ProposalImportRow], Dict[int, List[str]]]:
+    """Validate every row and every referenced file before anything is written."""
+    names = set(archive.namelist()) if archive else set()
+    valid: Dict[int, schemas.ProposalImportRow] = {}
+    errors: Dict[int, List[str]] = {}
+
+    for index, raw in enumerate(raw_rows, start=1):
+        try:
+            row = schemas.ProposalImportRow.model_validate(raw)
+        except ValidationError as e:
+            errors[index] = [
+                f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}"
+                for err in e.errors()
+            ]
+            continue
+
+        row_errors = []
+        if row.edict not in names:
+            row_errors.append(f"edict: file '{row.edict}' not found in archive")
+        for document in row.documents:
+            if document.template and not document.file:
+                row_errors.append(f"documents: template '{document.name}' has no file")
+            elif document.file and document.file not in names:
+                row_errors.append(f"documents: file '{document.file}' not found in archive")
+        if row_errors:
+            errors[index] = row_errors
+        else:
+            valid[index] = row
+    return valid, errors
+
+
+def resolve_areas(db: Session, names: Iterable[str]) -> Dict[str, models.ScientificArea]:
+    """Fetch existing scientific areas by name in one query and create the missing ones."""
+    names = set(names)
+    if not names:
+        return {}
+    areas = {
+        area.name: area
+        for area in db.exec(
+            select(models.ScientificArea).where(models.ScientificArea.name.in_(names))
+        ).all()
+    }
+    for name in names - areas.keys():
+        areas[name] = models.ScientificArea(name=name)
+        db.add(areas[name])
+    db.flush()
+    return areas
+
+
+def resolve_jury(db: Session, jurors: Iterable[schemas.JuryRead]) -> Dict[str, models.Jury]:
+    """Fetch existing jurors by id in one query and create the missing ones."""
+    wanted = {juror.id: juror.name for juror in jurors}
+    if not wanted:
+        return {}
+    jury = {
+        juror.id: juror
+        for juror in db.exec(select(models.Jury).where(models.Jury.id.in_(wanted))).all()
+    }
+    for jury_id in wanted.keys() - jury.keys():
+        jury[jury_id] = models.Jury(id=jury_id, name=wanted[jury_id])
+        db.add(jury[jury_id])
+    db.flush()
+    return jury
+
+
+async def upload_files(
+    archive: zipfile.ZipFile, names: Set[str], upload: Uploader
+) -> Dict[str, str]:
+    """Upload archive members concurrently; returns file name -> URL (None on failure)."""
+    semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+    async def upload_one(name: str) -> Tuple[str, Optional[str]]:
+        async with semaphore:
+            content = archive.read(name)
+            # Unique keys: a/edict.pdf and b/edict.pdf must not overwrite each other
+            key = uploads.new_key(name)
+            try:
+                if asyncio.iscoroutinefunction(upload):
+                    return name, await upload(key, content)
+                return name, await asyncio.to_thread(upload, key, content)
+            except Exception as e:
+                print(f"Error uploading {name}: {str(e)}")
+                return name, None
+
+    return dict(await asyncio.gather(*(upload_one(name) for name in sorted(names))))
+
+
+def row_files(row: schemas.ProposalImportRow) -> Set[str]:
+    files = {row.edict}
+    files.update(
+        document.file for document in row.documents if document.template and document.file
+    )
+    return files
+
+
+def insert_rows(
+    db: Session, rows: Dict[int, schemas.ProposalImportRow], urls: Dict[str, str]
+) -> Dict[int, schemas.ImportRowResult]:
+    results: Dict[int, schemas.ImportRowResult] = {}
+    indexes = sorted(rows)
+
+    for start in range(0, len(indexes), IMPORT_CHUNK_SIZE):
+        chunk = indexes[start:start + IMPORT_CHUNK_SIZE]
+        try:
+            areas = resolve_areas(
+                db, (area for i in chunk for area in rows[i].scientific_areas)
+            )
+            jury = resolve_jury(db, (juror for i in chunk for juror in rows[i].jury))
+
+            created = {}
+            for index in chunk:
+                row = rows[index]
+                edict = models.Edict(
+                    name=os.path.splitext(os.path.basename(row.edict))[0],
+                    file_path=urls[row.edict],
+                )
+                scholarship = models.Scholarship(
+                    name=row.name,
+                    description=row.description,
+                    publisher=row.publisher,
+                    type=row.type,
+                    spots=row.spots,
+                    deadline=row.deadline,
+                    status=models.ScholarshipStatus.under_review,
+                    edict=edict,
+                    scientific_areas=[areas[name] for name in dict.fromkeys(row.scientific_areas)],
+                    jury=[jury[juror.id] for juror in {j.id: j for j in row.jury}.values()],
+                    documents=[
+                        models.DocumentTemplate(
+                            name=document.name,
+                            file_path=urls.get(document.file, "") if document.template else "",
+                            required=document.required,
+                            template=document.template,
+                        )
+                        for document in row.documents
+                    ],
+                )
+                db.add(scholarship)
+                created[index] = scholarship
+            # Read the generated ids before commit expires the instances
+            db.flush()
+            created_ids = {index: scholarship.id for index, scholarship in created.items()}
+            jury_dashboards.publish(db, jury)
+            db.commit()
+
+            for index, scholarship_id in created_ids.items():
+                results[index] = schemas.ImportRowResult(
+                    row=index, status="created", scholarship_id=scholarship_id
+                )
+        except Exception as e:
+            db.rollback()
+            for index in chunk:
+                results[index] = schemas.ImportRowResult(
+                    row=index, status="failed", errors=[f"Error inserting chunk: {str(e)}"]
+                )
+    return results
+
+
+async def import_proposals(
+    db: Session,
+    manifest: bytes,
+    manifest_name: str,
+    archive_file: Optional[IO[bytes]],
+    upload: Uploader,
+    dry_run: bool = False,
+) -> schemas.ImportReport:
+    try:
+        raw_rows = parse_manifest(manifest, manifest_name)
+    except (ValueError, csv.Error) as e:
+        raise ValueError(f"Invalid manifest: {str(e)}")
+
+    try:
+        archive = zipfile.ZipFile(archive_file) if archive_file else None
+    except zipfile.BadZipFile:
+        raise ValueError("Invalid archive: not a ZIP file")
+
+    valid, errors = validate_rows(raw_rows, archive)
+    results = {
+        index: schemas.ImportRowResult(row=index, status="invalid", errors=row_errors)
+        for index, row_errors in errors.items()
+    }
+
+    if dry_run:
+        for index in valid:
+            results[index] = schemas.ImportRowResult(row=index, status="valid")
+    elif valid:
+        names = set().union(*(row_files(row) for row in valid.values()))
+        urls = await upload_files(archive, names, upload)
+
+        for index, row in list(valid.items()):
+            failed_uploads = sorted(name for name in row_files(row) if urls[name] is None)
+            if failed_uploads:
+                del valid[index]
+                results[index] = schemas.ImportRowResult(
+                    row=index,
+                    status="failed",
+                    errors=[f"Error uploading file '{name}'" for name in failed_uploads],
+                )
+        # The inserts are blocking; keep the event loop free for other requests
+        results.update(await asyncio.to_thread(insert_rows, db, valid, urls))
+
+    rows = [results[index] for index in sorted(results)]
+    return schemas.ImportReport(
+        created=sum(1 for r in rows if r.status == "created"),
+        failed=sum(1 for r in rows if r.status in ("invalid", "failed")),
+        rows=rows,
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    from .database import engine
+
+    parser = argparse.ArgumentParser(description="Bulk import scholarship proposals")
+    parser.add_argument("manifest", help="NDJSON or CSV manifest")
+    parser.add_argument("--files", help="ZIP with the edicts and document templates")
+    parser.add_argument("--dry-run", action="store_true", help="Only validate the manifest")
+    args = parser.parse_args(argv)
+
+    hooks.install()
+    settings = config.get_settings()
+    upload = s3_uploader(providers.from_settings(settings), settings.s3_bucket_name)
+
+    with open(args.manifest, "rb") as f:
+        manifest = f.read()
+    archive_file = open(args.files, "rb") if args.files else None
+    try:
+        with Session(engine) as db:
+            report = asyncio.run(
+                import_proposals(
+                    db, manifest, args.manifest, archive_file, upload, args.dry_run
+                )
+            )
+    finally:
+        if archive_file:
+            archive_file.close()
+
+    print(json.dumps(report.model_dump(), indent=2))
+    return 0 if report.failed == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
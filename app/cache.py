@@ -0,0 +1,76 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe in-process cache whose entries expire after `ttl` seconds.
+
+    `generation` goes up on every invalidation. A value computed from data
+    read before an invalidation is stale; set() drops it when given the
+    generation read before computing it.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.generation = 0
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            return value
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if len(self._entries) >= self.maxsize and key not in self._entries:
+                self._evict()
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            generation = self.generation
+            value = factory()
+            self.set(key, value, generation)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one entry, or every entry when no key is given."""
+        with self._lock:
+            self.generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]):
+        """Drop every entry whose key matches `predicate`."""
+        with self._lock:
+            self.generation += 1
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def _evict(self):
+        now = time.monotonic()
+        expired = [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        if len(self._entries) >= self.maxsize:
+            # Still full: drop the entry closest to expiring
+            del self._entries[min(self._entries, key=lambda k: self._entries[k][0])]
+
+    def __len__(self) -> int:
+        return len(self._entries)
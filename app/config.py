@@ -0,0 +1,198 @@
+import os
+from dataclasses import dataclass
+from typing import Tuple
+from functools import lru_cache
+
+
+def _flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Service configuration, read from the environment by from_env()."""
+
+    database_url: str
+    queue_url: str
+    s3_bucket_name: str
+    secret_key: str
+    region: str
+    user_pool_id: str
+    frontend_url: str
+    application_files_dir: str = "application_files"
+    edict_files_dir: str = "edict_files"
+    # "aws" for the real services, "memory" for in-process fakes (tests, benchmarks)
+    aws_provider: str = "aws"
+    # Run the deadline job in this process; off in tests and benchmarks
+    scheduler_enabled: bool = True
+    # Size of the AWS thread pool and of each botocore connection pool
+    aws_max_pool_connections: int = 50
+    # Attempts per AWS call (adaptive retry mode) and timeouts in seconds
+    aws_max_attempts: int = 5
+    aws_connect_timeout: float = 5.0
+    aws_read_timeout: float = 30.0
+    # Direct-to-S3 uploads: largest file accepted, accepted content types and
+    # lifetime of the presigned POST
+    upload_max_bytes: int = 20 * 1024 * 1024
+    upload_content_types: Tuple[str, ...] = (
+        "application/pdf",
+        "application/msword",
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        "application/vnd.oasis.opendocument.text",
+    )
+    upload_url_ttl: int = 900
+    # Admission control: concurrent requests and queued requests per class,
+    # the longest a request waits for a slot, and request body caps
+    admission_enabled: bool = True
+    admission_uploads_limit: int = 4
+    admission_uploads_queue: int = 16
+    admission_writes_limit: int = 8
+    admission_writes_queue: int = 32
+    admission_reads_limit: int = 32
+    admission_reads_queue: int = 256
+    admission_queue_timeout: float = 5.0
+    admission_upload_body_limit: int = 100 * 1024 * 1024
+    admission_body_limit: int = 1024 * 1024
+    # Where scholarship_reviewed events go; not sent when empty
+    review_queue_url: str = ""
+    # Results consumer (python -m app.worker)
+    results_queue_url: str = ""
+    dead_letter_queue_url: str = ""
+    worker_concurrency: int = 10
+    worker_visibility_timeout: int = 60
+    worker_max_receives: int = 5
+    worker_wait_time: int = 20
+    worker_metrics_port: int = 0
+    # Seconds between full rebuilds of the statistics summary table
+    stats_recompute_interval: int = 3600
+    # Seconds a juror's dashboard is cached for
+    jury_dashboard_ttl: float = 30.0
+    # Seconds the Cognito jury group listing is cached for
+    jury_members_ttl: float = 300.0
+    # Seconds an encoded /scholarships/{id}/details response is cached for
+    detail_cache_ttl: float = 60.0
+    # Seconds a request waits for an identical one in flight before running itself
+    coalesce_timeout: float = 5.0
+    # LISTEN for other replicas' cache invalidations (PostgreSQL only), and
+    # the longest a cache may lag behind them while the listener is down
+    invalidation_listener: bool = True
+    cache_max_staleness: float = 30.0
+    # Text extraction from edicts and document templates (app/extraction.py):
+    # worker processes, seconds between scheduler runs, files per run,
+    # attempts before giving up, first retry delay (doubled on each attempt),
+    # seconds allowed per file and characters kept per file
+    extraction_enabled: bool = True
+    extraction_processes: int = 2
+    extraction_interval: int = 15
+    extraction_batch_size: int = 10
+    extraction_max_attempts: int = 5
+    extraction_retry_delay: float = 30.0
+    extraction_timeout: float = 120.0
+    extraction_max_chars: int = 1_000_000
+    # Idempotency-Key support: seconds a duplicate waits for the first request,
+    # before a claim whose request died is taken over, and before keys expire
+    idempotency_wait_timeout: float = 30.0
+    idempotency_lock_timeout: float = 300.0
+    idempotency_ttl: int = 86400
+    # Background jobs (app/jobs.py): worker threads per process, seconds
+    # between polls for jobs queued by other replicas, seconds before a
+    # running job is assumed lost, first retry delay (doubled on each attempt)
+    # and seconds finished jobs are kept
+    jobs_enabled: bool = True
+    jobs_workers: int = 2
+    jobs_poll_interval: float = 1.0
+    jobs_visibility_timeout: float = 60.0
+    jobs_retry_delay: float = 5.0
+    jobs_retention: int = 7 * 86400
+    # Optional startup warm-ups, so the first requests of a new replica do not
+    # pay for fetching the JWKS or listing the jury group
+    warm_jwks: bool = False
+    warm_jury_cache: bool = False
+    warm_up_timeout: float = 5.0
+
+    @property
+    def cognito_keys_url(self) -> str:
+        return f"https://cognito-idp.{self.region}.amazonaws.com/{self.user_pool_id}/.well-known/jwks.json"
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            database_url=str(os.getenv("DATABASE_URL")),
+            queue_url=str(os.getenv("QUEUE_URL")),
+            s3_bucket_name=str(os.getenv("S3_BUCKET_NAME", "bolsua-storage-dev")),
+            secret_key=str(os.getenv("SECRET_KEY", "K%!MaoL26XQe8iGAAyDrmbkw&bqE$hCPw4hSk!Hf")),
+            region=str(os.getenv("REGION")),
+            user_pool_id=str(os.getenv("USER_POOL_ID")),
+            frontend_url=str(os.getenv("FRONTEND_URL")),
+            application_files_dir=os.getenv("APPLICATION_FILES_DIR", "application_files"),
+            edict_files_dir=os.getenv("EDICT_FILES_DIR", "edict_files"),
+            aws_provider=os.getenv("AWS_PROVIDER", "aws"),
+            scheduler_enabled=_flag("SCHEDULER_ENABLED", True),
+            aws_max_pool_connections=int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "50")),
+            aws_max_attempts=int(os.getenv("AWS_MAX_ATTEMPTS", "5")),
+            aws_connect_timeout=float(os.getenv("AWS_CONNECT_TIMEOUT", "5")),
+            aws_read_timeout=float(os.getenv("AWS_READ_TIMEOUT", "30")),
+            upload_max_bytes=int(os.getenv("UPLOAD_MAX_BYTES", str(cls.upload_max_bytes))),
+            upload_content_types=tuple(
+                content_type.strip()
+                for content_type in os.getenv("UPLOAD_CONTENT_TYPES", ",".join(cls.upload_content_types)).split(",")
+                if content_type.strip()
+            ),
+            upload_url_ttl=int(os.getenv("UPLOAD_URL_TTL", "900")),
+            admission_enabled=_flag("ADMISSION_ENABLED", True),
+            admission_uploads_limit=int(os.getenv("ADMISSION_UPLOADS_LIMIT", "4")),
+            admission_uploads_queue=int(os.getenv("ADMISSION_UPLOADS_QUEUE", "16")),
+            admission_writes_limit=int(os.getenv("ADMISSION_WRITES_LIMIT", "8")),
+            admission_writes_queue=int(os.getenv("ADMISSION_WRITES_QUEUE", "32")),
+            admission_reads_limit=int(os.getenv("ADMISSION_READS_LIMIT", "32")),
+            admission_reads_queue=int(os.getenv("ADMISSION_READS_QUEUE", "256")),
+            admission_queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5")),
+            admission_upload_body_limit=int(
+                os.getenv("ADMISSION_UPLOAD_BODY_LIMIT", str(cls.admission_upload_body_limit))
+            ),
+            admission_body_limit=int(os.getenv("ADMISSION_BODY_LIMIT", str(cls.admission_body_limit))),
+            review_queue_url=os.getenv("REVIEW_QUEUE_URL", ""),
+            results_queue_url=os.getenv("RESULTS_QUEUE_URL", ""),
+            dead_letter_queue_url=os.getenv("DEAD_LETTER_QUEUE_URL", ""),
+            worker_concurrency=int(os.getenv("WORKER_CONCURRENCY", "10")),
+            worker_visibility_timeout=int(os.getenv("WORKER_VISIBILITY_TIMEOUT", "60")),
+            worker_max_receives=int(os.getenv("WORKER_MAX_RECEIVES", "5")),
+            worker_wait_time=int(os.getenv("WORKER_WAIT_TIME", "20")),
+            worker_metrics_port=int(os.getenv("WORKER_METRICS_PORT", "0")),
+            stats_recompute_interval=int(os.getenv("STATS_RECOMPUTE_INTERVAL", "3600")),
+            jury_dashboard_ttl=float(os.getenv("JURY_DASHBOARD_TTL", "30")),
+            detail_cache_ttl=float(os.getenv("DETAIL_CACHE_TTL", "60")),
+            coalesce_timeout=float(os.getenv("COALESCE_TIMEOUT", "5")),
+            invalidation_listener=_flag("INVALIDATION_LISTENER", True),
+            cache_max_staleness=float(os.getenv("CACHE_MAX_STALENESS", "30")),
+            jury_members_ttl=float(os.getenv("JURY_MEMBERS_TTL", "300")),
+            extraction_enabled=_flag("EXTRACTION_ENABLED", True),
+            extraction_processes=int(os.getenv("EXTRACTION_PROCESSES", "2")),
+            extraction_interval=int(os.getenv("EXTRACTION_INTERVAL", "15")),
+            extraction_batch_size=int(os.getenv("EXTRACTION_BATCH_SIZE", "10")),
+            extraction_max_attempts=int(os.getenv("EXTRACTION_MAX_ATTEMPTS", "5")),
+            extraction_retry_delay=float(os.getenv("EXTRACTION_RETRY_DELAY", "30")),
+            extraction_timeout=float(os.getenv("EXTRACTION_TIMEOUT", "120")),
+            extraction_max_chars=int(os.getenv("EXTRACTION_MAX_CHARS", str(cls.extraction_max_chars))),
+            idempotency_wait_timeout=float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "30")),
+            idempotency_lock_timeout=float(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "300")),
+            idempotency_ttl=int(os.getenv("IDEMPOTENCY_TTL", "86400")),
+            jobs_enabled=_flag("JOBS_ENABLED", True),
+            jobs_workers=int(os.getenv("JOBS_WORKERS", "2")),
+            jobs_poll_interval=float(os.getenv("JOBS_POLL_INTERVAL", "1")),
+            jobs_visibility_timeout=float(os.getenv("JOBS_VISIBILITY_TIMEOUT", "60")),
+            jobs_retry_delay=float(os.getenv("JOBS_RETRY_DELAY", "5")),
+            jobs_retention=int(os.getenv("JOBS_RETENTION", str(cls.jobs_retention))),
+            warm_jwks=_flag("WARM_JWKS", False),
+            warm_jury_cache=_flag("WARM_JURY_CACHE", False),
+            warm_up_timeout=float(os.getenv("WARM_UP_TIMEOUT", "5")),
+        )
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """The process-wide settings, read from the environment once."""
+    return Settings.from_env()
@@ -1,6 +1,47 @@
 import os
-from sqlmodel import create_engine
+from functools import lru_cache
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateColumn
+from sqlmodel import SQLModel, create_engine
 
 DATABASE_URL = str(os.getenv("DATABASE_URL"))
 
-engine = create_engine(DATABASE_URL)
+
+@lru_cache(maxsize=None)
+def get_engine(database_url: str) -> Engine:
+    """One engine (and connection pool) per database URL and process."""
+    return create_engine(database_url)
+
+
+engine = get_engine(DATABASE_URL)
+
+
+def create_all(engine: Engine):
+    """Create missing tables, and missing columns and indexes on tables that already exist."""
+    SQLModel.metadata.create_all(engine)
+    add_missing_columns(engine)
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+def add_missing_columns(engine: Engine):
+    """ALTER TABLE ... ADD COLUMN for model columns the database lacks.
+
+    Only columns that are nullable or have a server default can be added to
+    a table with rows; others are reported and left alone.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    print(f"Cannot add column {table.name}.{column.name}: NOT NULL without a default")
+                    continue
+                spec = CreateColumn(column).compile(dialect=engine.dialect)
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {spec}")
+                print(f"Added column {table.name}.{column.name}")
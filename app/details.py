@@ -0,0 +1,115 @@
+"""Scholarship details: GET /scholarships/{id}/details and /scholarships/batch.
+
+Each scholarship is cached as encoded JSON for DETAIL_CACHE_TTL seconds, in
+the app's detail cache (app.state.detail_cache, keyed by scholarship id).
+create_app registers evict() for it on the invalidation bus. Changed
+scholarships are published on the bus, which drops them on every replica
+once the transaction commits:
+
+- status changes, through the transitions.on_transition hook;
+- ORM changes to scholarships and their documents, through after_flush;
+- anything else (e.g. links.sync), through mark().
+"""
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+
+from . import cache, invalidation, models, serialization, transitions
+
+# Largest number of ids accepted by /scholarships/batch
+BATCH_MAX_IDS = 100
+
+# Invalidation bus entity; ids are scholarship ids
+ENTITY = "scholarship"
+
+
+def load(db: Session, ids: List[int]) -> Dict[int, bytes]:
+    """Encode the scholarships in `ids` with one IN query plus one per relationship."""
+    scholarships = db.exec(
+        select(models.Scholarship)
+        .where(models.Scholarship.id.in_(ids))
+        .options(
+            selectinload(models.Scholarship.scientific_areas),
+            selectinload(models.Scholarship.jury),
+            selectinload(models.Scholarship.documents),
+            selectinload(models.Scholarship.edict),
+        )
+    ).all()
+    return {
+        scholarship.id: serialization.dump_scholarship(scholarship) for scholarship in scholarships
+    }
+
+
+def get_many(detail_cache: cache.TTLCache, db: Session, ids: Iterable[int]) -> Dict[int, bytes]:
+    """Cached entries for warm ids; the rest are loaded at once and cached."""
+    found: Dict[int, bytes] = {}
+    missing = []
+    for scholarship_id in dict.fromkeys(ids):
+        encoded = detail_cache.get(scholarship_id)
+        if encoded is None:
+            missing.append(scholarship_id)
+        else:
+            found[scholarship_id] = encoded
+    if missing:
+        # Not cached if an invalidation arrives while loading
+        generation = detail_cache.generation
+        loaded = load(db, missing)
+        for scholarship_id, encoded in loaded.items():
+            detail_cache.set(scholarship_id, encoded, generation)
+        found.update(loaded)
+    return found
+
+
+def get(detail_cache: cache.TTLCache, db: Session, scholarship_id: int) -> Optional[bytes]:
+    return get_many(detail_cache, db, [scholarship_id]).get(scholarship_id)
+
+
+def dump_batch(ids: List[int], found: Dict[int, bytes]) -> bytes:
+    """A JSON array in request order; missing ids get {"id": ..., "found": false}."""
+    items = [
+        b'{"id":%d,"found":true,"scholarship":%s}' % (scholarship_id, found[scholarship_id])
+        if scholarship_id in found
+        else b'{"id":%d,"found":false,"scholarship":null}' % scholarship_id
+        for scholarship_id in ids
+    ]
+    return b"[" + b",".join(items) + b"]"
+
+
+def mark(db: Session, scholarship_ids: Iterable[int]):
+    """Drop these scholarships from every replica's cache once `db` commits."""
+    invalidation.publish(db, ENTITY, scholarship_ids)
+
+
+def evict(detail_cache: cache.TTLCache, scholarship_ids: Optional[List[int]]):
+    if scholarship_ids is None:
+        detail_cache.invalidate()
+        return
+    for scholarship_id in scholarship_ids:
+        detail_cache.invalidate(scholarship_id)
+
+
+def _status_changed(
+    db: Session,
+    scholarship_ids: List[int],
+    source: models.ScholarshipStatus,
+    target: models.ScholarshipStatus,
+):
+    mark(db, scholarship_ids)
+
+
+def _after_flush(session: OrmSession, flush_context):
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, models.Scholarship):
+            mark(session, [obj.id])
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, models.DocumentTemplate):
+            mark(session, [obj.scholarship_id])
+
+
+def install():
+    """Publish changed scholarships on the invalidation bus; see app.hooks."""
+    transitions.on_transition(_status_changed)
+    event.listen(OrmSession, "after_flush", _after_flush)
@@ -0,0 +1,177 @@
+import csv
+import io
+from collections import defaultdict
+from typing import Dict, Iterator, List
+
+import orjson
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+from sqlmodel.sql.expression import SelectOfScalar
+
+from . import models, schemas
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = 500
+
+CSV_COLUMNS = [
+    "id",
+    "name",
+    "description",
+    "publisher",
+    "type",
+    "spots",
+    "deadline",
+    "status",
+    "created_at",
+    "approved_at",
+    "results_at",
+    "edict_name",
+    "edict_file_path",
+    "scientific_areas",
+    "jury_ids",
+    "jury_names",
+    "documents",
+]
+
+
+def _group(rows) -> Dict[int, List]:
+    grouped = defaultdict(list)
+    for scholarship_id, *values in rows:
+        grouped[scholarship_id].append(values)
+    return grouped
+
+
+def load_relations(db: Session, ids: List[int]) -> Dict[str, Dict[int, List]]:
+    """Load areas, jury, documents and edicts for a batch of scholarships at once."""
+    areas = db.exec(
+        select(
+            models.ScholarshipScientificAreaLink.scholarship_id,
+            models.ScientificArea.name,
+        )
+        .join(models.ScientificArea)
+        .where(models.ScholarshipScientificAreaLink.scholarship_id.in_(ids))
+    ).all()
+    jury = db.exec(
+        select(models.ScholarshipJuryLink.scholarship_id, models.Jury.id, models.Jury.name)
+        .join(models.Jury)
+        .where(models.ScholarshipJuryLink.scholarship_id.in_(ids))
+    ).all()
+    documents = db.exec(
+        select(
+            models.DocumentTemplate.scholarship_id,
+            models.DocumentTemplate.name,
+            models.DocumentTemplate.file_path,
+            models.DocumentTemplate.required,
+            models.DocumentTemplate.template,
+        ).where(models.DocumentTemplate.scholarship_id.in_(ids))
+    ).all()
+    edicts = db.exec(
+        select(models.Scholarship.id, models.Edict.name, models.Edict.file_path)
+        .join(models.Edict)
+        .where(models.Scholarship.id.in_(ids))
+    ).all()
+    return {
+        "scientific_areas": _group(areas),
+        "jury": _group(jury),
+        "documents": _group(documents),
+        "edict": _group(edicts),
+    }
+
+
+def _flatten(scholarship: models.Scholarship, relations: Dict[str, Dict[int, List]]) -> dict:
+    edict = relations["edict"].get(scholarship.id)
+    return {
+        "id": scholarship.id,
+        "name": scholarship.name,
+        "description": scholarship.description,
+        "publisher": scholarship.publisher,
+        "type": scholarship.type,
+        "spots": scholarship.spots,
+        "deadline": scholarship.deadline,
+        "status": models.ScholarshipStatus(scholarship.status).value,
+        "created_at": scholarship.created_at,
+        "approved_at": scholarship.approved_at,
+        "results_at": scholarship.results_at,
+        "edict": {"name": edict[0][0], "file_path": edict[0][1]} if edict else None,
+        "scientific_areas": [
+            name for (name,) in relations["scientific_areas"].get(scholarship.id, [])
+        ],
+        "jury": [
+            {"id": jury_id, "name": name}
+            for jury_id, name in relations["jury"].get(scholarship.id, [])
+        ],
+        "documents": [
+            {"name": name, "file_path": file_path, "required": required, "template": template}
+            for name, file_path, required, template in relations["documents"].get(
+                scholarship.id, []
+            )
+        ],
+    }
+
+
+def _csv_row(row: dict) -> list:
+    edict = row["edict"] or {}
+    return [
+        row["id"],
+        row["name"],
+        row["description"],
+        row["publisher"],
+        row["type"],
+        row["spots"],
+        row["deadline"].isoformat() if row["deadline"] else "",
+        row["status"],
+        row["created_at"].isoformat() if row["created_at"] else "",
+        row["approved_at"].isoformat() if row["approved_at"] else "",
+        row["results_at"].isoformat() if row["results_at"] else "",
+        edict.get("name", ""),
+        edict.get("file_path", ""),
+        "; ".join(row["scientific_areas"]),
+        "; ".join(jury["id"] for jury in row["jury"]),
+        "; ".join(jury["name"] for jury in row["jury"]),
+        "; ".join(document["name"] for document in row["documents"]),
+    ]
+
+
+def iter_batches(engine: Engine, statement: SelectOfScalar) -> Iterator[List[dict]]:
+    """Stream flattened scholarships from a server-side cursor, one batch at a time."""
+    statement = statement.order_by(models.Scholarship.id).execution_options(
+        yield_per=EXPORT_BATCH_SIZE
+    )
+    last_id = None
+    with Session(engine) as db:
+        for partition in db.exec(statement).partitions():
+            # Joins on areas/jury can repeat a scholarship; rows are ordered by id
+            scholarships = []
+            for scholarship in partition:
+                if scholarship.id != last_id:
+                    scholarships.append(scholarship)
+                    last_id = scholarship.id
+            if not scholarships:
+                continue
+            relations = load_relations(db, [s.id for s in scholarships])
+            # The identity map only holds weak references, so each batch is
+            # released once it has been yielded
+            yield [_flatten(s, relations) for s in scholarships]
+
+
+def stream_csv(engine: Engine, statement: SelectOfScalar) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    yield buffer.getvalue()
+    for batch in iter_batches(engine, statement):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_csv_row(row) for row in batch)
+        yield buffer.getvalue()
+
+
+def stream_ndjson(engine: Engine, statement: SelectOfScalar) -> Iterator[bytes]:
+    for batch in iter_batches(engine, statement):
+        yield b"".join(orjson.dumps(row) + b"\n" for row in batch)
+
+
+def stream_export(engine: Engine, statement: SelectOfScalar, export_format: schemas.ExportFormat):
+    if export_format == schemas.ExportFormat.ndjson:
+        return stream_ndjson(engine, statement), "application/x-ndjson"
+    return stream_csv(engine, statement), "text/csv"
@@ -0,0 +1,347 @@
+"""Text extraction from uploaded edicts and document templates.
+
+The text and page count of each file are stored on its Edict or
+DocumentTemplate row, and searched by the `q` filter of GET /scholarships.
+
+New rows start "pending". The scheduler's extract_texts job claims due rows,
+downloads the files from S3 and parses them on a ProcessPoolExecutor, so the
+CPU-bound PDF parsing never competes with the API for the GIL. Each row ends
+up in one of these states:
+
+- "done": text and page count are stored.
+- "skipped": there is no file, or it is not a PDF.
+- "failed": the PDF cannot be read, or EXTRACTION_MAX_ATTEMPTS attempts failed.
+
+Other errors (S3, timeouts, a crashed worker process) are retried after
+EXTRACTION_RETRY_DELAY seconds, doubled on every attempt.
+
+Claims are made with a conditional UPDATE and a lease, so replicas running
+the same job never extract the same file twice at once. Rows created before
+extraction existed have no status; queue them and extract them with
+
+    python -m app.extraction backfill [--retry-failed] [--queue-only]
+"""
+import argparse
+import io
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import unquote, urlparse
+
+from pypdf import PdfReader
+from pypdf.errors import PyPdfError
+from sqlalchemy import or_, update
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Session, select
+
+from . import config, metrics, models, providers
+
+PENDING, DONE, SKIPPED, FAILED = "pending", "done", "skipped", "failed"
+
+# Extractable models by kind, as labelled in metrics and command output
+MODELS = {"edict": models.Edict, "document": models.DocumentTemplate}
+
+# Worker processes are replaced after this many files, bounding parser leaks
+TASKS_PER_PROCESS = 50
+
+# (kind, id, file_path, attempts)
+Claim = Tuple[str, int, str, int]
+
+
+class NotExtractable(Exception):
+    """There is nothing to extract from the file; skip it without retrying."""
+
+
+def extract_text(content: bytes, max_chars: int) -> Tuple[str, int]:
+    """Text (at most `max_chars` characters) and page count of a PDF."""
+    if b"%PDF-" not in content[:1024]:
+        raise NotExtractable("Not a PDF file")
+    reader = PdfReader(io.BytesIO(content))
+    if reader.is_encrypted:
+        # Edicts are often protected against editing only, with an empty password
+        reader.decrypt("")
+    parts, size = [], 0
+    for page in reader.pages:
+        if size >= max_chars:
+            break
+        text = page.extract_text() or ""
+        parts.append(text)
+        size += len(text) + 1
+    # PostgreSQL text cannot hold NUL characters
+    return "\n".join(parts)[:max_chars].replace("\x00", ""), len(reader.pages)
+
+
+def _timed_extract_text(content: bytes, max_chars: int) -> Tuple[str, int, float]:
+    # Runs in a worker process; the duration excludes time spent queued
+    start = time.perf_counter()
+    text, pages = extract_text(content, max_chars)
+    return text, pages, time.perf_counter() - start
+
+
+def process_pool(processes: int) -> ProcessPoolExecutor:
+    # Forking the API process would copy its threads, locks and database
+    # connections; workers fork from a clean server that imported this module
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+    else:
+        context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(processes, mp_context=context, max_tasks_per_child=TASKS_PER_PROCESS)
+
+
+def object_key(file_path: str, bucket: str) -> Optional[str]:
+    """S3 key of a stored presigned URL, virtual-hosted or path style."""
+    if not file_path:
+        return None
+    url = urlparse(file_path)
+    key = unquote(url.path.lstrip("/"))
+    if not url.netloc.startswith(f"{bucket}.") and key.startswith(f"{bucket}/"):
+        key = key[len(bucket) + 1:]
+    return key or None
+
+
+class Extractor:
+    def __init__(
+        self,
+        bind: Union[Engine, Connection],
+        aws: providers.Providers,
+        bucket: str,
+        processes: int = 2,
+        batch_size: int = 10,
+        max_attempts: int = 5,
+        retry_delay: float = 30.0,
+        timeout: float = 120.0,
+        max_chars: int = 1_000_000,
+        executor: Optional[Executor] = None,
+    ):
+        self.bind = bind
+        self.aws = aws
+        self.bucket = bucket
+        self.processes = processes
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.max_chars = max_chars
+        self.owns_executor = executor is None
+        self.executor = executor or process_pool(processes)
+
+    def shutdown(self):
+        if self.owns_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def run_until_idle(self) -> int:
+        """Extract batches until no row is due; the number of rows handled."""
+        total = 0
+        while True:
+            handled = self.run_batch()
+            if not handled:
+                return total
+            total += handled
+
+    def run_batch(self) -> int:
+        claims = self.claim()
+        submitted = []
+        broken = False
+        for kind, record_id, file_path, attempts in claims:
+            try:
+                content = self.fetch(file_path)
+                future = self.executor.submit(_timed_extract_text, content, self.max_chars)
+            except NotExtractable as e:
+                self.finish(kind, record_id, SKIPPED, error=str(e))
+                continue
+            except BrokenProcessPool as e:
+                broken = True
+                self.retry(kind, record_id, attempts, e)
+                continue
+            except Exception as e:
+                self.retry(kind, record_id, attempts, e)
+                continue
+            submitted.append((kind, record_id, attempts, future))
+
+        for kind, record_id, attempts, future in submitted:
+            try:
+                text, pages, elapsed = future.result(timeout=self.timeout)
+            except NotExtractable as e:
+                self.finish(kind, record_id, SKIPPED, error=str(e))
+            except PyPdfError as e:
+                # A broken or unreadable PDF stays that way
+                self.finish(kind, record_id, FAILED, error=f"Unreadable PDF: {str(e)}")
+            except FutureTimeoutError:
+                # A running task cannot be stopped; its worker stays busy until it ends
+                future.cancel()
+                self.retry(kind, record_id, attempts, f"No result after {self.timeout}s")
+            except BrokenProcessPool as e:
+                # A worker died (e.g. killed for memory); the pool cannot be reused
+                broken = True
+                self.retry(kind, record_id, attempts, e)
+            except Exception as e:
+                self.retry(kind, record_id, attempts, e)
+            else:
+                metrics.TEXT_EXTRACTION_LATENCY.labels(kind).observe(elapsed)
+                self.finish(kind, record_id, DONE, text=text, pages=pages)
+        if broken:
+            self.replace_executor()
+        return len(claims)
+
+    def claim(self) -> List[Claim]:
+        """Take up to batch_size due rows, leased for as long as the batch may take."""
+        now = datetime.now()
+        lease = timedelta(seconds=self.timeout * self.batch_size + 60)
+        claims: List[Claim] = []
+        with Session(self.bind) as db:
+            for kind, model in MODELS.items():
+                limit = self.batch_size - len(claims)
+                if limit <= 0:
+                    break
+                due = [
+                    model.extraction_status == PENDING,
+                    or_(model.extraction_next_at.is_(None), model.extraction_next_at <= now),
+                ]
+                candidates = db.exec(
+                    select(model.id).where(*due).order_by(model.id).limit(limit)
+                ).all()
+                if not candidates:
+                    continue
+                # Rows another replica claimed meanwhile no longer match
+                claimed = db.exec(
+                    update(model)
+                    .where(model.id.in_(candidates), *due)
+                    .values(
+                        extraction_attempts=model.extraction_attempts + 1,
+                        extraction_next_at=now + lease,
+                    )
+                    .returning(model.id, model.file_path, model.extraction_attempts)
+                ).all()
+                claims.extend((kind, *row) for row in sorted(claimed))
+            db.commit()
+        return claims
+
+    def fetch(self, file_path: str) -> bytes:
+        key = object_key(file_path, self.bucket)
+        if key is None:
+            raise NotExtractable("No file")
+        return self.aws.s3.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+
+    def retry(self, kind: str, record_id: int, attempts: int, error):
+        if attempts >= self.max_attempts:
+            self.finish(kind, record_id, FAILED, error=f"Failed {attempts} times: {str(error)}")
+            return
+        print(f"Error extracting {kind} {record_id} (attempt {attempts}): {str(error)}")
+        delay = self.retry_delay * 2 ** (attempts - 1)
+        self.save(
+            kind,
+            record_id,
+            extraction_status=PENDING,
+            extraction_next_at=datetime.now() + timedelta(seconds=delay),
+            extraction_error=str(error)[:1000],
+        )
+        metrics.TEXT_EXTRACTIONS.labels(kind, "retried").inc()
+
+    def finish(
+        self,
+        kind: str,
+        record_id: int,
+        status: str,
+        text: Optional[str] = None,
+        pages: Optional[int] = None,
+        error: Optional[str] = None,
+    ):
+        if status == FAILED:
+            print(f"Giving up extracting {kind} {record_id}: {error}")
+        self.save(
+            kind,
+            record_id,
+            extraction_status=status,
+            text_content=text,
+            page_count=pages,
+            extraction_next_at=None,
+            extraction_error=error[:1000] if error else None,
+        )
+        metrics.TEXT_EXTRACTIONS.labels(kind, status).inc()
+
+    def save(self, kind: str, record_id: int, **values):
+        model = MODELS[kind]
+        with Session(self.bind) as db:
+            db.exec(update(model).where(model.id == record_id).values(**values))
+            db.commit()
+
+    def replace_executor(self):
+        if not self.owns_executor:
+            return
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor = process_pool(self.processes)
+
+
+def backfill(bind: Union[Engine, Connection], retry_failed: bool = False) -> Dict[str, int]:
+    """Queue rows never extracted (and failed ones, with retry_failed); the count per kind."""
+    queued = {}
+    with Session(bind) as db:
+        for kind, model in MODELS.items():
+            condition = model.extraction_status.is_(None)
+            if retry_failed:
+                condition = or_(condition, model.extraction_status == FAILED)
+            result = db.exec(
+                update(model)
+                .where(condition)
+                .values(
+                    extraction_status=PENDING,
+                    extraction_attempts=0,
+                    extraction_next_at=None,
+                    extraction_error=None,
+                )
+            )
+            queued[kind] = result.rowcount
+        db.commit()
+    return queued
+
+
+def create_extractor(
+    settings: config.Settings,
+    bind: Union[Engine, Connection],
+    aws: Optional[providers.Providers] = None,
+) -> Extractor:
+    return Extractor(
+        bind,
+        aws or providers.from_settings(settings),
+        settings.s3_bucket_name,
+        processes=settings.extraction_processes,
+        batch_size=settings.extraction_batch_size,
+        max_attempts=settings.extraction_max_attempts,
+        retry_delay=settings.extraction_retry_delay,
+        timeout=settings.extraction_timeout,
+        max_chars=settings.extraction_max_chars,
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    from .database import engine
+
+    parser = argparse.ArgumentParser(description="Extract text from edicts and document templates")
+    parser.add_argument("command", choices=["backfill", "run"], help="backfill: queue old rows, then extract; run: extract due rows")
+    parser.add_argument("--retry-failed", action="store_true", help="Also queue rows that failed")
+    parser.add_argument("--queue-only", action="store_true", help="Leave the extraction to the scheduler")
+    args = parser.parse_args(argv)
+
+    if args.command == "backfill":
+        queued = backfill(engine, args.retry_failed)
+        print(f"Queued {queued['edict']} edicts and {queued['document']} documents")
+        if args.queue_only:
+            return 0
+
+    extractor = create_extractor(config.get_settings(), engine)
+    try:
+        handled = extractor.run_until_idle()
+    finally:
+        extractor.shutdown()
+        extractor.aws.shutdown()
+    print(f"Handled {handled} files")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,32 @@
+"""Transaction hooks that keep derived data in step with scholarship changes.
+
+- stats: the scholarshipstat counters;
+- details and jury: invalidation events for the detail and jury dashboard
+  caches;
+- invalidation: delivers those events on commit, locally and with NOTIFY;
+- jobs: wakes the local job runner when a commit queued jobs.
+
+The hooks are registered by install(), not when their modules are imported,
+so every process that writes scholarships must call it at startup: the API
+(create_app), the results worker and the command line tools. Calling it
+again does nothing.
+"""
+import threading
+
+from . import details, invalidation, jobs, jury, stats
+
+_lock = threading.Lock()
+_installed = False
+
+
+def install():
+    global _installed
+    with _lock:
+        if _installed:
+            return
+        invalidation.install()
+        stats.install()
+        details.install()
+        jury.install()
+        jobs.install()
+        _installed = True
@@ -0,0 +1,237 @@
+"""Idempotency-Key support for POST endpoints that create things.
+
+A client retrying a request (e.g. after a timeout) sends the same
+Idempotency-Key header. The first request claims the key by inserting an
+IdempotencyKey row, runs, and stores its response on the row. Retries are
+answered as follows:
+
+- Once the first request has finished, the stored response is replayed with
+  an `Idempotent-Replayed: true` header. Nothing is uploaded or inserted again.
+- While it is still running, the retry waits for it, up to
+  IDEMPOTENCY_WAIT_TIMEOUT seconds, then gets a 409.
+- If it failed, its claim was released and the retry runs normally.
+
+Keys are scoped to the caller and to a fingerprint of the request: method,
+path and body. Form fields and uploaded files are hashed rather than the raw
+multipart body, whose boundary changes between retries. Reusing a key for a
+different request is a 422.
+
+A claim whose request died with its process is taken over after
+IDEMPOTENCY_LOCK_TIMEOUT seconds. Keys expire after IDEMPOTENCY_TTL seconds.
+"""
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timedelta
+from typing import Any, Optional, Union
+
+import orjson
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import and_, delete, or_, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+from starlette.datastructures import UploadFile
+from starlette.responses import Response
+from sqlmodel import Session
+
+from . import config, models, serialization
+
+IN_PROGRESS, COMPLETED = "in_progress", "completed"
+
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+Bind = Union[Engine, Connection]
+
+
+class Replay(Exception):
+    """Raised by the dependency to answer with a stored response."""
+
+    def __init__(self, response: Response):
+        self.response = response
+
+
+async def replay_handler(request: Request, exc: Replay) -> Response:
+    return exc.response
+
+
+async def fingerprint(request: Request) -> str:
+    digest = hashlib.sha256(f"{request.method} {request.url.path}\n".encode())
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith(("multipart/form-data", "application/x-www-form-urlencoded")):
+        form = await request.form()
+        # Sorted by name; repeated fields (document_name, ...) keep their order
+        for name, value in sorted(form.multi_items(), key=lambda item: item[0]):
+            digest.update(name.encode() + b"\0")
+            if isinstance(value, UploadFile):
+                digest.update(f"file:{value.filename}\0".encode())
+                while chunk := await value.read(1024 * 1024):
+                    digest.update(chunk)
+                # The endpoint reads the file again
+                await value.seek(0)
+            else:
+                digest.update(value.encode())
+            digest.update(b"\0")
+    else:
+        body = await request.body()
+        try:
+            # Same JSON, whatever the key order and spacing
+            body = orjson.dumps(orjson.loads(body), option=orjson.OPT_SORT_KEYS)
+        except orjson.JSONDecodeError:
+            pass
+        digest.update(body)
+    return digest.hexdigest()
+
+
+def replay(row: models.IdempotencyKey) -> Response:
+    return Response(
+        row.response,
+        status_code=row.status_code,
+        media_type=row.content_type,
+        headers={REPLAYED_HEADER: "true"},
+    )
+
+
+class Claim:
+    """The right to run a request for a key; complete() stores the response."""
+
+    def __init__(self, bind: Optional[Bind] = None, owner: str = "", key: Optional[str] = None):
+        self.bind = bind
+        self.owner = owner
+        self.key = key
+
+    async def complete(self, result: Any) -> Response:
+        response = result if isinstance(result, Response) else serialization.ORJSONResponse(
+            serialization.dumps(jsonable_encoder(result))
+        )
+        if self.key is not None:
+            await asyncio.to_thread(self._store, response)
+        return response
+
+    async def release(self):
+        """Forget the key, so a retry runs the request again."""
+        if self.key is not None:
+            await asyncio.to_thread(self._forget)
+
+    def _store(self, response: Response):
+        with Session(self.bind) as db:
+            db.exec(
+                update(models.IdempotencyKey)
+                .where(models.IdempotencyKey.owner == self.owner, models.IdempotencyKey.key == self.key)
+                .values(
+                    status=COMPLETED,
+                    status_code=response.status_code,
+                    content_type=response.headers.get("content-type"),
+                    response=response.body,
+                )
+            )
+            db.commit()
+
+    def _forget(self):
+        with Session(self.bind) as db:
+            db.exec(
+                delete(models.IdempotencyKey).where(
+                    models.IdempotencyKey.owner == self.owner,
+                    models.IdempotencyKey.key == self.key,
+                    models.IdempotencyKey.status == IN_PROGRESS,
+                )
+            )
+            db.commit()
+
+
+def try_claim(
+    bind: Bind, owner: str, key: str, request_fingerprint: str, settings: config.Settings
+) -> Optional[models.IdempotencyKey]:
+    """None once this request holds the key; otherwise the row of the request that does."""
+    now = datetime.now()
+    locked_until = now + timedelta(seconds=settings.idempotency_lock_timeout)
+    with Session(bind) as db:
+        try:
+            # A savepoint, so a duplicate key leaves the transaction usable
+            with db.begin_nested():
+                db.add(models.IdempotencyKey(
+                    owner=owner,
+                    key=key,
+                    fingerprint=request_fingerprint,
+                    status=IN_PROGRESS,
+                    locked_until=locked_until,
+                    created_at=now,
+                ))
+            db.commit()
+            return None
+        except IntegrityError:
+            pass
+
+        row = models.IdempotencyKey
+        expired = row.created_at < now - timedelta(seconds=settings.idempotency_ttl)
+        abandoned = and_(
+            row.status == IN_PROGRESS,
+            row.locked_until < now,
+            row.fingerprint == request_fingerprint,
+        )
+        taken = db.exec(
+            update(row)
+            .where(row.owner == owner, row.key == key, or_(expired, abandoned))
+            .values(
+                fingerprint=request_fingerprint,
+                status=IN_PROGRESS,
+                status_code=None,
+                content_type=None,
+                response=None,
+                locked_until=locked_until,
+                created_at=now,
+            )
+        )
+        db.commit()
+        if taken.rowcount:
+            return None
+        existing = db.get(row, (owner, key))
+        if existing is None:
+            # Released by the first request meanwhile; claim it again
+            return try_claim(bind, owner, key, request_fingerprint, settings)
+        db.expunge(existing)
+        return existing
+
+
+async def claim(
+    request: Request, bind: Bind, owner: str, key: Optional[str], settings: config.Settings
+) -> Claim:
+    """Claim `key` for this request, or raise Replay with the first request's response."""
+    if key is None:
+        return Claim()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=400, detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters."
+        )
+
+    request_fingerprint = await fingerprint(request)
+    deadline = time.monotonic() + settings.idempotency_wait_timeout
+    delay = 0.05
+    while True:
+        # Blocking database work runs off the event loop
+        existing = await asyncio.to_thread(try_claim, bind, owner, key, request_fingerprint, settings)
+        if existing is None:
+            return Claim(bind, owner, key)
+        if existing.fingerprint != request_fingerprint:
+            raise HTTPException(
+                status_code=422, detail="Idempotency-Key was already used for a different request."
+            )
+        if existing.status == COMPLETED:
+            raise Replay(replay(existing))
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still in progress.",
+                headers={"Retry-After": str(max(1, round(settings.idempotency_wait_timeout)))},
+            )
+        # The first request is still running; wait for its result
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+def purge(db: Session, ttl: float) -> int:
+    """Delete expired keys; the number deleted."""
+    cutoff = datetime.now() - timedelta(seconds=ttl)
+    result = db.exec(delete(models.IdempotencyKey).where(models.IdempotencyKey.created_at < cutoff))
+    return result.rowcount
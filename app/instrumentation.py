@@ -0,0 +1,143 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are logged with their parameters and route
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# Queries allowed per request, overridable per route template with
+# QUERY_BUDGETS="/scholarships=15;/scholarships/{id}/details=6"
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "50"))
+QUERY_BUDGETS: Dict[str, int] = {
+    route.strip(): int(budget)
+    for route, _, budget in (
+        entry.partition("=") for entry in os.getenv("QUERY_BUDGETS", "").split(";") if entry
+    )
+}
+# "warn" logs requests over budget, "raise" fails them (used by the tests)
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "warn")
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+@dataclass
+class RequestStats:
+    """Database work done while serving one request."""
+
+    scope: dict = field(default_factory=dict, repr=False)
+    queries: int = 0
+    query_time: float = 0.0
+
+    @property
+    def route(self) -> str:
+        # The router stores the matched route in the scope; use its template
+        # so /scholarships/1/details and /scholarships/2/details share a series
+        return getattr(self.scope.get("route"), "path", "<unmatched>")
+
+
+@dataclass
+class QueryCounter:
+    """Statements executed while a count_queries() block is active."""
+
+    statements: List[str] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        # SAVEPOINT bookkeeping (e.g. the tests' per-test transaction) is not
+        # work done by the code being measured
+        return sum(1 for statement in self.statements if not _is_savepoint(statement))
+
+
+def _is_savepoint(statement: str) -> bool:
+    return statement.lstrip().upper().startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT"))
+
+
+# Set by the metrics middleware for the duration of a request; sync endpoints
+# run in a worker thread with a copy of the context, which still points to the
+# same RequestStats object
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+# Callbacks run after every statement: (statement, parameters, elapsed, stats)
+QueryCallback = Callable[[str, object, float, Optional[RequestStats]], None]
+_query_callbacks: List[QueryCallback] = []
+_query_counters: List[QueryCounter] = []
+
+
+def on_query(callback: QueryCallback) -> QueryCallback:
+    _query_callbacks.append(callback)
+    return callback
+
+
+# The start time is kept on the statement's execution context, which is
+# discarded with it whether or not the statement succeeds. context is None for
+# a few statements the dialect runs itself, which are not timed.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_start", None)
+    elapsed = time.perf_counter() - start if start is not None else 0.0
+    stats = request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_time += elapsed
+    for counter in list(_query_counters):
+        counter.statements.append(statement)
+    for callback in _query_callbacks:
+        callback(statement, parameters, elapsed, stats)
+
+
+def instrument_engine(engine: Engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@on_query
+def _log_slow_query(statement, parameters, elapsed, stats):
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning(
+            "Slow query (%.1f ms) on %s: %s; parameters: %.500r",
+            elapsed * 1000,
+            stats.route if stats else "<no request>",
+            " ".join(statement.split()),
+            parameters,
+        )
+
+
+def query_budget(route: str) -> int:
+    return QUERY_BUDGETS.get(route, QUERY_BUDGET)
+
+
+def check_query_budget(stats: RequestStats):
+    budget = query_budget(stats.route)
+    if stats.queries <= budget:
+        return
+    message = f"{stats.route} issued {stats.queries} queries (budget: {budget})"
+    if QUERY_BUDGET_MODE == "raise":
+        raise QueryBudgetExceeded(message)
+    logger.warning("Query budget exceeded: %s", message)
+
+
+@contextmanager
+def count_queries():
+    """Count the statements executed on instrumented engines inside the block,
+    from any thread (the TestClient runs the app in its own thread)."""
+    counter = QueryCounter()
+    _query_counters.append(counter)
+    try:
+        yield counter
+    finally:
+        _query_counters.remove(counter)
@@ -0,0 +1,193 @@
+"""Cache invalidation bus.
+
+In-process caches (each app's detail and jury dashboard caches) register an
+evict handler per entity. Code that changes data calls publish(db, entity,
+ids). The events are delivered once the session commits, and dropped if it
+rolls back:
+
+- In this process, the handlers run right after the commit.
+- On PostgreSQL, the events are also sent with NOTIFY on the
+  `cache_invalidation` channel inside the committing transaction, so other
+  replicas hear about them only if it commits. Changes made outside the
+  API, e.g. by the results worker, are published the same way once
+  app.hooks.install() has run. Each API process runs a Listener that LISTENs on the channel and evicts the
+  matching entries. Payloads are JSON: {"origin": ..., "events": [[entity,
+  id, version], ...]}, where version is the publish time in milliseconds.
+- On SQLite there is a single process, so the local delivery is enough.
+
+While the listener is disconnected it cannot hear about changes. Every
+registered cache is then cleared on disconnect, every
+CACHE_MAX_STALENESS seconds until it reconnects, and once more after
+reconnecting. An entry is never served more than that many seconds after a
+change on another replica.
+"""
+import json
+import os
+import select
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session as OrmSession
+
+from .metrics import CACHE_INVALIDATIONS, CACHE_INVALIDATION_LAG
+
+CHANNEL = "cache_invalidation"
+# NOTIFY payloads must stay below 8000 bytes
+MAX_EVENTS_PER_NOTIFY = 100
+
+# Identifies this process, so the listener skips events it already applied
+ORIGIN = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+# Handlers receive the ids to evict, or None to clear everything
+Handler = Callable[[Optional[List]], None]
+
+_handlers: Dict[str, List[Handler]] = defaultdict(list)
+
+_PENDING = "cache_invalidations"
+
+
+def register(entity: str, handler: Handler):
+    _handlers[entity].append(handler)
+
+
+def evict(entity: str, ids: Optional[List], source: str = "local"):
+    CACHE_INVALIDATIONS.labels(entity, source).inc()
+    for handler in _handlers.get(entity, ()):
+        try:
+            handler(ids)
+        except Exception as e:
+            print(f"Error evicting {entity} {ids}: {str(e)}")
+
+
+def evict_all(source: str):
+    for entity in list(_handlers):
+        evict(entity, None, source)
+
+
+def publish(db: OrmSession, entity: str, ids: Iterable):
+    """Evict these entries everywhere once `db` commits."""
+    pending: Set[Tuple[str, object]] = db.info.setdefault(_PENDING, set())
+    pending.update((entity, value) for value in ids if value is not None)
+
+
+def _group(events: Iterable[Tuple[str, object]]) -> Dict[str, List]:
+    grouped: Dict[str, List] = defaultdict(list)
+    for entity, value in events:
+        grouped[entity].append(value)
+    return grouped
+
+
+def _before_commit(session: OrmSession):
+    # Flush first: the final flush's hooks may publish more events
+    session.flush()
+    pending = session.info.get(_PENDING)
+    if not pending or session.get_bind().dialect.name != "postgresql":
+        return
+    version = int(time.time() * 1000)
+    events = sorted(([entity, value, version] for entity, value in pending), key=str)
+    connection = session.connection()
+    for start in range(0, len(events), MAX_EVENTS_PER_NOTIFY):
+        payload = json.dumps({"origin": ORIGIN, "events": events[start:start + MAX_EVENTS_PER_NOTIFY]})
+        connection.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+
+
+def _after_commit(session: OrmSession):
+    pending = session.info.pop(_PENDING, None)
+    for entity, ids in _group(pending or ()).items():
+        evict(entity, ids)
+
+
+def _after_soft_rollback(session: OrmSession, previous_transaction):
+    # A rolled back savepoint keeps the enclosing transaction's events
+    if previous_transaction.parent is None:
+        session.info.pop(_PENDING, None)
+
+
+def install():
+    """Deliver published events when sessions commit; see app.hooks."""
+    event.listen(OrmSession, "before_commit", _before_commit)
+    event.listen(OrmSession, "after_commit", _after_commit)
+    event.listen(OrmSession, "after_soft_rollback", _after_soft_rollback)
+
+
+class Listener:
+    """LISTENs for invalidations from other processes on a dedicated connection."""
+
+    def __init__(self, engine: Engine, max_staleness: float = 30.0, channel: str = CHANNEL):
+        self.engine = engine
+        self.max_staleness = max_staleness
+        self.channel = channel
+        self.connected = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="cache-invalidation", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                self.listen()
+            except Exception as e:
+                print(f"Cache invalidation listener disconnected: {str(e)}")
+            self.connected = False
+            if self._stop.is_set():
+                break
+            # Changes made meanwhile are missed until the listener is back
+            evict_all("disconnected")
+            self._stop.wait(min(5.0, self.max_staleness))
+
+    def listen(self):
+        # A pooled connection would be handed back with LISTEN still active
+        connection = self.engine.raw_connection()
+        connection.detach()
+        try:
+            dbapi_connection = connection.dbapi_connection
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.channel}")
+            self.connected = True
+            # Anything cached before LISTEN started may already be stale
+            evict_all("reconnected")
+
+            last_check = time.monotonic()
+            while not self._stop.is_set():
+                ready, _, _ = select.select([dbapi_connection], [], [], 1.0)
+                if ready:
+                    dbapi_connection.poll()
+                    last_check = time.monotonic()
+                elif time.monotonic() - last_check > self.max_staleness / 2:
+                    # A dead TCP connection is silent; make sure it still answers
+                    with dbapi_connection.cursor() as cursor:
+                        cursor.execute("SELECT 1")
+                    last_check = time.monotonic()
+                while dbapi_connection.notifies:
+                    self.handle(dbapi_connection.notifies.pop(0).payload)
+        finally:
+            connection.close()
+
+    def handle(self, payload: str):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            print(f"Ignoring invalid cache invalidation payload: {payload[:200]}")
+            return
+        if message.get("origin") == ORIGIN:
+            return
+        events = message.get("events", [])
+        for entity, ids in _group((entity, value) for entity, value, _ in events).items():
+            evict(entity, ids, "remote")
+        if events:
+            # Every event in a payload shares the publish time
+            CACHE_INVALIDATION_LAG.observe(max(time.time() * 1000 - events[0][2], 0) / 1000)
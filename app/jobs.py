@@ -0,0 +1,287 @@
+"""Durable background jobs, stored in the `job` table.
+
+Code that changes data queues the side effects of the change in the same
+transaction:
+
+    jobs.enqueue(db, "sqs_message", {"message": {...}})
+    db.commit()
+
+A job exists only if its transaction commits, and then it runs even if the
+process dies right after the commit. The API responds without waiting for
+it. A Runner in every API process (JOBS_WORKERS threads) picks up due jobs:
+highest priority first, then oldest run_at. Commits that queued jobs wake
+the local runner at once. Other replicas find the jobs within
+JOBS_POLL_INTERVAL seconds.
+
+Handlers are called with the job's session, its payload and the Runner's
+`state` (the API's app.state, for its providers and settings). They run
+inside the job's transaction and must not commit. Jobs they queue, e.g.
+follow-up work, are committed together with the job's completion. Errors
+are retried with exponential backoff from JOBS_RETRY_DELAY seconds. A
+handler that raises Retry replaces the payload of the next attempt, so work
+that succeeded is not done again. After the job's max_attempts, or straight
+away on PermanentError, the job is marked failed.
+
+A job whose worker dies stays "running" until JOBS_VISIBILITY_TIMEOUT has
+passed, then it is claimed again. Delivery is therefore at least once, and
+handlers must tolerate running twice. Outcomes are only recorded while the
+claim holds: a worker that overran the timeout has its writes undone.
+"""
+import json
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from sqlalchemy import and_, delete, event, or_, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+
+from . import metrics, models
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+Handler = Callable[[Session, dict, Any], None]
+
+HANDLERS: Dict[str, Handler] = {}
+
+# Set when a commit queued jobs, so local runners do not wait for the next poll
+_wakeup = threading.Event()
+
+_ENQUEUED = "jobs_enqueued"
+
+
+class PermanentError(Exception):
+    """The job can never succeed; fail it without retrying."""
+
+
+class Retry(Exception):
+    """Retry the job with `payload` instead of its own, e.g. only the part that failed."""
+
+    def __init__(self, message: str, payload: dict):
+        super().__init__(message)
+        self.payload = payload
+
+
+class _LeaseLost(Exception):
+    pass
+
+
+def handler(kind: str):
+    """Register the decorated function as the handler of `kind` jobs."""
+
+    def register(func: Handler) -> Handler:
+        HANDLERS[kind] = func
+        return func
+
+    return register
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: dict,
+    priority: int = 0,
+    run_at: Optional[datetime] = None,
+    max_attempts: int = 5,
+) -> models.Job:
+    """Queue a job; it is saved, and runs, only if `db` commits."""
+    job = models.Job(
+        kind=kind,
+        payload=json.dumps(payload),
+        priority=priority,
+        max_attempts=max_attempts,
+        run_at=run_at or datetime.now(),
+    )
+    db.add(job)
+    db.info[_ENQUEUED] = True
+    return job
+
+
+def _after_commit(session: OrmSession):
+    if session.info.pop(_ENQUEUED, False):
+        _wakeup.set()
+
+
+def _after_soft_rollback(session: OrmSession, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(_ENQUEUED, None)
+
+
+def install():
+    """Wake the local runner when a commit queued jobs; see app.hooks."""
+    event.listen(OrmSession, "after_commit", _after_commit)
+    event.listen(OrmSession, "after_soft_rollback", _after_soft_rollback)
+
+
+class Runner:
+    def __init__(
+        self,
+        bind: Union[Engine, Connection],
+        workers: int = 2,
+        poll_interval: float = 1.0,
+        visibility_timeout: float = 60.0,
+        retry_delay: float = 5.0,
+        state: Any = None,
+    ):
+        self.bind = bind
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self.retry_delay = retry_delay
+        self.state = state
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self.run, name=f"jobs-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        _wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                # e.g. the database is unreachable; try again after the poll interval
+                print(f"Error running jobs: {str(e)}")
+            if _wakeup.wait(self.poll_interval):
+                _wakeup.clear()
+
+    def run_pending(self) -> int:
+        """Run due jobs until there are none left; the number run."""
+        count = 0
+        while self.run_once():
+            count += 1
+        return count
+
+    def run_once(self) -> bool:
+        """Claim and run the next due job; False when none is due."""
+        job = self.claim()
+        if job is None:
+            return False
+        self.execute(job)
+        return True
+
+    def claim(self) -> Optional[models.Job]:
+        now = datetime.now()
+        job = models.Job
+        due = or_(
+            and_(job.status == QUEUED, job.run_at <= now),
+            # Its worker died, or overran the visibility timeout
+            and_(job.status == RUNNING, job.locked_until < now),
+        )
+        with Session(self.bind) as db:
+            # Another worker may take the same candidate; only one UPDATE matches
+            for _ in range(3):
+                job_id = db.exec(
+                    select(job.id).where(due).order_by(job.priority.desc(), job.run_at, job.id).limit(1)
+                ).first()
+                if job_id is None:
+                    return None
+                claimed = db.exec(
+                    update(job)
+                    .where(job.id == job_id, due)
+                    .values(
+                        status=RUNNING,
+                        attempts=job.attempts + 1,
+                        locked_until=now + timedelta(seconds=self.visibility_timeout),
+                    )
+                    .returning(job.id, job.kind, job.payload, job.attempts, job.max_attempts, job.run_at)
+                ).first()
+                db.commit()
+                if claimed is not None:
+                    return models.Job(**claimed._asdict())
+        return None
+
+    def execute(self, job: models.Job):
+        metrics.JOB_QUEUE_LAG.labels(job.kind).observe(
+            max((datetime.now() - job.run_at).total_seconds(), 0)
+        )
+        start = time.perf_counter()
+        with Session(self.bind) as db:
+            try:
+                func = HANDLERS.get(job.kind)
+                if func is None:
+                    raise PermanentError(f"No handler for job kind '{job.kind}'")
+                # A savepoint, so a failing handler's writes can be undone on
+                # their own and the failure recorded in the same session
+                with db.begin_nested():
+                    func(db, json.loads(job.payload), self.state)
+                    if not self.finish(db, job, DONE):
+                        raise _LeaseLost()
+                outcome = "done"
+            except _LeaseLost:
+                # Overran the visibility timeout and the job was claimed
+                # again; the handler's writes are undone, the result is theirs
+                print(f"Job {job.id} ({job.kind}) was claimed by another worker")
+                outcome = "lost"
+            except Exception as e:
+                payload = e.payload if isinstance(e, Retry) else None
+                if isinstance(e, PermanentError) or job.attempts >= job.max_attempts:
+                    print(f"Job {job.id} ({job.kind}) failed after {job.attempts} attempts: {str(e)}")
+                    self.finish(db, job, FAILED, error=traceback.format_exc(), payload=payload)
+                    outcome = "failed"
+                else:
+                    print(f"Error running job {job.id} ({job.kind}), attempt {job.attempts}: {str(e)}")
+                    delay = self.retry_delay * 2 ** (job.attempts - 1)
+                    values = dict(
+                        status=QUEUED,
+                        run_at=datetime.now() + timedelta(seconds=delay),
+                        locked_until=None,
+                        last_error=traceback.format_exc()[-4000:],
+                    )
+                    if payload is not None:
+                        values["payload"] = json.dumps(payload)
+                    db.exec(update(models.Job).where(*self._held(job)).values(**values))
+                    outcome = "retried"
+            db.commit()
+        metrics.JOBS_PROCESSED.labels(job.kind, outcome).inc()
+        metrics.JOB_RUN_DURATION.labels(job.kind).observe(time.perf_counter() - start)
+
+    @staticmethod
+    def _held(job: models.Job) -> tuple:
+        """Criteria matching the job only while this claim of it still holds."""
+        return (
+            models.Job.id == job.id,
+            models.Job.status == RUNNING,
+            models.Job.attempts == job.attempts,
+        )
+
+    def finish(
+        self,
+        db: Session,
+        job: models.Job,
+        status: str,
+        error: Optional[str] = None,
+        payload: Optional[dict] = None,
+    ) -> bool:
+        """Record the outcome; False when another worker has claimed the job since."""
+        values = dict(
+            status=status,
+            locked_until=None,
+            finished_at=datetime.now(),
+            last_error=error[-4000:] if error else None,
+        )
+        if payload is not None:
+            values["payload"] = json.dumps(payload)
+        return db.exec(update(models.Job).where(*self._held(job)).values(**values)).rowcount > 0
+
+
+def purge(db: Session, retention: float) -> int:
+    """Delete jobs that finished more than `retention` seconds ago; the number deleted."""
+    cutoff = datetime.now() - timedelta(seconds=retention)
+    result = db.exec(
+        delete(models.Job).where(models.Job.status.in_([DONE, FAILED]), models.Job.finished_at < cutoff)
+    )
+    return result.rowcount
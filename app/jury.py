@@ -0,0 +1,137 @@
+"""Jury dashboard: a juror's assigned scholarships with counts per status.
+
+Jurors poll their dashboard constantly during evaluation, so each page is
+cached per juror as encoded JSON for a short time (JURY_DASHBOARD_TTL), in
+the app's dashboard cache (app.state.dashboard_cache, keyed by juror id,
+statuses, page and limit). A juror's entries are dropped, through the
+invalidation bus, when their jury links change or one of their scholarships
+changes status; create_app registers invalidate() for the cache.
+"""
+from typing import Iterable, List, Optional
+
+from pydantic import TypeAdapter
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from . import cache, invalidation, models, schemas, transitions
+
+dashboard_adapter = TypeAdapter(schemas.JuryDashboard)
+
+# Invalidation bus entity; ids are juror ids
+ENTITY = "juror"
+
+Link = models.ScholarshipJuryLink
+Scholarship = models.Scholarship
+
+
+def dashboard(
+    dashboard_cache: cache.TTLCache,
+    db: Session,
+    juror_id: str,
+    statuses: Optional[List[models.ScholarshipStatus]],
+    page: int,
+    limit: int,
+) -> bytes:
+    status_key = tuple(sorted(status.value for status in statuses)) if statuses else None
+    return dashboard_cache.get_or_set(
+        (juror_id, status_key, page, limit),
+        lambda: build_dashboard(db, juror_id, statuses, page, limit),
+    )
+
+
+def build_dashboard(
+    db: Session,
+    juror_id: str,
+    statuses: Optional[List[models.ScholarshipStatus]],
+    page: int,
+    limit: int,
+) -> bytes:
+    # Both queries start from the jury_id index on the link table
+    counts = {
+        models.ScholarshipStatus(status).value: count
+        for status, count in db.exec(
+            select(Scholarship.status, func.count())
+            .join(Link, Link.scholarship_id == Scholarship.id)
+            .where(Link.jury_id == juror_id)
+            .group_by(Scholarship.status)
+        ).all()
+    }
+
+    statement = (
+        select(
+            Scholarship.id,
+            Scholarship.name,
+            Scholarship.publisher,
+            Scholarship.type,
+            Scholarship.status,
+            Scholarship.deadline,
+            Scholarship.results_at,
+        )
+        .join(Link, Link.scholarship_id == Scholarship.id)
+        .where(Link.jury_id == juror_id)
+    )
+    if statuses:
+        statement = statement.where(Scholarship.status.in_(statuses))
+    rows = db.exec(
+        statement.order_by(Scholarship.deadline, Scholarship.id).offset((page - 1) * limit).limit(limit)
+    ).all()
+
+    total = (
+        sum(counts.get(status.value, 0) for status in set(statuses))
+        if statuses
+        else sum(counts.values())
+    )
+    return dashboard_adapter.dump_json(
+        schemas.JuryDashboard(
+            counts=counts,
+            total=total,
+            page=page,
+            limit=limit,
+            assignments=[
+                schemas.JuryAssignment(
+                    **{**row._asdict(), "status": models.ScholarshipStatus(row.status).value}
+                )
+                for row in rows
+            ],
+        )
+    )
+
+
+def invalidate(dashboard_cache: cache.TTLCache, juror_ids: Optional[Iterable[str]]):
+    """Drop these jurors' cached pages in this process (all of them for None)."""
+    if juror_ids is None:
+        dashboard_cache.invalidate()
+        return
+    juror_ids = set(juror_ids)
+    if juror_ids:
+        dashboard_cache.invalidate_where(lambda key: key[0] in juror_ids)
+
+
+def publish(db: Session, juror_ids: Iterable[str]):
+    """Drop these jurors' dashboards on every replica once `db` commits."""
+    invalidation.publish(db, ENTITY, juror_ids)
+
+
+def invalidate_scholarships(db: Session, scholarship_ids: Iterable[int]):
+    """Drop the dashboards of every juror assigned to these scholarships."""
+    scholarship_ids = list(scholarship_ids)
+    if not scholarship_ids:
+        return
+    publish(
+        db,
+        db.exec(select(Link.jury_id).where(Link.scholarship_id.in_(scholarship_ids))).all(),
+    )
+
+
+def _status_changed(
+    db: Session,
+    scholarship_ids: List[int],
+    source: models.ScholarshipStatus,
+    target: models.ScholarshipStatus,
+):
+    invalidate_scholarships(db, scholarship_ids)
+
+
+def install():
+    """Publish the jurors of scholarships that change status; see app.hooks."""
+    transitions.on_transition(_status_changed)
@@ -0,0 +1,31 @@
+"""Set-diff updates for many-to-many link tables.
+
+Replacing a relationship collection through the ORM deletes and re-inserts
+every link row. sync() reads the current links once, then runs one DELETE
+for the removed targets and one INSERT for the added ones. The statements
+run on the session's connection, so they bypass ORM events: callers expire
+the relationship afterwards and keep any derived data (e.g. stats) in sync.
+"""
+from typing import Any, Iterable, Set, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlmodel import Session
+
+
+def sync(
+    db: Session, owner: InstrumentedAttribute, target: InstrumentedAttribute, owner_id: Any, wanted: Iterable[Any]
+) -> Tuple[Set[Any], Set[Any]]:
+    """Make the owner's links point at exactly `wanted`; returns (added, removed)."""
+    table = owner.class_.__table__
+    connection = db.connection()
+    current = set(connection.execute(select(target).where(owner == owner_id)).scalars())
+    wanted = set(wanted)
+    added, removed = wanted - current, current - wanted
+    if removed:
+        connection.execute(delete(table).where(owner == owner_id, target.in_(removed)))
+    if added:
+        connection.execute(
+            insert(table), [{owner.key: owner_id, target.key: value} for value in sorted(added)]
+        )
+    return added, removed
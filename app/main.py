@@ -1,101 +1,63 @@
-import boto3
+import asyncio
+import functools
 import json
 import os
 import shutil
+import time
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError
 from starlette.middleware.sessions import SessionMiddleware
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Annotated, Optional, Dict
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Depends, Header, UploadFile, File, Form, Query
+from typing import Any, Callable, List, Annotated, Optional, Dict, Union
+from fastapi import APIRouter, FastAPI, Request, HTTPException, Depends, Header, UploadFile, File, Form, Query
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from sqlmodel import Session, SQLModel, select
+from sqlalchemy import or_
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select
+from sqlmodel.sql.expression import SelectOfScalar
 from .database import engine
-from . import models, schemas
+from . import admission, bulk_import, cache, config, database, details, export, extraction, hooks, idempotency, instrumentation, invalidation, jobs, links, metrics, models, projection, providers, schemas, serialization, singleflight, stats, transitions, uploads
+from . import jury as jury_dashboards
 from datetime import date, datetime
 from contextlib import asynccontextmanager
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
-from jwt import PyJWKClient
 from apscheduler.schedulers.background import BackgroundScheduler
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Startup event
-    SQLModel.metadata.create_all(engine)
-    yield
+router = APIRouter()
 
-QUEUE_URL = str(os.getenv("QUEUE_URL"))
-S3_BUCKET_NAME = str(os.getenv("S3_BUCKET_NAME", "bolsua-storage-dev"))
-DATABASE_URL = str(os.getenv("DATABASE_URL", "sqlite:///todo.db"))
-SECRET_KEY = str(os.getenv("SECRET_KEY", "K%!MaoL26XQe8iGAAyDrmbkw&bqE$hCPw4hSk!Hf"))
-REGION = str(os.getenv("REGION"))
-USER_POOL_ID = str(os.getenv("USER_POOL_ID"))
-FRONTEND_URL = str(os.getenv("FRONTEND_URL"))
-COGNITO_KEYS_URL = (
-    f"https://cognito-idp.{REGION}.amazonaws.com/{USER_POOL_ID}/.well-known/jwks.json"
-)
-APPLICATION_FILES_DIR = os.getenv("APPLICATION_FILES_DIR", "application_files")
-EDICT_FILES_DIR = os.getenv("EDICT_FILES_DIR", "edict_files")
+# Everything below is read from the app the request belongs to, which
+# create_app() builds from its own settings
+def get_engine(request: Request) -> Engine:
+    return request.app.state.engine
 
-os.makedirs(APPLICATION_FILES_DIR, exist_ok=True)
-os.makedirs(EDICT_FILES_DIR, exist_ok=True)
+EngineDep = Annotated[Engine, Depends(get_engine)]
 
-app = FastAPI(swagger_ui_parameters={"syntaxHighlight": True}, lifespan=lifespan)
+def get_aws(request: Request) -> providers.Providers:
+    return request.app.state.aws
 
-app.mount(
-    "/scholarships/edict_files",
-    StaticFiles(directory=EDICT_FILES_DIR),
-    name="edict_files",
-)
-app.mount(
-    "/scholarships/application_files",
-    StaticFiles(directory=APPLICATION_FILES_DIR),
-    name="application_files",
-)
+AwsDep = Annotated[providers.Providers, Depends(get_aws)]
 
-origins = [
-    "*",
-]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def get_app_settings(request: Request) -> config.Settings:
+    return request.app.state.settings
 
-app.add_middleware(SessionMiddleware, secret_key=SECRET_KEY)
-
-sqs = boto3.client(
-    'sqs',
-    region_name=REGION
-)
+SettingsDep = Annotated[config.Settings, Depends(get_app_settings)]
 
 # Dependency to get DB session
-def get_session():
+def get_session(engine: EngineDep):
     with Session(engine) as session:
         yield session
 
 
 oauth2_scheme = HTTPBearer()
 
-cognito_client = boto3.client('cognito-idp',
-    region_name=REGION
-)
-
-s3_client = boto3.client(
-    "s3",
-    region_name=REGION,
-)
-
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(oauth2_scheme)):
+def verify_token(aws: AwsDep, credentials: HTTPAuthorizationCredentials = Depends(oauth2_scheme)):
     token = credentials.credentials
 
     try:
-        # Fetch public keys from AWS Cognito
-        jwks_client = PyJWKClient(COGNITO_KEYS_URL)
-        signing_key = jwks_client.get_signing_key_from_jwt(token)
+        # Public keys from AWS Cognito (cached by the JWKS client)
+        signing_key = aws.jwks_client.get_signing_key_from_jwt(token)
 
         # Decode and validate the token
         payload = jwt.decode(token, signing_key.key, algorithms=["RS256"])
@@ -105,16 +67,15 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(oauth2_sche
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-def verify_token_string(token: str):
+def verify_token_string(aws: providers.Providers, token: str):
     if not token.startswith('Bearer '):
         return False, "Invalid token format"
     
     token = token.split(' ')[1]
 
     try:
-        # Fetch public keys from AWS Cognito
-        jwks_client = PyJWKClient(COGNITO_KEYS_URL)
-        signing_key = jwks_client.get_signing_key_from_jwt(token)
+        # Public keys from AWS Cognito (cached by the JWKS client)
+        signing_key = aws.jwks_client.get_signing_key_from_jwt(token)
 
         # Decode and validate the token
         payload = jwt.decode(token, signing_key.key, algorithms=["RS256"])
@@ -128,23 +89,40 @@ def verify_token_string(token: str):
 TokenDep = Annotated[Dict, Depends(verify_token)]
 SessionDep = Annotated[Session, Depends(get_session)]
 
-# Scheduler for deadline detection mecanism
-scheduler = BackgroundScheduler()
-backgroundTasks = BackgroundTasks()
+# Requests sent with an Idempotency-Key header run once per key and caller;
+# retries replay the stored response (see app/idempotency.py)
+async def claim_idempotency_key(
+    request: Request,
+    engine: EngineDep,
+    token: TokenDep,
+    idempotency_key: Optional[str] = Header(None),
+):
+    claim = await idempotency.claim(
+        request, engine, token.get("sub", ""), idempotency_key, request.app.state.settings
+    )
+    try:
+        yield claim
+    except Exception:
+        # Failed requests are not replayed; a retry runs them again
+        await claim.release()
+        raise
+
+IdempotencyDep = Annotated[idempotency.Claim, Depends(claim_idempotency_key)]
 
-async def get_user_groups(authorization: str = Header(None)):
+async def get_user_groups(aws: AwsDep, settings: SettingsDep, authorization: str = Header(None)):
     if not authorization:
         raise HTTPException(status_code=401, detail="No token provided")
     
-    valid, token = verify_token_string(authorization)
+    # A JWKS cache miss fetches the keys over the network
+    valid, token = await aws.run(verify_token_string, aws, authorization)
 
     if not valid:
         raise HTTPException(status_code=401, detail=token)
     
     try:
         # Get user's groups
-        groups_response = cognito_client.admin_list_groups_for_user(
-            UserPoolId=os.getenv('USER_POOL_ID'),
+        groups_response = await aws.cognito_async.admin_list_groups_for_user(
+            UserPoolId=settings.user_pool_id,
             Username=token['username']
         )
         
@@ -152,46 +130,212 @@ async def get_user_groups(authorization: str = Header(None)):
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token or user not found")
 
-def update_scholarship_status():
+@metrics.timed_job("update_scholarship_status")
+def update_scholarship_status(engine: Engine = engine):
     with Session(engine) as session:
         today = datetime.today().date()
-        scholarships = session.exec(
-            select(models.Scholarship).where(
+        deadline_passed = models.Scholarship.deadline < today
+        candidate_ids = session.exec(
+            select(models.Scholarship.id).where(
                 models.Scholarship.status == models.ScholarshipStatus.open,
-                models.Scholarship.deadline < today,
+                deadline_passed,
             )
         ).all()
 
-        for scholarship in scholarships:
-            message = {
+        # The status check is repeated inside the UPDATE, so a scholarship
+        # changed concurrently by an API call is never moved twice
+        moved_ids = transitions.transition(
+            session,
+            candidate_ids,
+            models.ScholarshipStatus.jury_evaluation,
+            expected=[models.ScholarshipStatus.open],
+            where=[deadline_passed],
+        )
+
+        scholarships = session.exec(
+            select(models.Scholarship)
+            .where(models.Scholarship.id.in_(moved_ids))
+            .options(selectinload(models.Scholarship.jury))
+        ).all() if moved_ids else []
+
+        # Queued with the status change, so a crash right after the commit
+        # cannot lose the notifications
+        queue_sqs_messages(session, [
+            {
                 "scholarship_id": scholarship.id,
                 "spots": scholarship.spots,
                 "jury_ids": [jury.id for jury in scholarship.jury],
                 "closed_at": scholarship.deadline.isoformat(),
             }
-            send_to_sqs(message)
-            scholarship.status = models.ScholarshipStatus.jury_evaluation
-            session.add(scholarship)
+            for scholarship in scholarships
+        ])
+        session.commit()
 
+
+@metrics.timed_job("recompute_stats")
+def recompute_stats(engine: Engine = engine):
+    with Session(engine) as session:
+        rows = stats.recompute(session)
         session.commit()
+    print(f"Recomputed {rows} statistics rows")
 
 
-scheduler.add_job(
-    update_scholarship_status, "interval", seconds=10
-) 
-scheduler.start()
+@metrics.timed_job("purge_idempotency_keys")
+def purge_idempotency_keys(engine: Engine, ttl: float):
+    with Session(engine) as session:
+        deleted = idempotency.purge(session, ttl)
+        session.commit()
+    if deleted:
+        print(f"Deleted {deleted} expired idempotency keys")
 
-def send_to_sqs(message: dict):
-    response = sqs.send_message(
-        QueueUrl=QUEUE_URL,
+
+@metrics.timed_job("purge_jobs")
+def purge_jobs(engine: Engine, retention: float):
+    with Session(engine) as session:
+        deleted = jobs.purge(session, retention)
+        session.commit()
+    if deleted:
+        print(f"Deleted {deleted} finished background jobs")
+
+
+@metrics.timed_job("extract_texts")
+def extract_texts(extractor: extraction.Extractor):
+    handled = extractor.run_until_idle()
+    if handled:
+        print(f"Extracted text from {handled} files")
+
+
+# Scheduler for deadline detection mecanism
+def create_scheduler(
+    engine: Engine, settings: config.Settings, extractor: Optional[extraction.Extractor] = None
+) -> BackgroundScheduler:
+    scheduler = BackgroundScheduler()
+    scheduler.add_job(
+        update_scholarship_status,
+        "interval",
+        seconds=10,
+        id="update_scholarship_status",
+        args=[engine],
+    )
+    scheduler.add_job(
+        recompute_stats,
+        "interval",
+        seconds=settings.stats_recompute_interval,
+        id="recompute_stats",
+        args=[engine],
+        # Also reconcile once at startup
+        next_run_time=datetime.now(),
+    )
+    scheduler.add_job(
+        purge_idempotency_keys,
+        "interval",
+        hours=1,
+        id="purge_idempotency_keys",
+        args=[engine, settings.idempotency_ttl],
+    )
+    scheduler.add_job(
+        purge_jobs,
+        "interval",
+        hours=1,
+        id="purge_jobs",
+        args=[engine, settings.jobs_retention],
+    )
+    if extractor is not None:
+        scheduler.add_job(
+            extract_texts,
+            "interval",
+            seconds=settings.extraction_interval,
+            id="extract_texts",
+            args=[extractor],
+        )
+    metrics.instrument_scheduler(scheduler)
+    return scheduler
+
+def apply_transition(
+    db: Session,
+    scholarship_id: int,
+    target: models.ScholarshipStatus,
+    expected: Optional[List[models.ScholarshipStatus]] = None,
+    changed_by: Optional[str] = None,
+):
+    try:
+        transitions.transition_one(db, scholarship_id, target, expected, changed_by)
+    except transitions.InvalidTransition as e:
+        raise HTTPException(status_code=404 if e.current is None else 400, detail=str(e))
+
+def send_to_sqs(aws: providers.Providers, queue_url: str, message: dict):
+    response = aws.sqs.send_message(
+        QueueUrl=queue_url,
         MessageBody=json.dumps(message),
     )
     print(f"Message sent to SQS: {response['MessageId']}")
     return response
 
-def read_sqs():
-    response = sqs.receive_message(
-        QueueUrl=QUEUE_URL,
+def send_batch_to_sqs(aws: providers.Providers, queue_url: str, messages: List[dict]):
+    """Send `messages`; returns the failed entries, whose Id is the message's index."""
+    # SQS accepts at most 10 entries per SendMessageBatch call
+    failed = []
+    for start in range(0, len(messages), 10):
+        entries = [
+            {"Id": str(start + index), "MessageBody": json.dumps(message)}
+            for index, message in enumerate(messages[start:start + 10])
+        ]
+        try:
+            response = aws.sqs.send_message_batch(QueueUrl=queue_url, Entries=entries)
+            failed.extend(response.get("Failed", []))
+        except Exception as e:
+            print(f"Error sending batch to SQS: {str(e)}")
+            failed.extend(entries)
+    print(f"Messages sent to SQS: {len(messages) - len(failed)}, failed: {len(failed)}")
+    return failed
+
+# Queue name -> the setting holding its URL
+SQS_QUEUES = {"jury": "queue_url", "review": "review_queue_url"}
+
+def queue_sqs_messages(db: Session, messages: List[dict], queue: str = "jury"):
+    """Send `messages` to an SQS queue in the background once `db` commits."""
+    if messages:
+        jobs.enqueue(db, "sqs_messages", {"queue": queue, "messages": messages})
+
+def queue_review_events(
+    db: Session,
+    settings: config.Settings,
+    scholarship_ids: List[int],
+    status: models.ScholarshipStatus,
+    reviewed_by: Optional[str],
+):
+    """Announce secretary decisions on REVIEW_QUEUE_URL, if one is configured."""
+    if not settings.review_queue_url:
+        return
+    reviewed_at = datetime.now().isoformat()
+    queue_sqs_messages(db, [
+        {
+            "event": "scholarship_reviewed",
+            "scholarship_id": scholarship_id,
+            "status": status.value,
+            "reviewed_by": reviewed_by,
+            "reviewed_at": reviewed_at,
+        }
+        for scholarship_id in scholarship_ids
+    ], queue="review")
+
+@jobs.handler("sqs_messages")
+def publish_sqs_messages(db: Session, payload: dict, state):
+    queue = payload.get("queue", "jury")
+    messages = payload["messages"]
+    queue_url = getattr(state.settings, SQS_QUEUES[queue])
+    failed = send_batch_to_sqs(state.aws, queue_url, messages)
+    if failed:
+        # Only the failed messages are sent again
+        remaining = [messages[int(entry["Id"])] for entry in failed]
+        raise jobs.Retry(
+            f"{len(failed)} of {len(messages)} SQS messages were not sent",
+            {"queue": queue, "messages": remaining},
+        )
+
+def read_sqs(aws: providers.Providers, queue_url: str):
+    response = aws.sqs.receive_message(
+        QueueUrl=queue_url,
         MaxNumberOfMessages=1,
         WaitTimeSeconds=5,
     )
@@ -201,38 +345,37 @@ def read_sqs():
         print(f"Scholarship ID: {body.get('scholarship_id')}, Timestamp: {body.get('timestamp')}")
     return response
 
-@app.get("/sqsTestSend")
-def testSend_sqs():
+@router.get("/sqsTestSend")
+def testSend_sqs(aws: AwsDep, settings: SettingsDep):
     message = { 
         "scholarship_id": 1,
         "timestamp": datetime.now().timestamp()
     }
-    send_to_sqs(message)
+    send_to_sqs(aws, settings.queue_url, message)
     return {"status": "ok"}
 
-@app.get("/sqsTestRead")
-def testRead_sqs():
-    return read_sqs()
+@router.get("/sqsTestRead")
+def testRead_sqs(aws: AwsDep, settings: SettingsDep):
+    return read_sqs(aws, settings.queue_url)
+
 
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return metrics.metrics_response()
 
-@app.get("/scholarships/health")
+
+@router.get("/scholarships/health")
 def health_check():
     return {"status": "ok"}
 
-@app.get("/scholarships/jury-members", response_model=List[schemas.UserBasic])
-async def get_jury_members(groups: List[str] = Depends(get_user_groups)):
-    """Get all jury members - only accessible by users in the 'proposals' group"""
-    
-    if 'proposers' not in groups:
-        raise HTTPException(
-            status_code=403,
-            detail="Only users in the proposers group can access this endpoint"
-        )
-    
-    try:
+# The jury group changes rarely; Cognito's answer is cached for
+# JURY_MEMBERS_TTL seconds (app.state.jury_members_cache) instead of listing
+# the group on every request
+def list_jury_members(state) -> List[schemas.UserBasic]:
+    def fetch():
         # List users with the 'jury' group filter
-        response = cognito_client.list_users_in_group(
-            UserPoolId=os.getenv('USER_POOL_ID'),
+        response = state.aws.cognito.list_users_in_group(
+            UserPoolId=state.settings.user_pool_id,
             GroupName='jury'
         )
 
@@ -242,62 +385,89 @@ async def get_jury_members(groups: List[str] = Depends(get_user_groups)):
                 attr['Name']: attr['Value']
                 for attr in user['Attributes']
             }
-            
+
             jury_members.append(schemas.UserBasic(
                 id=user['Username'],
                 name=attributes.get('name', user['Username'])
             ))
-            
+
         return jury_members
+
+    return state.jury_members_cache.get_or_set("jury", fetch)
+
+@router.get("/scholarships/jury-members", response_model=List[schemas.UserBasic])
+async def get_jury_members(request: Request, aws: AwsDep, groups: List[str] = Depends(get_user_groups)):
+    """Get all jury members - only accessible by users in the 'proposals' group"""
+    
+    if 'proposers' not in groups:
+        raise HTTPException(
+            status_code=403,
+            detail="Only users in the proposers group can access this endpoint"
+        )
+    
+    try:
+        return await aws.run(list_jury_members, request.app.state)
     except Exception:
         raise HTTPException(status_code=500, detail="Error fetching jury members")
 
-@app.put("/scholarships/{scholarship_id}/status/jury_evaluation")
+@router.put("/scholarships/{scholarship_id}/status/jury_evaluation")
 def update_scholarship_status_to_jury_evaluation(scholarship_id: int, db: SessionDep):
     # test function to update scholarship status to jury evaluation
+    apply_transition(db, scholarship_id, models.ScholarshipStatus.jury_evaluation)
     scholarship = db.get(models.Scholarship, scholarship_id)
-    if not scholarship:
-        raise HTTPException(status_code=404, detail="Scholarship not found")
-    
-    message = {
+
+    queue_sqs_messages(db, [{
         "scholarship_id": scholarship.id,
         "spots": scholarship.spots,
         "jury_ids": [jury.id for jury in scholarship.jury],
-        "closed_at": scholarship.deadline.isoformat(),
-    }
-    send_to_sqs(message)
-    scholarship.status = models.ScholarshipStatus.jury_evaluation
+        "closed_at": scholarship.deadline.isoformat() if scholarship.deadline else None,
+    }])
     db.commit()
-    db.refresh(scholarship)
     return {"message": "Scholarship status updated to jury evaluation", "scholarship": scholarship}
 
-@app.get("/scholarships/jury/{user_id}", response_model=List[schemas.Scholarship])
+# Endpoint for jurors to follow their assignments; always scoped to the caller
+@router.get("/scholarships/jury/dashboard", response_model=schemas.JuryDashboard)
+def get_jury_dashboard(
+    request: Request,
+    db: SessionDep,
+    token: TokenDep,
+    status: Optional[List[models.ScholarshipStatus]] = Query(None),
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+):
+    return serialization.ORJSONResponse(
+        jury_dashboards.dashboard(
+            request.app.state.dashboard_cache, db, token["username"], status, page, limit
+        )
+    )
+
+@router.get("/scholarships/jury/{user_id}", response_model=List[schemas.Scholarship])
 def get_scholarships_for_jury_member(
         db: SessionDep,
         token: TokenDep,
         user_id: str
     ):
+    # Jurors can only see their own assignments
+    if token.get("username") != user_id:
+        raise HTTPException(status_code=403, detail="You can only see your own assignments")
+
     # Retrieve scholarships that are currently under jury evaluation and assigned to the user
     statement = (
         select(models.Scholarship)
         .join(models.ScholarshipJuryLink)
-        .join(models.Jury)
         .where(
-            models.Jury.id == user_id,
+            models.ScholarshipJuryLink.jury_id == user_id,
             models.Scholarship.status == models.ScholarshipStatus.jury_evaluation,
         )
     )
     scholarships = db.exec(statement).all()
-    return scholarships
+    return serialization.scholarships_response(scholarships)
 
 
-# Endpoint to retrieve all scholarships
-@app.get("/scholarships", response_model=List[schemas.Scholarship])
-def get_scholarships(
-    db: SessionDep,
-    page: int = 1,
-    limit: int = 10,
+# Filters shared by the listing and export endpoints
+def scholarship_filters(
     name: Optional[str] = Query(None),
+    q: Optional[str] = Query(None, description="Search names, descriptions and the text of edicts and templates"),
     status: Optional[List[models.ScholarshipStatus]] = Query(None),
     scientific_areas: Optional[List[str]] = Query(None),
     publisher: Optional[str] = Query(None),
@@ -306,9 +476,6 @@ def get_scholarships(
     deadline_start: Optional[date] = Query(None),
     deadline_end: Optional[date] = Query(None),
 ):
-
-    offset = (page - 1) * limit
-
     statement = select(models.Scholarship)
 
     if status:
@@ -323,6 +490,23 @@ def get_scholarships(
 
     if name:
         statement = statement.where(models.Scholarship.name.ilike(f"%{name}%"))
+    if q:
+        # Subqueries rather than joins, so each scholarship still appears once
+        pattern = f"%{q}%"
+        statement = statement.where(
+            or_(
+                models.Scholarship.name.ilike(pattern),
+                models.Scholarship.description.ilike(pattern),
+                models.Scholarship.edict_id.in_(
+                    select(models.Edict.id).where(models.Edict.text_content.ilike(pattern))
+                ),
+                models.Scholarship.id.in_(
+                    select(models.DocumentTemplate.scholarship_id).where(
+                        models.DocumentTemplate.text_content.ilike(pattern)
+                    )
+                ),
+            )
+        )
     if publisher:
         statement = statement.where(models.Scholarship.publisher == publisher)
     if types:
@@ -346,21 +530,110 @@ def get_scholarships(
             .join(models.Jury)
             .where(models.Jury.name == jury_name)
         )
+    return statement
+
+
+ScholarshipFiltersDep = Annotated[SelectOfScalar, Depends(scholarship_filters)]
+
+
+def coalesced(request: Request, compute: Callable[[], bytes]) -> serialization.ORJSONResponse:
+    """Respond with compute(), run once for all identical requests in flight."""
+    route = getattr(request.scope.get("route"), "path", request.url.path)
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    # Identical concurrent reads share one computation (see app/singleflight.py)
+    flights = request.app.state.read_flights
+    return serialization.ORJSONResponse(flights.do(key, compute, label=route))
+
+
+# Endpoint to retrieve all scholarships
+# Documents every shape: full (default), view=summary and fields=...
+@router.get(
+    "/scholarships",
+    response_model=Union[
+        List[schemas.Scholarship], List[schemas.ScholarshipSummary], List[Dict[str, Any]]
+    ],
+)
+def get_scholarships(
+    request: Request,
+    db: SessionDep,
+    statement: ScholarshipFiltersDep,
+    page: int = 1,
+    limit: int = 10,
+    view: schemas.ScholarshipView = Query(schemas.ScholarshipView.full),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return; overrides view"),
+):
+
+    offset = (page - 1) * limit
     statement = statement.offset(offset).limit(limit)
 
-    results = db.exec(statement).all()
+    if fields is not None:
+        try:
+            fields = projection.parse_fields(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    def compute() -> bytes:
+        # Projections select only the needed columns and relationships
+        if fields is not None:
+            return serialization.dumps(projection.project(db, statement, fields))
+        if view == schemas.ScholarshipView.summary:
+            return serialization.summary_list_adapter.dump_json(projection.summaries(db, statement))
 
-    unique_scholarships = []
+        results = db.exec(statement.options(
+            selectinload(models.Scholarship.scientific_areas),
+            selectinload(models.Scholarship.jury),
+            selectinload(models.Scholarship.documents),
+            selectinload(models.Scholarship.edict),
+        )).all()
 
-    for scholarship in results:
-        if scholarship not in unique_scholarships:
-            unique_scholarships.append(scholarship)
+        unique_scholarships = []
 
-    return unique_scholarships
+        for scholarship in results:
+            if scholarship not in unique_scholarships:
+                unique_scholarships.append(scholarship)
 
+        return serialization.dump_scholarships(unique_scholarships)
 
-@app.get("/scholarships/filters", response_model=schemas.FilterOptionsResponse)
-def get_filter_options(db: SessionDep):
+    return coalesced(request, compute)
+
+
+# Endpoint to export the whole (filtered) catalog in one streamed response
+@router.get("/scholarships/export")
+def export_scholarships(
+    engine: EngineDep,
+    statement: ScholarshipFiltersDep,
+    export_format: schemas.ExportFormat = Query(schemas.ExportFormat.csv, alias="format"),
+):
+    # The stream opens its own session: request-scoped sessions are closed
+    # before a StreamingResponse body is sent
+    content, media_type = export.stream_export(engine, statement, export_format)
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="scholarships.{export_format.value}"'
+        },
+    )
+
+
+# Endpoint for administration dashboards, served from the summary table
+@router.get("/scholarships/stats", response_model=schemas.ScholarshipStats)
+def get_scholarship_stats(
+    db: SessionDep,
+    token: TokenDep,
+    weeks: int = Query(8, ge=1, le=52),
+):
+    return serialization.ORJSONResponse(
+        serialization.stats_adapter.dump_json(stats.read(db, weeks))
+    )
+
+
+@router.get("/scholarships/filters", response_model=schemas.FilterOptionsResponse)
+def get_filter_options(request: Request, db: SessionDep):
+    return coalesced(request, lambda: serialization.dumps(filter_options(db).model_dump()))
+
+
+def filter_options(db: Session) -> schemas.FilterOptionsResponse:
     # Retrieve distinct types of scholarships
     types = db.exec(select(models.Scholarship.type).distinct()).all()
     types = [t for t in types if t]  # Extract values from tuples and exclude None
@@ -392,20 +665,70 @@ def get_filter_options(db: SessionDep):
 
 
 # Endpoint to retrieve a single scholarship by ID
-@app.get("/scholarships/{id}/details", response_model=schemas.Scholarship)
-def get_scholarship(id: int, db: SessionDep):
-    statement = select(models.Scholarship).where(models.Scholarship.id == id)
-    result = db.exec(statement).first()
-    if result is None:
-        raise HTTPException(status_code=404, detail="Scholarship not found")
-    return result
+@router.get("/scholarships/{id}/details", response_model=schemas.Scholarship)
+def get_scholarship(request: Request, id: int, db: SessionDep):
+    def compute() -> bytes:
+        result = details.get(request.app.state.detail_cache, db, id)
+        if result is None:
+            raise HTTPException(status_code=404, detail="Scholarship not found")
+        return result
+
+    return coalesced(request, compute)
+
+
+# Endpoint to retrieve many scholarships by ID, in request order
+@router.get("/scholarships/batch", response_model=List[schemas.ScholarshipBatchItem])
+def get_scholarships_batch(request: Request, db: SessionDep, ids: List[str] = Query(...)):
+    # Accepts ?ids=1&ids=2 as well as ?ids=1,2
+    try:
+        ids = [int(value) for chunk in ids for value in chunk.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Scholarship ids must be integers.")
+    if not ids:
+        raise HTTPException(status_code=400, detail="At least one scholarship id is required.")
+    if len(ids) > details.BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {details.BATCH_MAX_IDS} ids per request."
+        )
+    detail_cache = request.app.state.detail_cache
+    return coalesced(request, lambda: details.dump_batch(ids, details.get_many(detail_cache, db, ids)))
+
+
+# Endpoint to get presigned POSTs for uploading files straight to S3
+@router.post("/scholarships/uploads", response_model=List[schemas.UploadTicket])
+async def create_uploads(
+    request: schemas.UploadRequest,
+    token: TokenDep,
+    aws: AwsDep,
+    settings: SettingsDep,
+    idempotent: IdempotencyDep,
+):
+    try:
+        tickets = await aws.run(uploads.presign, aws.s3, settings.s3_bucket_name, settings, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # A retry gets the same keys, so files already uploaded are not sent twice
+    return await idempotent.complete(tickets)
+
+
+async def verify_uploads(aws: providers.Providers, settings: config.Settings, keys: List[Optional[str]]):
+    """Check every uploaded key before anything is written."""
+    try:
+        await asyncio.gather(
+            *(aws.run(uploads.verify, aws.s3, settings.s3_bucket_name, settings, key) for key in keys if key)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 # Combined endpoint to create a proposal and upload required documents
-@app.post("/scholarships/proposals", response_model=schemas.Scholarship)
+@router.post("/scholarships/proposals", response_model=schemas.Scholarship)
 async def create_proposal(
     db: SessionDep,
     token: TokenDep,
+    aws: AwsDep,
+    settings: SettingsDep,
+    idempotent: IdempotencyDep,
     name: str = Form(...),
     description: Optional[str] = Form(None),
     publisher: str = Form(...),
@@ -414,12 +737,22 @@ async def create_proposal(
     jury: Optional[List[str]] = Form(None),
     deadline: Optional[date] = Form(None),
     scientific_areas: List[str] = Form(None),
-    edict_file: UploadFile = File(...),
+    edict_file: Optional[UploadFile] = File(None),
+    edict_key: Optional[str] = Form(None),
     document_file: Optional[List[UploadFile]] = File(None),
+    document_key: Optional[List[str]] = Form(None),
     document_name: Optional[List[str]] = Form(None),
     document_template: Optional[List[bool]] = Form(None),
     document_required: Optional[List[bool]] = Form(None),
 ):
+    if bool(edict_file) == bool(edict_key):
+        raise HTTPException(status_code=400, detail="Provide either edict_file or edict_key.")
+    await verify_uploads(aws, settings, [edict_key, *(document_key or [])])
+
+    # Everything below is written in one transaction, committed at the end: a
+    # failing step leaves nothing behind, so a retry with the same
+    # Idempotency-Key cannot create the proposal twice
+
     # Query the database for scientific areas based on the provided names
     associated_scientific_areas = []
     for area_name in scientific_areas or []:
@@ -432,8 +765,7 @@ async def create_proposal(
         else:
             new_area = models.ScientificArea(name=area_name)
             db.add(new_area)
-            db.commit()
-            db.refresh(new_area)
+            db.flush()
             associated_scientific_areas.append(new_area)
 
     if document_name:
@@ -454,7 +786,7 @@ async def create_proposal(
             )
 
     # Create an edict record
-    new_edict = await create_edict_record(db, edict_file)
+    new_edict = await create_edict_record(db, aws, settings, edict_file, key=edict_key, commit=False)
 
     associated_jury = []
 
@@ -465,8 +797,7 @@ async def create_proposal(
         if not jury:
             jury = models.Jury(id=juror.get("id"), name=juror["name"])
             db.add(jury)
-            db.commit()
-            db.refresh(jury)
+            db.flush()
 
         associated_jury.append(jury)
 
@@ -484,8 +815,8 @@ async def create_proposal(
         scientific_areas=associated_scientific_areas,
     )
     db.add(new_proposal)
-    db.commit()
-    db.refresh(new_proposal)
+    jury_dashboards.publish(db, [juror.id for juror in associated_jury])
+    db.flush()
 
     if new_proposal.id is None:
         raise HTTPException(status_code=500, detail="Failed to retrieve proposal ID.")
@@ -493,22 +824,56 @@ async def create_proposal(
     # Update document file(s) if provided and not empty
     for idx, name in enumerate(document_name or []):
         file = document_file[idx] if document_file else None
+        key = document_key[idx] if document_key and idx < len(document_key) else None
         required_flag = (
             document_required[idx] if document_required else False
         )  # Default to False if not provided
         template_flag = (
             document_template[idx] if document_template else False
         )  # Default to False if not provided
-        await create_document(db, new_proposal.id, file, name, required_flag, template_flag)
+        await create_document(
+            db, aws, settings, new_proposal.id, file, name, required_flag, template_flag,
+            key=key, commit=False,
+        )
 
-    return new_proposal
+    db.commit()
+    db.refresh(new_proposal)
+    return await idempotent.complete(serialization.scholarship_response(new_proposal))
+
+
+# Endpoint to import many proposals from a manifest and a ZIP of files
+@router.post("/scholarships/proposals/import", response_model=schemas.ImportReport)
+async def import_proposals(
+    db: SessionDep,
+    token: TokenDep,
+    aws: AwsDep,
+    settings: SettingsDep,
+    idempotent: IdempotencyDep,
+    manifest: UploadFile = File(...),
+    files: Optional[UploadFile] = File(None),
+    dry_run: bool = Form(False),
+):
+    try:
+        report = await bulk_import.import_proposals(
+            db,
+            await manifest.read(),
+            manifest.filename or "",
+            files.file if files else None,
+            bulk_import.s3_uploader(aws, settings.s3_bucket_name),
+            dry_run,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await idempotent.complete(report)
 
 
 # Endpoint to update an existing proposal
-@app.put("/scholarships/proposals/{proposal_id}", response_model=schemas.Scholarship)
-def update_proposal(
+@router.put("/scholarships/proposals/{proposal_id}", response_model=schemas.Scholarship)
+async def update_proposal(
     db: SessionDep,
     token: TokenDep,
+    aws: AwsDep,
+    settings: SettingsDep,
     proposal_id: int,
     name: Optional[str] = Form(None),
     jury: Optional[List[str]] = Form(None),
@@ -518,15 +883,21 @@ def update_proposal(
     publisher: Optional[str] = Form(None),
     description: Optional[str] = Form(None),
     edict_file: Optional[UploadFile] = File(None),
+    edict_key: Optional[str] = Form(None),
     document_file: Optional[List[UploadFile]] = File(None),
+    document_key: Optional[List[str]] = Form(None),
+    document_id: Optional[List[str]] = Form(None),
     document_name: Optional[List[str]] = Form(None),
     document_template: Optional[List[bool]] = Form(None),
     document_required: Optional[List[bool]] = Form(None),
+    remove_document_id: Optional[List[int]] = Form(None),
     scientific_areas: Optional[List[str]] = Form(None),
 ):
     proposal = db.get(models.Scholarship, proposal_id)
     if not proposal:
         raise HTTPException(status_code=404, detail="Proposal not found")
+    if edict_file and edict_key:
+        raise HTTPException(status_code=400, detail="Provide either edict_file or edict_key.")
 
     if document_name:
         num_files = len(document_name)
@@ -546,15 +917,42 @@ def update_proposal(
                 detail="Number of 'required' flags must match number of documents.",
             )
 
+    # Documents are matched by id: entries with an empty document_id are added,
+    # the others replace that document; remove_document_id lists the ones to drop
+    documents: Dict[int, models.DocumentTemplate] = {}
+    document_ids: List[Optional[int]] = []
+    if document_name or remove_document_id:
+        documents = {
+            document.id: document
+            for document in db.exec(
+                select(models.DocumentTemplate).where(
+                    models.DocumentTemplate.scholarship_id == proposal.id
+                )
+            ).all()
+        }
+        try:
+            document_ids = [int(value) if value else None for value in document_id or []]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Document ids must be integers.")
+        for value in [*document_ids, *(remove_document_id or [])]:
+            if value is not None and value not in documents:
+                raise HTTPException(status_code=404, detail=f"Document with id {value} not found")
+
+    # Look up every juror at once before changing anything
+    if jury is not None:
+        found = set(db.exec(select(models.Jury.id).where(models.Jury.id.in_(jury))).all())
+        for jury_id in jury:
+            if jury_id not in found:
+                raise HTTPException(
+                    status_code=404, detail=f"Jury with id {jury_id} not found"
+                )
+
+    await verify_uploads(aws, settings, [edict_key, *(document_key or [])])
+
     if deadline is not None:
         try:
             # Assuming the deadline is in 'YYYY-MM-DD' format
-            deadline_datetime = datetime.strptime(deadline, "%Y-%m-%d")
-            proposal.deadline = (
-                deadline_datetime
-                if deadline_datetime is not None
-                else proposal.deadline
-            )
+            proposal.deadline = datetime.strptime(deadline, "%Y-%m-%d").date()
         except ValueError:
             raise HTTPException(
                 status_code=400,
@@ -568,58 +966,93 @@ def update_proposal(
     )
     proposal.publisher = publisher if publisher is not None else proposal.publisher
     proposal.type = type if type is not None else proposal.type
-    proposal.status = (
-        models.ScholarshipStatus(status) if status is not None else proposal.status
-    )
+
+    if status is not None:
+        try:
+            new_status = models.ScholarshipStatus(status)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid status '{status}'.")
+        if new_status != proposal.status:
+            apply_transition(
+                db,
+                proposal.id,
+                new_status,
+                expected=[models.ScholarshipStatus(proposal.status)],
+                changed_by=token.get("username"),
+            )
+
+    # Write the field changes before the link tables, which bypass the ORM
+    db.flush()
 
     if scientific_areas:
-        proposal.scientific_areas.clear()
-        for area_name in scientific_areas:
-            area = db.exec(
-                select(models.ScientificArea).where(
-                    models.ScientificArea.name == area_name
-                )
-            ).first()
-            if not area:
-                # Create new scientific area if it doesn't exist
-                area = models.ScientificArea(name=area_name)
-                db.add(area)
-                db.commit()
-                db.refresh(area)
-            proposal.scientific_areas.append(area)
+        areas = bulk_import.resolve_areas(db, scientific_areas)
+        added, removed = links.sync(
+            db,
+            models.ScholarshipScientificAreaLink.scholarship_id,
+            models.ScholarshipScientificAreaLink.scientific_area_id,
+            proposal.id,
+            (area.id for area in areas.values()),
+        )
+        stats.areas_changed(db.connection(), proposal.id, added, removed)
+        db.expire(proposal, ["scientific_areas"])
 
     if jury is not None:
-        proposal.jury.clear()
-        for jury_id in jury:
-            jury = db.get(models.Jury, jury_id)
-            if not jury:
-                raise HTTPException(
-                    status_code=404, detail=f"Jury with id {jury_id} not found"
-                )
-            proposal.jury.append(jury)
+        added, removed = links.sync(
+            db,
+            models.ScholarshipJuryLink.scholarship_id,
+            models.ScholarshipJuryLink.jury_id,
+            proposal.id,
+            jury,
+        )
+        jury_dashboards.publish(db, added | removed)
+        db.expire(proposal, ["jury"])
 
     # Update edict file if provided and not empty
-    if edict_file:
-        create_edict_record(db, edict_file)
-
-    # Update document file(s) if provided and not empty
-    for idx, name in enumerate(document_name or []):
-        file = document_file[idx] if document_file else None
-        required_flag = (
-            document_required[idx] if document_required else False
-        )  # Default to False if not provided
-        template_flag = (
-            document_template[idx] if document_template else False
-        )  # Default to False if not provided
-        create_document(db, proposal.id, file, name, required_flag, template_flag)
+    if edict_file or edict_key:
+        new_edict = await create_edict_record(db, aws, settings, edict_file, key=edict_key, commit=False)
+        proposal.edict_id = new_edict.id
 
+    # Upload the document files concurrently, then write every change at once
+    if document_name:
+        entries = [
+            (
+                document_ids[idx] if idx < len(document_ids) else None,
+                document_file[idx] if document_file and idx < len(document_file) else None,
+                document_key[idx] if document_key and idx < len(document_key) else None,
+            )
+            for idx in range(len(document_name))
+        ]
+        # Only templates keep a file
+        uploads = {
+            idx: uploaded_file_url(aws, settings, file, key)
+            for idx, (_, file, key) in enumerate(entries)
+            if document_template[idx]
+        }
+        urls = dict(zip(uploads, await asyncio.gather(*uploads.values())))
+        for idx, (name, (existing_id, _, _)) in enumerate(zip(document_name, entries)):
+            url = urls.get(idx)
+            document = documents.get(existing_id) if existing_id is not None else None
+            if document is None:
+                document = models.DocumentTemplate(scholarship_id=proposal.id, name=name, file_path="")
+            document.name = name
+            document.required = document_required[idx]
+            document.template = document_template[idx]
+            if not document.template:
+                document.file_path = ""
+            elif url:
+                document.file_path = url
+            db.add(document)
+    for value in remove_document_id or []:
+        db.delete(documents[value])
+
+    details.mark(db, [proposal.id])
     db.commit()
     db.refresh(proposal)
-    return proposal
+    return serialization.scholarship_response(proposal)
 
 
 # Endpoint to submit a proposal for review
-@app.post("/scholarships/proposals/{proposal_id}/submit", response_model=dict)
+@router.post("/scholarships/proposals/{proposal_id}/submit", response_model=dict)
 def submit_proposal(proposal_id: int, db: SessionDep, token: TokenDep):
     proposal = db.get(models.Scholarship, proposal_id)
     if not proposal:
@@ -666,34 +1099,122 @@ def submit_proposal(proposal_id: int, db: SessionDep, token: TokenDep):
             detail="At least one document must be associated if the proposal.",
         )
 
-    proposal.status = models.ScholarshipStatus.under_review
+    # Re-checked atomically: the proposal may have changed since it was read
+    try:
+        transitions.transition_one(
+            db,
+            proposal_id,
+            models.ScholarshipStatus.under_review,
+            expected=[models.ScholarshipStatus.draft, models.ScholarshipStatus.under_review],
+            changed_by=token.get("username"),
+        )
+    except transitions.InvalidTransition:
+        raise HTTPException(
+            status_code=400,
+            detail="Cannot submit a proposal that is not in draft or under review status.",
+        )
     db.commit()
     return {"message": "Proposal submitted successfully. It will be reviewed shortly."}
 
-@app.put("/scholarships/secretary/status")
-def accept_sholarship_proposal(scholarship_id: int, accepted: bool, db: SessionDep, token: TokenDep):
-    # update scholarship status to under review
+@router.put("/scholarships/secretary/status")
+def accept_sholarship_proposal(
+    scholarship_id: int, accepted: bool, db: SessionDep, token: TokenDep, settings: SettingsDep
+):
+    # Approve (open) or send back to draft a proposal that is under review
+    new_status = models.ScholarshipStatus.open if accepted else models.ScholarshipStatus.draft
+    apply_transition(
+        db,
+        scholarship_id,
+        new_status,
+        expected=[models.ScholarshipStatus.under_review],
+        changed_by=token.get("username"),
+    )
+    queue_review_events(db, settings, [scholarship_id], new_status, token.get("username"))
+    db.commit()
     scholarship = db.get(models.Scholarship, scholarship_id)
-    if not scholarship:
-        raise HTTPException(status_code=404, detail="Scholarship not found")
-    
-    if accepted:
-        scholarship.status = models.ScholarshipStatus.open
-    else:
-        scholarship.status = models.ScholarshipStatus.draft
+    return {"message": "Scholarship status updated to under evalution (secretary)", "scholarship": scholarship}
 
+@router.put("/scholarships/secretary/status/bulk", response_model=schemas.BulkReviewResponse)
+def bulk_review_proposals(
+    request: schemas.BulkReviewRequest, db: SessionDep, token: TokenDep, settings: SettingsDep
+):
+    ids = list(dict.fromkeys(request.scholarship_ids))
+    new_status = (
+        models.ScholarshipStatus.open if request.accepted else models.ScholarshipStatus.draft
+    )
+
+    # One UPDATE for the whole batch; only proposals still under review move
+    updated_ids = set(
+        transitions.transition(
+            db,
+            ids,
+            new_status,
+            expected=[models.ScholarshipStatus.under_review],
+            changed_by=token.get("username"),
+        )
+    )
+    queue_review_events(
+        db,
+        settings,
+        [scholarship_id for scholarship_id in ids if scholarship_id in updated_ids],
+        new_status,
+        token.get("username"),
+    )
     db.commit()
-    db.refresh(scholarship)
-    return {"message": "Scholarship status updated to under evalution (secretary)", "scholarship": scholarship}
 
-@app.get("/scholarships/secretary/under_review", response_model=List[schemas.Scholarship])
-def get_scholarships_under_review(db: SessionDep, token: TokenDep):
-    # Query the database for scholarships with the status 'under_review'
+    # Work out why the remaining ids were skipped
+    current_statuses = dict(
+        db.exec(
+            select(models.Scholarship.id, models.Scholarship.status).where(
+                models.Scholarship.id.in_(set(ids) - updated_ids)
+            )
+        ).all()
+    ) if len(updated_ids) < len(ids) else {}
+
+    results = []
+    for scholarship_id in ids:
+        if scholarship_id in updated_ids:
+            results.append(schemas.BulkReviewResult(
+                id=scholarship_id, status=new_status.value, success=True
+            ))
+        elif scholarship_id in current_statuses:
+            status = models.ScholarshipStatus(current_statuses[scholarship_id])
+            results.append(schemas.BulkReviewResult(
+                id=scholarship_id,
+                status=status.value,
+                success=False,
+                detail=f"Scholarship is not under review (current status: {status.value})",
+            ))
+        else:
+            results.append(schemas.BulkReviewResult(
+                id=scholarship_id, success=False, detail="Scholarship not found"
+            ))
+
+    return schemas.BulkReviewResponse(updated=len(updated_ids), results=results)
+
+@router.get("/scholarships/secretary/under_review", response_model=List[schemas.Scholarship])
+def get_scholarships_under_review(
+    db: SessionDep,
+    token: TokenDep,
+    page: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=500),
+):
+    # Query the database for scholarships with the status 'under_review',
+    # oldest first, loading the relationships for the whole page at once
     scholarships = (
         db.exec(select(models.Scholarship)
-        .where(models.Scholarship.status == models.ScholarshipStatus.under_review))
-    )
-    return scholarships
+        .where(models.Scholarship.status == models.ScholarshipStatus.under_review)
+        .order_by(models.Scholarship.created_at, models.Scholarship.id)
+        .offset((page - 1) * limit)
+        .limit(limit)
+        .options(
+            selectinload(models.Scholarship.scientific_areas),
+            selectinload(models.Scholarship.jury),
+            selectinload(models.Scholarship.documents),
+            selectinload(models.Scholarship.edict),
+        ))
+    ).all()
+    return serialization.scholarships_response(scholarships)
 
 def get_filename_without_extension(file: Optional[UploadFile]) -> Optional[str]:
     if file is None or file.filename is None:
@@ -702,33 +1223,32 @@ def get_filename_without_extension(file: Optional[UploadFile]) -> Optional[str]:
     filename, _ = os.path.splitext(file.filename)
     return filename
 
-def get_file_url(filename: str) -> str:
+def get_file_url(aws: providers.Providers, settings: config.Settings, filename: str) -> str:
     try:
         print("Getting file URL: ", filename)
         # Generate pre-signed URL - this is synchronous
-        url = s3_client.generate_presigned_url(
+        url = aws.s3.generate_presigned_url(
             "get_object",
-            Params={"Bucket": S3_BUCKET_NAME, "Key": filename},
+            Params={"Bucket": settings.s3_bucket_name, "Key": filename},
             ExpiresIn=100000,
         )
         return url
-    except s3_client.exceptions.NoSuchKey:
+    except aws.s3.exceptions.NoSuchKey:
         raise HTTPException(status_code=404, detail=f"File {filename} not found in bucket.")
     except (NoCredentialsError, PartialCredentialsError):
         raise HTTPException(status_code=500, detail="Invalid AWS credentials")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def save_file(file: UploadFile) -> str:
+async def save_file(aws: providers.Providers, settings: config.Settings, file: UploadFile) -> str:
     if not file.filename:
         raise HTTPException(status_code=400, detail="File must have a valid filename.")
     
     try:
         file_content = await file.read()  # This needs to be awaited as it's from FastAPI
         key = str(file.filename)
-        # This is synchronous and doesn't need await
-        s3_client.put_object(
-            Bucket=str(S3_BUCKET_NAME),
+        await aws.s3_async.put_object(
+            Bucket=str(settings.s3_bucket_name),
             Key=key,
             Body=file_content
         )
@@ -738,26 +1258,49 @@ async def save_file(file: UploadFile) -> str:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
 
+async def uploaded_file_url(
+    aws: providers.Providers, settings: config.Settings, file: Optional[UploadFile], key: Optional[str]
+) -> Optional[str]:
+    """URL of an already verified upload key, or of `file` once saved; None without either."""
+    if key:
+        return get_file_url(aws, settings, key)
+    if file:
+        return get_file_url(aws, settings, await save_file(aws, settings, file))
+    return None
+
 async def create_edict_record(
-    db: Session, edict_file: UploadFile, name: Optional[str] = None
+    db: Session,
+    aws: providers.Providers,
+    settings: config.Settings,
+    edict_file: Optional[UploadFile],
+    name: Optional[str] = None,
+    key: Optional[str] = None,
+    commit: bool = True,
 ) -> models.Edict:
-    if not edict_file:
+    if not edict_file and not key:
         raise HTTPException(status_code=400, detail="Edict file is required")
 
     edict_name = (
-        name or get_filename_without_extension(edict_file) or "default_filename"
+        name
+        or (os.path.splitext(uploads.filename_from_key(key))[0] if key else None)
+        or get_filename_without_extension(edict_file)
+        or "default_filename"
     )
 
     try:
-        # Save the edict file
-        edict_file_location = await save_file(edict_file)  # This is still async because of file.read()
-        file_url = get_file_url(edict_file_location)  # No await here
+        # Save the edict file, unless it was uploaded straight to S3 (already verified)
+        edict_file_location = key or await save_file(aws, settings, edict_file)
+        file_url = get_file_url(aws, settings, edict_file_location)  # No await here
 
         # Create the edict record
         new_edict = models.Edict(name=edict_name, file_path=file_url)
         db.add(new_edict)
-        db.commit()
-        db.refresh(new_edict)
+        if commit:
+            db.commit()
+            db.refresh(new_edict)
+        else:
+            # Part of the caller's transaction; flushed for its id
+            db.flush()
         return new_edict
     except Exception as e:
         db.rollback()
@@ -766,18 +1309,22 @@ async def create_edict_record(
 
 async def create_document(
     db: Session,
+    aws: providers.Providers,
+    settings: config.Settings,
     proposal_id: int,
     file: Optional[UploadFile],
     name: str,
     required: bool = True,
     template: bool = True,
+    key: Optional[str] = None,
+    commit: bool = True,
 ) -> models.DocumentTemplate:
     file_location = ""
     file_url = ""
     
     if template:
-        file_location = await save_file(file)  # This remains async
-        file_url = get_file_url(file_location)  # No await here
+        file_location = key or await save_file(aws, settings, file)
+        file_url = get_file_url(aws, settings, file_location)  # No await here
 
     new_document = models.DocumentTemplate(
         scholarship_id=proposal_id,
@@ -787,6 +1334,145 @@ async def create_document(
         template=template,
     )
     db.add(new_document)
-    db.commit()
-    db.refresh(new_document)
+    if commit:
+        db.commit()
+        db.refresh(new_document)
+    else:
+        db.flush()
     return new_document
+
+
+def _warm_up(name: str, func):
+    start = time.perf_counter()
+    try:
+        func()
+        print(f"Warm-up '{name}' done in {time.perf_counter() - start:.2f}s")
+    except Exception as e:
+        print(f"Warm-up '{name}' failed: {str(e)}")
+
+
+async def warm_up(app: FastAPI):
+    settings = app.state.settings
+    tasks = {}
+    if settings.warm_jwks:
+        tasks["jwks"] = app.state.aws.jwks_client.get_signing_keys
+    if settings.warm_jury_cache:
+        tasks["jury_members"] = lambda: list_jury_members(app.state)
+    if not tasks:
+        return
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(*(asyncio.to_thread(_warm_up, name, func) for name, func in tasks.items())),
+            timeout=settings.warm_up_timeout,
+        )
+    except asyncio.TimeoutError:
+        # Serve anyway; whatever is still warming up finishes in the background
+        print(f"Warm-up did not finish within {settings.warm_up_timeout}s")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup event
+    settings = app.state.settings
+    os.makedirs(settings.application_files_dir, exist_ok=True)
+    os.makedirs(settings.edict_files_dir, exist_ok=True)
+    await asyncio.to_thread(database.create_all, app.state.engine)
+    await warm_up(app)
+
+    app.state.scheduler = None
+    app.state.extractor = None
+    if settings.scheduler_enabled:
+        if settings.extraction_enabled:
+            app.state.extractor = extraction.create_extractor(settings, app.state.engine, app.state.aws)
+        app.state.scheduler = create_scheduler(app.state.engine, settings, app.state.extractor)
+        app.state.scheduler.start()
+
+    # Side effects queued by requests and jobs (see app/jobs.py)
+    app.state.job_runner = None
+    if settings.jobs_enabled:
+        app.state.job_runner = jobs.Runner(
+            app.state.engine,
+            workers=settings.jobs_workers,
+            poll_interval=settings.jobs_poll_interval,
+            visibility_timeout=settings.jobs_visibility_timeout,
+            retry_delay=settings.jobs_retry_delay,
+            state=app.state,
+        )
+        app.state.job_runner.start()
+
+    # Other replicas' changes reach this process's caches through LISTEN;
+    # SQLite deployments are single-process and only need local eviction
+    app.state.invalidation_listener = None
+    if settings.invalidation_listener and app.state.engine.dialect.name == "postgresql":
+        app.state.invalidation_listener = invalidation.Listener(
+            app.state.engine, settings.cache_max_staleness
+        )
+        app.state.invalidation_listener.start()
+    yield
+    if app.state.invalidation_listener is not None:
+        app.state.invalidation_listener.stop()
+    if app.state.scheduler is not None:
+        app.state.scheduler.shutdown(wait=False)
+    if app.state.job_runner is not None:
+        app.state.job_runner.stop()
+    if app.state.extractor is not None:
+        app.state.extractor.shutdown()
+    app.state.aws.shutdown()
+
+
+def create_app(settings: Optional[config.Settings] = None) -> FastAPI:
+    settings = settings or config.get_settings()
+    hooks.install()
+
+    app = FastAPI(swagger_ui_parameters={"syntaxHighlight": True}, lifespan=lifespan)
+    app.state.settings = settings
+    app.state.engine = database.get_engine(settings.database_url)
+    # Clients are only created when first used
+    app.state.aws = providers.from_settings(settings)
+    app.state.jury_members_cache = cache.TTLCache(ttl=settings.jury_members_ttl)
+    app.state.detail_cache = cache.TTLCache(ttl=settings.detail_cache_ttl, maxsize=10000)
+    invalidation.register(details.ENTITY, functools.partial(details.evict, app.state.detail_cache))
+    app.state.dashboard_cache = cache.TTLCache(ttl=settings.jury_dashboard_ttl, maxsize=10000)
+    invalidation.register(
+        jury_dashboards.ENTITY, functools.partial(jury_dashboards.invalidate, app.state.dashboard_cache)
+    )
+    app.state.read_flights = singleflight.Group(timeout=settings.coalesce_timeout)
+    instrumentation.instrument_engine(app.state.engine)
+
+    # The directories are created in the lifespan
+    app.mount(
+        "/scholarships/edict_files",
+        StaticFiles(directory=settings.edict_files_dir, check_dir=False),
+        name="edict_files",
+    )
+    app.mount(
+        "/scholarships/application_files",
+        StaticFiles(directory=settings.application_files_dir, check_dir=False),
+        name="application_files",
+    )
+
+    # Innermost, so rejections still carry CORS headers and are measured
+    if settings.admission_enabled:
+        app.add_middleware(admission.AdmissionMiddleware, settings=settings)
+
+    origins = [
+        "*",
+    ]
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    app.add_middleware(SessionMiddleware, secret_key=settings.secret_key)
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    app.add_exception_handler(idempotency.Replay, idempotency.replay_handler)
+    app.include_router(router)
+    return app
+
+
+app = create_app()
@@ -0,0 +1,221 @@
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from apscheduler.events import EVENT_JOB_SUBMITTED
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from starlette.responses import Response
+
+from .instrumentation import RequestStats, check_query_budget, on_query, request_stats
+
+# Metrics live in this module (imported once) so reloading app.main does not
+# register them twice
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries issued per request",
+    ["route"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+REQUEST_QUERY_TIME = Histogram(
+    "http_request_db_query_seconds",
+    "Time spent in database queries per request",
+    ["route"],
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Latency of individual database statements",
+)
+AWS_CALL_LATENCY = Histogram(
+    "aws_call_duration_seconds",
+    "Latency of boto3 calls",
+    ["service", "operation"],
+)
+AWS_CALL_ERRORS = Counter(
+    "aws_call_errors_total",
+    "Failed boto3 calls",
+    ["service", "operation"],
+)
+JOB_DURATION = Histogram(
+    "scheduler_job_duration_seconds",
+    "Duration of scheduled jobs",
+    ["job"],
+)
+JOB_LAG = Gauge(
+    "scheduler_job_lag_seconds",
+    "Delay between a job's scheduled run time and its submission",
+    ["job"],
+)
+JOB_LAST_SUCCESS = Gauge(
+    "scheduler_job_last_success_timestamp_seconds",
+    "Unix time of the last successful run of a job",
+    ["job"],
+)
+QUEUE_MESSAGES = Counter(
+    "queue_messages_total",
+    "Messages handled by the results consumer",
+    ["type", "outcome"],
+)
+SINGLEFLIGHT_CALLS = Counter(
+    "singleflight_calls_total",
+    "Coalesced read requests: leader ran the query, shared reused a result in flight, timeout gave up waiting",
+    ["route", "outcome"],
+)
+CACHE_INVALIDATIONS = Counter(
+    "cache_invalidations_total",
+    "Cache evictions by entity and source (local commit, remote NOTIFY, listener reconnects)",
+    ["entity", "source"],
+)
+CACHE_INVALIDATION_LAG = Histogram(
+    "cache_invalidation_lag_seconds",
+    "Delay between publishing an invalidation and another process receiving it",
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight_requests",
+    "Requests being served per admission class",
+    ["class"],
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "admission_queue_depth",
+    "Requests waiting for a slot per admission class",
+    ["class"],
+)
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total",
+    "Requests refused by admission control (queue_full, timeout, body_too_large)",
+    ["class", "reason"],
+)
+TEXT_EXTRACTIONS = Counter(
+    "text_extractions_total",
+    "Edict and document text extractions by outcome (done, retried, failed, skipped)",
+    ["kind", "outcome"],
+)
+TEXT_EXTRACTION_LATENCY = Histogram(
+    "text_extraction_duration_seconds",
+    "Time spent parsing one file in the extraction process pool",
+    ["kind"],
+)
+JOBS_PROCESSED = Counter(
+    "background_jobs_total",
+    "Background jobs run, by kind and outcome (done, retried, failed)",
+    ["kind", "outcome"],
+)
+JOB_QUEUE_LAG = Histogram(
+    "background_job_lag_seconds",
+    "Delay between a background job becoming due and a worker starting it",
+    ["kind"],
+)
+JOB_RUN_DURATION = Histogram(
+    "background_job_duration_seconds",
+    "Time spent running one background job",
+    ["kind"],
+)
+QUEUE_HANDLER_LATENCY = Histogram(
+    "queue_handler_duration_seconds",
+    "Time spent handling one queue message",
+    ["type"],
+)
+
+
+class MetricsMiddleware:
+    """Times each HTTP request and records the database work it caused."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope=scope)
+        token = request_stats.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            request_stats.reset(token)
+            REQUEST_LATENCY.labels(scope["method"], stats.route, str(status)).observe(elapsed)
+            REQUEST_QUERIES.labels(stats.route).observe(stats.queries)
+            REQUEST_QUERY_TIME.labels(stats.route).observe(stats.query_time)
+        check_query_budget(stats)
+
+
+@on_query
+def _observe_query(statement, parameters, elapsed, stats):
+    DB_QUERY_LATENCY.observe(elapsed)
+
+
+def _before_aws_call(model, context, **kwargs):
+    context["metrics_call"] = (
+        model.service_model.service_name,
+        model.name,
+        time.perf_counter(),
+    )
+
+
+def _finish_aws_call(context, failed: bool):
+    call = context.pop("metrics_call", None)
+    if call is None:
+        return
+    service, operation, start = call
+    AWS_CALL_LATENCY.labels(service, operation).observe(time.perf_counter() - start)
+    if failed:
+        AWS_CALL_ERRORS.labels(service, operation).inc()
+
+
+def _after_aws_call(http_response, context, **kwargs):
+    _finish_aws_call(context, failed=http_response.status_code >= 300)
+
+
+def _after_aws_call_error(context, **kwargs):
+    _finish_aws_call(context, failed=True)
+
+
+def instrument_boto3_client(client):
+    """Time every API call made through a boto3 client."""
+    client.meta.events.register("before-call", _before_aws_call)
+    client.meta.events.register("after-call", _after_aws_call)
+    client.meta.events.register("after-call-error", _after_aws_call_error)
+    return client
+
+
+def timed_job(name: str):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with JOB_DURATION.labels(name).time():
+                result = func(*args, **kwargs)
+            JOB_LAST_SUCCESS.labels(name).set_to_current_time()
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _job_submitted(event):
+    if event.scheduled_run_times:
+        lag = datetime.now(timezone.utc) - event.scheduled_run_times[-1]
+        JOB_LAG.labels(event.job_id).set(max(lag.total_seconds(), 0))
+
+
+def instrument_scheduler(scheduler):
+    scheduler.add_listener(_job_submitted, EVENT_JOB_SUBMITTED)
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
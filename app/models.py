@@ -1,3 +1,5 @@
+from sqlalchemy import Index, LargeBinary
+from sqlalchemy.orm import declared_attr, deferred
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, List
 from datetime import datetime, date
@@ -15,8 +17,9 @@ class ScholarshipJuryLink(SQLModel, table=True):
     scholarship_id: Optional[int] = Field(
         default=None, foreign_key="scholarship.id", primary_key=True
     )
+    # The primary key starts with scholarship_id; jury dashboards look links up by juror
     jury_id: Optional[str] = Field(
-        default=None, foreign_key="jury.id", primary_key=True
+        default=None, foreign_key="jury.id", primary_key=True, index=True
     )
 
 class Jury(SQLModel, table=True):
@@ -37,7 +40,24 @@ class ScientificArea(SQLModel, table=True):
 
     scholarships: List["Scholarship"] = Relationship(back_populates="scientific_areas", link_model=ScholarshipScientificAreaLink)
 
-class Edict(SQLModel, table=True):
+# Text extracted from an uploaded file (see app/extraction.py). New rows start
+# "pending"; rows created before extraction existed have no status until
+# backfilled
+class Extractable(SQLModel):
+    text_content: Optional[str] = Field(default=None)
+    page_count: Optional[int] = Field(default=None)
+    extraction_status: Optional[str] = Field(default="pending", index=True)
+    extraction_attempts: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    extraction_next_at: Optional[datetime] = Field(default=None)
+    extraction_error: Optional[str] = Field(default=None)
+
+    # The extracted text is only read by searches; loading an edict or
+    # document for a response must not fetch it
+    @declared_attr
+    def __mapper_args__(cls):
+        return {"properties": {"text_content": deferred(cls.__table__.c.text_content)}}
+
+class Edict(Extractable, table=True):
     id: Optional[int] = Field(default=None, primary_key=True, index=True)
     name: str = Field(nullable=False)
     file_path: str = Field(nullable=False)
@@ -66,7 +86,7 @@ class Scholarship(SQLModel, table=True):
     edict: Optional[Edict] = Relationship(back_populates="scholarships")
     documents: List["DocumentTemplate"] = Relationship(back_populates="scholarship")
 
-class DocumentTemplate(SQLModel, table=True):
+class DocumentTemplate(Extractable, table=True):
     id: Optional[int] = Field(default=None, primary_key=True, index=True)
     scholarship_id: Optional[int] = Field(foreign_key="scholarship.id")
     name: str = Field(nullable=False)
@@ -75,3 +95,52 @@ class DocumentTemplate(SQLModel, table=True):
     template: bool = Field(nullable=False)
 
     scholarship: Optional[Scholarship] = Relationship(back_populates="documents")
+
+class ScholarshipStatusHistory(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True, index=True)
+    scholarship_id: int = Field(foreign_key="scholarship.id", index=True)
+    from_status: ScholarshipStatus = Field(nullable=False)
+    to_status: ScholarshipStatus = Field(nullable=False)
+    changed_at: datetime = Field(default_factory=datetime.now, nullable=False)
+    changed_by: Optional[str] = Field(default=None)
+
+class ScholarshipStat(SQLModel, table=True):
+    # Summary counters behind GET /scholarships/stats (see app/stats.py):
+    # scholarships and spots per (dimension, value, status)
+    dimension: str = Field(primary_key=True)
+    value: str = Field(primary_key=True)
+    status: str = Field(primary_key=True)
+    count: int = Field(default=0, nullable=False)
+    spots: int = Field(default=0, nullable=False)
+
+class IdempotencyKey(SQLModel, table=True):
+    # A request sent with an Idempotency-Key header and, once it finished,
+    # its response (see app/idempotency.py)
+    owner: str = Field(primary_key=True)
+    key: str = Field(primary_key=True)
+    fingerprint: str = Field(nullable=False)
+    status: str = Field(nullable=False)
+    status_code: Optional[int] = Field(default=None)
+    content_type: Optional[str] = Field(default=None)
+    response: Optional[bytes] = Field(default=None, sa_type=LargeBinary)
+    locked_until: datetime = Field(nullable=False)
+    created_at: datetime = Field(default_factory=datetime.now, nullable=False, index=True)
+
+class Job(SQLModel, table=True):
+    # Background work queued by a transaction and run by app/jobs.py
+    __table_args__ = (Index("ix_job_status_run_at", "status", "run_at"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(nullable=False)
+    payload: str = Field(nullable=False)
+    # Higher runs first
+    priority: int = Field(default=0, nullable=False)
+    status: str = Field(default="queued", nullable=False)
+    attempts: int = Field(default=0, nullable=False)
+    max_attempts: int = Field(default=5, nullable=False)
+    run_at: datetime = Field(default_factory=datetime.now, nullable=False)
+    # A running job whose worker died is claimed again after this time
+    locked_until: Optional[datetime] = Field(default=None)
+    last_error: Optional[str] = Field(default=None)
+    created_at: datetime = Field(default_factory=datetime.now, nullable=False)
+    finished_at: Optional[datetime] = Field(default=None)
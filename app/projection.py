@@ -0,0 +1,128 @@
+"""Column projections for GET /scholarships.
+
+`view=summary` returns the slim schemas.ScholarshipSummary used by catalog
+cards. `fields=a,b,c` returns just those keys of schemas.Scholarship. Both
+select only the needed columns. Each requested relationship is loaded for
+the whole page with one IN query, and the others are not loaded at all.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from sqlmodel import Session, select
+from sqlmodel.sql.expression import SelectOfScalar
+
+from . import models, schemas
+
+Scholarship = models.Scholarship
+
+COLUMNS = {
+    "id": Scholarship.id,
+    "name": Scholarship.name,
+    "description": Scholarship.description,
+    "publisher": Scholarship.publisher,
+    "type": Scholarship.type,
+    "spots": Scholarship.spots,
+    "deadline": Scholarship.deadline,
+    "status": Scholarship.status,
+    "created_at": Scholarship.created_at,
+    "approved_at": Scholarship.approved_at,
+    "results_at": Scholarship.results_at,
+}
+RELATIONS = ("scientific_areas", "edict", "documents", "jury")
+FIELDS = (*COLUMNS, *RELATIONS)
+
+SUMMARY_FIELDS = ("id", "name", "type", "deadline", "status", "scientific_areas")
+
+
+def parse_fields(fields: str) -> List[str]:
+    """Split a `fields=` value; id is always included."""
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Valid fields: {', '.join(FIELDS)}")
+    return list(dict.fromkeys(["id", *requested]))
+
+
+def load_rows(db: Session, statement: SelectOfScalar, fields: Iterable[str]) -> List[dict]:
+    """Run a filtered listing statement selecting only the columns in `fields`."""
+    columns = [COLUMNS[field] for field in fields if field in COLUMNS]
+    rows = db.connection().execute(statement.with_only_columns(*columns)).mappings()
+    unique: Dict[int, dict] = {}
+    for row in rows:
+        # Joined filters can repeat a scholarship
+        unique.setdefault(row["id"], dict(row))
+    for row in unique.values():
+        if "status" in row:
+            row["status"] = models.ScholarshipStatus(row["status"]).value
+    return list(unique.values())
+
+
+def area_names(db: Session, ids: List[int]) -> Dict[int, List[str]]:
+    names: Dict[int, List[str]] = defaultdict(list)
+    for scholarship_id, name in db.exec(
+        select(models.ScholarshipScientificAreaLink.scholarship_id, models.ScientificArea.name)
+        .join(models.ScientificArea)
+        .where(models.ScholarshipScientificAreaLink.scholarship_id.in_(ids))
+        .order_by(models.ScientificArea.name)
+    ):
+        names[scholarship_id].append(name)
+    return names
+
+
+def load_relation(db: Session, relation: str, ids: List[int]) -> Dict[int, object]:
+    """One relationship for a page of scholarships, shaped like schemas.Scholarship."""
+    if relation == "scientific_areas":
+        statement = (
+            select(models.ScholarshipScientificAreaLink.scholarship_id, models.ScientificArea)
+            .join(models.ScientificArea)
+            .where(models.ScholarshipScientificAreaLink.scholarship_id.in_(ids))
+        )
+        schema = schemas.ScientificArea
+    elif relation == "jury":
+        statement = (
+            select(models.ScholarshipJuryLink.scholarship_id, models.Jury)
+            .join(models.Jury)
+            .where(models.ScholarshipJuryLink.scholarship_id.in_(ids))
+        )
+        schema = schemas.JuryRead
+    elif relation == "documents":
+        statement = select(models.DocumentTemplate.scholarship_id, models.DocumentTemplate).where(
+            models.DocumentTemplate.scholarship_id.in_(ids)
+        )
+        schema = schemas.DocumentTemplate
+    else:
+        statement = select(Scholarship.id, models.Edict).join(models.Edict).where(Scholarship.id.in_(ids))
+        return {
+            scholarship_id: schemas.Edict.model_validate(edict, from_attributes=True).model_dump(mode="json")
+            for scholarship_id, edict in db.exec(statement)
+        }
+
+    grouped: Dict[int, list] = defaultdict(list)
+    for scholarship_id, item in db.exec(statement):
+        grouped[scholarship_id].append(
+            schema.model_validate(item, from_attributes=True).model_dump(mode="json")
+        )
+    return grouped
+
+
+def project(db: Session, statement: SelectOfScalar, fields: List[str]) -> List[dict]:
+    """Rows for `fields=`: only the requested keys of schemas.Scholarship."""
+    rows = load_rows(db, statement, fields)
+    ids = [row["id"] for row in rows]
+    for relation in RELATIONS:
+        if relation not in fields:
+            continue
+        values = load_relation(db, relation, ids) if ids else {}
+        default: Optional[list] = None if relation == "edict" else []
+        for row in rows:
+            row[relation] = values.get(row["id"], default)
+    return rows
+
+
+def summaries(db: Session, statement: SelectOfScalar) -> List[schemas.ScholarshipSummary]:
+    rows = load_rows(db, statement, SUMMARY_FIELDS)
+    names = area_names(db, [row["id"] for row in rows]) if rows else {}
+    return [
+        schemas.ScholarshipSummary(**row, scientific_areas=names.get(row["id"], []))
+        for row in rows
+    ]
@@ -0,0 +1,423 @@
+"""S3, SQS and Cognito providers.
+
+AWS_PROVIDER=aws (default) builds the real boto3 clients. AWS_PROVIDER=memory
+swaps in the in-process fakes below, which implement the subset of the boto3
+client API used by the service, so tests and benchmarks run offline.
+
+Clients are built on first use: importing the app or starting a replica does
+not pay for boto3's import and client construction until a request needs it.
+
+Async code calls AWS through `s3_async`, `sqs_async` and `cognito_async`,
+which run the boto3 calls on a dedicated thread pool sized like the botocore
+connection pools, so slow AWS calls never block the event loop nor starve the
+thread pool FastAPI uses for sync endpoints.
+"""
+import asyncio
+import contextvars
+import functools
+import io
+import itertools
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import jwt
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt import PyJWK, PyJWKClient
+
+from . import metrics
+
+
+def _client_error(code: str, message: str, operation: str, status: int = 400) -> ClientError:
+    return ClientError(
+        {"Error": {"Code": code, "Message": message}, "ResponseMetadata": {"HTTPStatusCode": status}},
+        operation,
+    )
+
+
+class InMemoryObjectStore:
+    """S3 stand-in keeping objects in a dict keyed by (bucket, key)."""
+
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self):
+        self.objects: Dict[tuple, dict] = {}
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket: str, Key: str, Body=b"", ContentType: str = "binary/octet-stream", **kwargs):
+        content = Body.read() if hasattr(Body, "read") else Body
+        if isinstance(content, str):
+            content = content.encode()
+        with self._lock:
+            self.objects[(Bucket, Key)] = {"Body": content, "ContentType": ContentType}
+        return {"ETag": f'"{uuid.uuid4().hex}"'}
+
+    def head_object(self, Bucket: str, Key: str, **kwargs):
+        obj = self.objects.get((Bucket, Key))
+        if obj is None:
+            raise _client_error("404", "Not Found", "HeadObject", 404)
+        return {"ContentLength": len(obj["Body"]), "ContentType": obj["ContentType"]}
+
+    def get_object(self, Bucket: str, Key: str, **kwargs):
+        obj = self.objects.get((Bucket, Key))
+        if obj is None:
+            raise self.exceptions.NoSuchKey(Key)
+        return {
+            "Body": io.BytesIO(obj["Body"]),
+            "ContentLength": len(obj["Body"]),
+            "ContentType": obj["ContentType"],
+        }
+
+    def delete_object(self, Bucket: str, Key: str, **kwargs):
+        with self._lock:
+            self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def generate_presigned_url(self, ClientMethod: str, Params: dict, ExpiresIn: int = 3600, **kwargs):
+        return f"https://{Params['Bucket']}.s3.memory.local/{Params['Key']}?expires={ExpiresIn}"
+
+    def generate_presigned_post(self, Bucket: str, Key: str, Fields: Optional[dict] = None,
+                                Conditions: Optional[list] = None, ExpiresIn: int = 3600):
+        # The conditions are not enforced; they are returned for inspection
+        policy = {"expires_in": ExpiresIn, "conditions": Conditions or []}
+        return {
+            "url": f"https://{Bucket}.s3.memory.local/",
+            "fields": {**(Fields or {}), "key": Key, "policy": json.dumps(policy)},
+        }
+
+
+@dataclass
+class _Message:
+    message_id: str
+    body: str
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    receive_count: int = 0
+    visible_at: float = 0.0
+    receipt_handle: Optional[str] = None
+
+
+class InMemoryQueue:
+    """SQS stand-in: FIFO delivery, batches of up to 10, visibility timeouts."""
+
+    def __init__(self, visibility_timeout: int = 30):
+        self.visibility_timeout = visibility_timeout
+        self.queues: Dict[str, List[_Message]] = {}
+        self._ids = itertools.count(1)
+        self._condition = threading.Condition()
+
+    def _queue(self, url: str) -> List[_Message]:
+        return self.queues.setdefault(url, [])
+
+    def send_message(self, QueueUrl: str, MessageBody: str, MessageAttributes=None, **kwargs):
+        message = _Message(str(next(self._ids)), MessageBody, MessageAttributes or {})
+        with self._condition:
+            self._queue(QueueUrl).append(message)
+            self._condition.notify_all()
+        return {"MessageId": message.message_id}
+
+    def send_message_batch(self, QueueUrl: str, Entries: List[dict], **kwargs):
+        if len(Entries) > 10:
+            raise _client_error("AWS.SimpleQueueService.TooManyEntriesInBatchRequest",
+                                "Maximum number of entries per request are 10.", "SendMessageBatch")
+        successful = []
+        for entry in Entries:
+            response = self.send_message(QueueUrl, entry["MessageBody"], entry.get("MessageAttributes"))
+            successful.append({"Id": entry["Id"], "MessageId": response["MessageId"]})
+        return {"Successful": successful, "Failed": []}
+
+    def receive_message(self, QueueUrl: str, MaxNumberOfMessages: int = 1, WaitTimeSeconds: int = 0,
+                        VisibilityTimeout: Optional[int] = None, **kwargs):
+        deadline = time.monotonic() + WaitTimeSeconds
+        timeout = self.visibility_timeout if VisibilityTimeout is None else VisibilityTimeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                visible = [m for m in self._queue(QueueUrl) if m.visible_at <= now]
+                if visible or now >= deadline:
+                    break
+                self._condition.wait(min(deadline - now, 0.1))
+
+            messages = []
+            for message in visible[:min(MaxNumberOfMessages, 10)]:
+                message.receive_count += 1
+                message.visible_at = now + timeout
+                message.receipt_handle = uuid.uuid4().hex
+                messages.append({
+                    "MessageId": message.message_id,
+                    "ReceiptHandle": message.receipt_handle,
+                    "Body": message.body,
+                    "Attributes": {"ApproximateReceiveCount": str(message.receive_count)},
+                    "MessageAttributes": message.attributes,
+                })
+        return {"Messages": messages} if messages else {}
+
+    def _find(self, url: str, receipt_handle: str) -> Optional[_Message]:
+        return next((m for m in self._queue(url) if m.receipt_handle == receipt_handle), None)
+
+    def delete_message(self, QueueUrl: str, ReceiptHandle: str, **kwargs):
+        with self._condition:
+            message = self._find(QueueUrl, ReceiptHandle)
+            if message:
+                self._queue(QueueUrl).remove(message)
+        return {}
+
+    def delete_message_batch(self, QueueUrl: str, Entries: List[dict], **kwargs):
+        successful = []
+        for entry in Entries:
+            self.delete_message(QueueUrl, entry["ReceiptHandle"])
+            successful.append({"Id": entry["Id"]})
+        return {"Successful": successful, "Failed": []}
+
+    def change_message_visibility(self, QueueUrl: str, ReceiptHandle: str, VisibilityTimeout: int, **kwargs):
+        with self._condition:
+            message = self._find(QueueUrl, ReceiptHandle)
+            if message is None:
+                raise _client_error("ReceiptHandleIsInvalid", "Invalid receipt handle", "ChangeMessageVisibility")
+            message.visible_at = time.monotonic() + VisibilityTimeout
+            self._condition.notify_all()
+        return {}
+
+
+class _LocalJWKClient:
+    """Drop-in for PyJWKClient that resolves keys from a local JWKS."""
+
+    def __init__(self, pool: "InMemoryUserPool"):
+        self.pool = pool
+
+    def get_signing_keys(self) -> List[PyJWK]:
+        return [PyJWK(key) for key in self.pool.jwks()["keys"]]
+
+    def get_signing_key_from_jwt(self, token: str) -> PyJWK:
+        kid = jwt.get_unverified_header(token).get("kid")
+        for key in self.pool.jwks()["keys"]:
+            if key["kid"] == kid:
+                return PyJWK(key)
+        raise jwt.PyJWKClientError(f'Unable to find a signing key that matches: "{kid}"')
+
+
+@lru_cache(maxsize=None)
+def _local_signing_key() -> rsa.RSAPrivateKey:
+    # Key generation is slow; share one key per process
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+class InMemoryUserPool:
+    """Cognito stand-in: users, groups and RS256 tokens signed with a local key."""
+
+    def __init__(self):
+        self.users: Dict[str, dict] = {}
+        self.groups: Dict[str, set] = {}
+        self.kid = uuid.uuid4().hex
+        self._private_key = _local_signing_key()
+        self._jwks = None
+
+    def add_user(self, username: str, name: Optional[str] = None, groups: tuple = ()):
+        self.users[username] = {"name": name or username}
+        for group in groups:
+            self.groups.setdefault(group, set()).add(username)
+
+    def issue_token(self, username: str, expires_in: int = 3600) -> str:
+        now = int(time.time())
+        payload = {
+            "sub": username,
+            "username": username,
+            "cognito:groups": sorted(g for g, members in self.groups.items() if username in members),
+            "token_use": "access",
+            "iat": now,
+            "exp": now + expires_in,
+        }
+        return jwt.encode(payload, self._private_key, algorithm="RS256", headers={"kid": self.kid})
+
+    def jwks(self) -> dict:
+        if self._jwks is None:
+            key = jwt.algorithms.RSAAlgorithm.to_jwk(self._private_key.public_key(), as_dict=True)
+            self._jwks = {"keys": [{**key, "kid": self.kid, "alg": "RS256", "use": "sig"}]}
+        return self._jwks
+
+    def jwks_client(self) -> _LocalJWKClient:
+        return _LocalJWKClient(self)
+
+    def _user(self, username: str) -> dict:
+        if username not in self.users:
+            raise _client_error("UserNotFoundException", "User does not exist.", "AdminListGroupsForUser")
+        return self.users[username]
+
+    def admin_list_groups_for_user(self, UserPoolId: str, Username: str, **kwargs):
+        self._user(Username)
+        return {
+            "Groups": [
+                {"GroupName": group} for group, members in sorted(self.groups.items()) if Username in members
+            ]
+        }
+
+    def list_users_in_group(self, UserPoolId: str, GroupName: str, **kwargs):
+        return {
+            "Users": [
+                {"Username": username, "Attributes": [{"Name": "name", "Value": self.users[username]["name"]}]}
+                for username in sorted(self.groups.get(GroupName, ()))
+            ]
+        }
+
+
+class AsyncClient:
+    """Awaitable view of a client: `await aws.s3_async.put_object(...)`."""
+
+    def __init__(self, providers: "Providers", name: str):
+        self._providers = providers
+        self._name = name
+
+    def __getattr__(self, attribute: str):
+        value = getattr(getattr(self._providers, self._name), attribute)
+        if not callable(value):
+            # e.g. client.exceptions
+            return value
+
+        async def call(*args, **kwargs):
+            return await self._providers.run(value, *args, **kwargs)
+
+        return call
+
+
+class Providers:
+    """S3, SQS and Cognito clients plus the JWKS client, each built on first access."""
+
+    def __init__(
+        self,
+        kind: str,
+        region: Optional[str],
+        jwks_url: str,
+        max_pool_connections: int = 50,
+        max_attempts: int = 5,
+        connect_timeout: float = 5,
+        read_timeout: float = 30,
+    ):
+        if kind not in ("aws", "memory"):
+            raise ValueError(f"Unknown AWS_PROVIDER '{kind}' (expected 'aws' or 'memory')")
+        self.kind = kind
+        self.region = region
+        self.jwks_url = jwks_url
+        self.max_pool_connections = max_pool_connections
+        self.max_attempts = max_attempts
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._clients: Dict[str, Any] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, build):
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = self._clients[name] = build()
+        return client
+
+    def botocore_config(self) -> Config:
+        return Config(
+            # One connection per worker thread, so calls never wait for a connection
+            max_pool_connections=self.max_pool_connections,
+            # Adaptive mode adds client-side rate limiting when AWS throttles
+            retries={"max_attempts": self.max_attempts, "mode": "adaptive"},
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+        )
+
+    def _boto3_client(self, service: str):
+        import boto3
+
+        client = boto3.client(service, region_name=self.region, config=self.botocore_config())
+        return metrics.instrument_boto3_client(client)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_pool_connections, thread_name_prefix="aws"
+                    )
+        return self._executor
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Run a blocking call on the AWS thread pool."""
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(context.run, func, *args, **kwargs)
+        )
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    @property
+    def user_pool(self) -> Optional[InMemoryUserPool]:
+        if self.kind != "memory":
+            return None
+        return self._get("user_pool", InMemoryUserPool)
+
+    @property
+    def s3(self):
+        if self.kind == "memory":
+            return self._get("s3", InMemoryObjectStore)
+        return self._get("s3", lambda: self._boto3_client("s3"))
+
+    @property
+    def sqs(self):
+        if self.kind == "memory":
+            return self._get("sqs", InMemoryQueue)
+        return self._get("sqs", lambda: self._boto3_client("sqs"))
+
+    @property
+    def cognito(self):
+        if self.kind == "memory":
+            return self.user_pool
+        return self._get("cognito", lambda: self._boto3_client("cognito-idp"))
+
+    @property
+    def jwks_client(self):
+        if self.kind == "memory":
+            return self._get("jwks_client", self.user_pool.jwks_client)
+        # One client per process: it caches the JWKS instead of fetching it per request
+        return self._get(
+            "jwks_client", lambda: PyJWKClient(self.jwks_url, timeout=int(self.read_timeout))
+        )
+
+    @property
+    def s3_async(self) -> AsyncClient:
+        return AsyncClient(self, "s3")
+
+    @property
+    def sqs_async(self) -> AsyncClient:
+        return AsyncClient(self, "sqs")
+
+    @property
+    def cognito_async(self) -> AsyncClient:
+        return AsyncClient(self, "cognito")
+
+
+def create_providers(kind: str, region: Optional[str], jwks_url: str, **options) -> Providers:
+    return Providers(kind, region, jwks_url, **options)
+
+
+def from_settings(settings) -> Providers:
+    return create_providers(
+        settings.aws_provider,
+        settings.region,
+        settings.cognito_keys_url,
+        max_pool_connections=settings.aws_max_pool_connections,
+        max_attempts=settings.aws_max_attempts,
+        connect_timeout=settings.aws_connect_timeout,
+        read_timeout=settings.aws_read_timeout,
+    )
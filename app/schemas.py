@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional, List
+import json
+from pydantic import BaseModel, Field, field_validator
+from typing import Dict, Optional, List
 from datetime import date, datetime
 from enum import Enum
 
@@ -11,6 +12,14 @@ class ScholarshipStatus(str, Enum):
     jury_evaluation = "Jury Evaluation"
     closed = "Closed"
 
+class ScholarshipView(str, Enum):
+    summary = "summary"
+    full = "full"
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+
 class JuryBase(BaseModel):
     name: str
 
@@ -90,6 +99,87 @@ class Scholarship(ScholarshipBase):
     class Config:
         from_attributes = True
 
+# GET /scholarships/batch entry; scholarship is null when found is false
+class ScholarshipBatchItem(BaseModel):
+    id: int
+    found: bool
+    scholarship: Optional[Scholarship] = None
+
+# Catalog card: GET /scholarships?view=summary
+class ScholarshipSummary(BaseModel):
+    id: int
+    name: str
+    type: str
+    deadline: Optional[date] = None
+    status: ScholarshipStatus
+    scientific_areas: List[str]
+
+class UploadFileRequest(BaseModel):
+    filename: str = Field(..., min_length=1, max_length=255)
+    content_type: str
+    size: int = Field(..., gt=0)
+
+class UploadRequest(BaseModel):
+    files: List[UploadFileRequest] = Field(..., min_length=1, max_length=50)
+
+class UploadTicket(BaseModel):
+    filename: str
+    # Pass as edict_key / document_key once the file is uploaded
+    key: str
+    # POST the file to `url` as multipart form data with `fields` before the file
+    url: str
+    fields: Dict[str, str]
+    expires_in: int
+
+class BulkReviewRequest(BaseModel):
+    scholarship_ids: List[int] = Field(..., min_length=1, max_length=500)
+    accepted: bool
+
+class BulkReviewResult(BaseModel):
+    id: int
+    success: bool
+    status: Optional[ScholarshipStatus] = None
+    detail: Optional[str] = None
+
+class BulkReviewResponse(BaseModel):
+    updated: int
+    results: List[BulkReviewResult]
+
+class JuryAssignment(BaseModel):
+    id: int
+    name: str
+    publisher: str
+    type: str
+    status: ScholarshipStatus
+    deadline: Optional[date] = None
+    results_at: Optional[datetime] = None
+
+class JuryDashboard(BaseModel):
+    # Assignments per status, over all of the juror's scholarships
+    counts: Dict[ScholarshipStatus, int]
+    total: int
+    page: int
+    limit: int
+    assignments: List[JuryAssignment]
+
+class DeadlineWeek(BaseModel):
+    week_start: date
+    count: int
+
+class ScholarshipStats(BaseModel):
+    total: int
+    by_status: Dict[ScholarshipStatus, int]
+    by_type: Dict[str, int]
+    by_publisher: Dict[str, int]
+    by_area: Dict[str, int]
+    # Spots in open scholarships
+    spots_offered: int
+    spots_by_status: Dict[ScholarshipStatus, int]
+    # Open scholarships by week of their deadline, from the current week on
+    upcoming_deadlines: List[DeadlineWeek]
+    # Median time from creation to approval, in whole hours
+    median_approval_hours: Optional[float] = None
+
 class FilterOptionsResponse(BaseModel):
     types: List[str]
     scientific_areas: List[str]
@@ -100,3 +190,59 @@ class FilterOptionsResponse(BaseModel):
 class UserBasic(BaseModel):
     id: str
     name: str
+
+class ImportDocument(BaseModel):
+    name: str
+    file: Optional[str] = None
+    required: bool = False
+    template: bool = False
+
+class ProposalImportRow(BaseModel):
+    name: str
+    description: Optional[str] = None
+    publisher: str
+    type: str
+    spots: int
+    deadline: Optional[date] = None
+    scientific_areas: List[str] = []
+    jury: List[JuryRead] = []
+    edict: str
+    documents: List[ImportDocument] = []
+
+    # CSV manifests carry lists as "a; b" and jurors as "id:name; id:name",
+    # documents as a JSON array
+    @field_validator("scientific_areas", mode="before")
+    @classmethod
+    def split_areas(cls, value):
+        if isinstance(value, str):
+            return [area.strip() for area in value.split(";") if area.strip()]
+        return value
+
+    @field_validator("jury", mode="before")
+    @classmethod
+    def split_jury(cls, value):
+        if isinstance(value, str):
+            jury = []
+            for entry in filter(None, (e.strip() for e in value.split(";"))):
+                jury_id, _, name = entry.partition(":")
+                jury.append({"id": jury_id.strip(), "name": (name or jury_id).strip()})
+            return jury
+        return value
+
+    @field_validator("documents", mode="before")
+    @classmethod
+    def parse_documents(cls, value):
+        if isinstance(value, str):
+            return json.loads(value) if value.strip() else []
+        return value
+
+class ImportRowResult(BaseModel):
+    row: int
+    status: str
+    scholarship_id: Optional[int] = None
+    errors: List[str] = []
+
+class ImportReport(BaseModel):
+    created: int
+    failed: int
+    rows: List[ImportRowResult]
@@ -0,0 +1,50 @@
+from typing import Any, List, Sequence
+
+import orjson
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+from . import schemas
+
+# Adapters are built once at import time; building them per request is what
+# makes FastAPI's response_model path expensive.
+scholarship_adapter = TypeAdapter(schemas.Scholarship)
+scholarship_list_adapter = TypeAdapter(List[schemas.Scholarship])
+summary_list_adapter = TypeAdapter(List[schemas.ScholarshipSummary])
+stats_adapter = TypeAdapter(schemas.ScholarshipStats)
+
+
+class ORJSONResponse(Response):
+    """JSON response rendered with orjson. Pre-encoded bytes are sent as-is."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def dump_scholarship(scholarship: Any) -> bytes:
+    # Validate the ORM object once (from_attributes) and encode straight to JSON
+    validated = scholarship_adapter.validate_python(scholarship, from_attributes=True)
+    return scholarship_adapter.dump_json(validated)
+
+
+def dump_scholarships(scholarships: Sequence[Any]) -> bytes:
+    validated = scholarship_list_adapter.validate_python(
+        list(scholarships), from_attributes=True
+    )
+    return scholarship_list_adapter.dump_json(validated)
+
+
+def scholarship_response(scholarship: Any) -> ORJSONResponse:
+    return ORJSONResponse(dump_scholarship(scholarship))
+
+
+def scholarships_response(scholarships: Sequence[Any]) -> ORJSONResponse:
+    return ORJSONResponse(dump_scholarships(scholarships))
@@ -0,0 +1,69 @@
+"""Request coalescing for hot read endpoints.
+
+When many identical requests arrive together (a popular scholarship opens,
+a deadline passes), only the first one (the leader) runs the queries. The
+others wait for its result instead of repeating the work. A waiter gives up
+after `timeout` seconds and computes the result itself, so one slow leader
+cannot hold every request for that key.
+
+Results are shared between requests, so they must be immutable (the read
+endpoints share encoded JSON bytes). Exceptions are shared too: if the
+leader raises an HTTPException(404), so does every request waiting on it.
+"""
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from .metrics import SINGLEFLIGHT_CALLS
+
+
+class Group:
+    """Deduplicates concurrent calls that share a key (sync callers, one per thread)."""
+
+    def __init__(self, timeout: float = 5.0):
+        self.timeout = timeout
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(
+        self,
+        key: Hashable,
+        func: Callable[[], Any],
+        timeout: Optional[float] = None,
+        label: str = "",
+    ) -> Any:
+        """Return func(), or the result of an identical call already in flight."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            try:
+                result = future.result(self.timeout if timeout is None else timeout)
+            except FutureTimeout:
+                SINGLEFLIGHT_CALLS.labels(label, "timeout").inc()
+                return func()
+            SINGLEFLIGHT_CALLS.labels(label, "shared").inc()
+            return result
+
+        SINGLEFLIGHT_CALLS.labels(label, "leader").inc()
+        try:
+            result = func()
+        except BaseException as e:
+            self._finish(key)
+            future.set_exception(e)
+            raise
+        self._finish(key)
+        future.set_result(result)
+        return result
+
+    def _finish(self, key: Hashable):
+        # Later calls start a new flight rather than reuse a finished result
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,338 @@
+"""Catalog statistics for GET /scholarships/stats.
+
+The statistics are read from the scholarshipstat summary table, which holds
+the number of scholarships and spots per (dimension, value, status):
+
+- ("all", "")                   every scholarship
+- ("type", <type>), ("publisher", <publisher>), ("area", <area name>)
+- ("deadline_week", <monday>)   week of the deadline, ISO date
+- ("approval_hours", <hours>)   histogram of creation -> approval times
+                                (status "", one-hour buckets)
+
+The rows are updated in the same transaction as the change, by hooks that
+app.hooks.install() registers. Status changes go through the
+transitions.on_transition hook. Inserts, deletes and edits
+made through the ORM go through a Session after_flush hook; area links
+rewritten with links.sync() are reported through areas_changed(). Rows
+written with Core inserts (e.g. benchmarks.seed) are only picked up by
+recompute().
+The scheduler runs recompute() every STATS_RECOMPUTE_INTERVAL seconds to
+reconcile any drift. It can also be run by hand:
+
+    python -m app.stats
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from statistics import median
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, event, func, inspect, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session
+
+from . import models, schemas, transitions
+
+Stat = models.ScholarshipStat
+Scholarship = models.Scholarship
+AreaLink = models.ScholarshipScientificAreaLink
+
+# (dimension, value, status) -> [count, spots]
+Deltas = Dict[Tuple[str, str, str], List[int]]
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def approval_bucket(created_at: datetime, approved_at: datetime) -> str:
+    return str(max(int((approved_at - created_at).total_seconds() // 3600), 0))
+
+
+def status_value(status) -> str:
+    return models.ScholarshipStatus(status).value
+
+
+def scholarship_keys(
+    type: str, publisher: str, deadline: Optional[date], areas: Iterable[str]
+) -> List[Tuple[str, str]]:
+    keys = [("all", ""), ("type", type), ("publisher", publisher)]
+    keys.extend(("area", area) for area in dict.fromkeys(areas))
+    if deadline:
+        if isinstance(deadline, datetime):
+            deadline = deadline.date()
+        keys.append(("deadline_week", week_start(deadline).isoformat()))
+    return keys
+
+
+def add(deltas: Deltas, keys: List[Tuple[str, str]], status: str, sign: int, spots: int):
+    for dimension, value in keys:
+        delta = deltas.setdefault((dimension, value, status), [0, 0])
+        delta[0] += sign
+        delta[1] += sign * (spots or 0)
+
+
+def apply(connection: Connection, deltas: Deltas):
+    """Add the deltas to the summary rows, creating missing rows."""
+    rows = [
+        {"dimension": d, "value": v, "status": s, "count": count, "spots": spots}
+        # Sorted, so concurrent transactions lock rows in the same order
+        for (d, v, s), (count, spots) in sorted(deltas.items())
+        if count or spots
+    ]
+    if not rows:
+        return
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Statistics upserts are not implemented for {dialect}")
+
+    statement = insert(Stat.__table__)
+    connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=["dimension", "value", "status"],
+            set_={
+                "count": Stat.__table__.c.count + statement.excluded.count,
+                "spots": Stat.__table__.c.spots + statement.excluded.spots,
+            },
+        ),
+        rows,
+    )
+
+
+def area_names(connection: Connection, scholarship_ids: List[int]) -> Dict[int, List[str]]:
+    names: Dict[int, List[str]] = defaultdict(list)
+    for scholarship_id, name in connection.execute(
+        select(AreaLink.scholarship_id, models.ScientificArea.name)
+        .join(models.ScientificArea, models.ScientificArea.id == AreaLink.scientific_area_id)
+        .where(AreaLink.scholarship_id.in_(scholarship_ids))
+    ):
+        names[scholarship_id].append(name)
+    return names
+
+
+def _status_changed(
+    db: Session,
+    scholarship_ids: List[int],
+    source: models.ScholarshipStatus,
+    target: models.ScholarshipStatus,
+):
+    connection = db.connection()
+    areas = area_names(connection, scholarship_ids)
+    deltas: Deltas = {}
+    for row in connection.execute(
+        select(
+            Scholarship.id,
+            Scholarship.type,
+            Scholarship.publisher,
+            Scholarship.spots,
+            Scholarship.deadline,
+            Scholarship.created_at,
+            Scholarship.approved_at,
+        ).where(Scholarship.id.in_(scholarship_ids))
+    ):
+        keys = scholarship_keys(row.type, row.publisher, row.deadline, areas[row.id])
+        add(deltas, keys, status_value(source), -1, row.spots)
+        add(deltas, keys, status_value(target), 1, row.spots)
+        if target == models.ScholarshipStatus.open and row.approved_at:
+            add(deltas, [("approval_hours", approval_bucket(row.created_at, row.approved_at))], "", 1, 0)
+    apply(connection, deltas)
+
+
+def areas_changed(connection: Connection, scholarship_id: int, added: Iterable[int], removed: Iterable[int]):
+    """Counters for area links changed with Core statements (links.sync), which the flush hook does not see."""
+    added, removed = set(added), set(removed)
+    if not added and not removed:
+        return
+    names = dict(
+        connection.execute(
+            select(models.ScientificArea.id, models.ScientificArea.name).where(
+                models.ScientificArea.id.in_(added | removed)
+            )
+        ).all()
+    )
+    status, spots = connection.execute(
+        select(Scholarship.status, Scholarship.spots).where(Scholarship.id == scholarship_id)
+    ).one()
+    deltas: Deltas = {}
+    add(deltas, [("area", names[area_id]) for area_id in added], status_value(status), 1, spots)
+    add(deltas, [("area", names[area_id]) for area_id in removed], status_value(status), -1, spots)
+    apply(connection, deltas)
+
+
+def _value_before(state, key: str):
+    history = state.attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    return state.attrs[key].value
+
+
+def _areas(session: OrmSession, state, before: bool) -> List[str]:
+    history = state.attrs.scientific_areas.history
+    if history.has_changes():
+        kept = list(history.unchanged) + list(history.deleted if before else history.added)
+        return [area.name for area in kept]
+    if "scientific_areas" in state.dict:
+        return [area.name for area in state.dict["scientific_areas"]]
+    return area_names(session.connection(), [state.obj().id])[state.obj().id]
+
+
+def _snapshot(session: OrmSession, state, before: bool) -> Tuple[List[Tuple[str, str]], str, int]:
+    value = (lambda key: _value_before(state, key)) if before else (lambda key: state.attrs[key].value)
+    keys = scholarship_keys(
+        value("type"), value("publisher"), value("deadline"), _areas(session, state, before)
+    )
+    return keys, status_value(value("status")), value("spots")
+
+
+TRACKED = ("type", "publisher", "deadline", "spots", "status", "scientific_areas")
+
+
+def _after_flush(session: OrmSession, flush_context):
+    deltas: Deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Scholarship):
+            keys, status, spots = _snapshot(session, inspect(obj), before=False)
+            add(deltas, keys, status, 1, spots)
+    for obj in session.deleted:
+        if isinstance(obj, Scholarship):
+            keys, status, spots = _snapshot(session, inspect(obj), before=True)
+            add(deltas, keys, status, -1, spots)
+    for obj in session.dirty:
+        if not isinstance(obj, Scholarship):
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[key].history.has_changes() for key in TRACKED):
+            continue
+        before = _snapshot(session, state, before=True)
+        after = _snapshot(session, state, before=False)
+        if before != after:
+            add(deltas, before[0], before[1], -1, before[2])
+            add(deltas, after[0], after[1], 1, after[2])
+    if deltas:
+        apply(session.connection(), deltas)
+
+
+def install():
+    """Keep the counters in step with changes made in this process; see app.hooks."""
+    transitions.on_transition(_status_changed)
+    event.listen(OrmSession, "after_flush", _after_flush)
+
+
+def recompute(db: Session) -> int:
+    """Rebuild the summary table from the catalog; returns the number of rows."""
+    if db.get_bind().dialect.name == "postgresql":
+        # Incremental updates wait until the rebuild commits
+        db.exec(text("LOCK TABLE scholarshipstat IN EXCLUSIVE MODE"))
+    db.exec(delete(Stat))
+
+    deltas: Deltas = {}
+
+    aggregates = (func.count(), func.coalesce(func.sum(Scholarship.spots), 0))
+    for status, count, spots in db.exec(select(Scholarship.status, *aggregates).group_by(Scholarship.status)):
+        deltas[("all", "", status_value(status))] = [count, spots]
+    for dimension, column in (("type", Scholarship.type), ("publisher", Scholarship.publisher)):
+        for value, status, count, spots in db.exec(
+            select(column, Scholarship.status, *aggregates).group_by(column, Scholarship.status)
+        ):
+            deltas[(dimension, value, status_value(status))] = [count, spots]
+    for value, status, count, spots in db.exec(
+        select(models.ScientificArea.name, Scholarship.status, *aggregates)
+        .join(AreaLink, AreaLink.scholarship_id == Scholarship.id)
+        .join(models.ScientificArea, models.ScientificArea.id == AreaLink.scientific_area_id)
+        .group_by(models.ScientificArea.name, Scholarship.status)
+    ):
+        deltas[("area", value, status_value(status))] = [count, spots]
+    for deadline, status, count, spots in db.exec(
+        select(Scholarship.deadline, Scholarship.status, *aggregates)
+        .where(Scholarship.deadline.is_not(None))
+        .group_by(Scholarship.deadline, Scholarship.status)
+    ):
+        delta = deltas.setdefault(("deadline_week", week_start(deadline).isoformat(), status_value(status)), [0, 0])
+        delta[0] += count
+        delta[1] += spots
+    for created_at, approved_at in db.exec(
+        select(Scholarship.created_at, Scholarship.approved_at)
+        .where(Scholarship.approved_at.is_not(None))
+        .execution_options(yield_per=5000)
+    ):
+        add(deltas, [("approval_hours", approval_bucket(created_at, approved_at))], "", 1, 0)
+
+    apply(db.connection(), deltas)
+    return len(deltas)
+
+
+def read(db: Session, weeks: int = 8, today: Optional[date] = None) -> schemas.ScholarshipStats:
+    today = today or date.today()
+    first_week = week_start(today)
+    last_week = first_week + timedelta(weeks=weeks - 1)
+    rows = db.exec(
+        select(Stat.dimension, Stat.value, Stat.status, Stat.count, Stat.spots).where(
+            Stat.count > 0,
+            (Stat.dimension != "deadline_week")
+            | ((Stat.value >= first_week.isoformat()) & (Stat.value <= last_week.isoformat())),
+        )
+    ).all()
+
+    by: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    spots_by_status: Dict[str, int] = defaultdict(int)
+    upcoming: Dict[str, int] = defaultdict(int)
+    approvals: List[Tuple[int, int]] = []
+    open_status = models.ScholarshipStatus.open.value
+    for dimension, value, status, count, spots in rows:
+        if dimension == "all":
+            by["status"][status] += count
+            spots_by_status[status] += spots
+        elif dimension == "deadline_week":
+            if status == open_status:
+                upcoming[value] += count
+        elif dimension == "approval_hours":
+            approvals.append((int(value), count))
+        else:
+            by[dimension][value] += count
+
+    return schemas.ScholarshipStats(
+        total=sum(by["status"].values()),
+        by_status=by["status"],
+        by_type=by["type"],
+        by_publisher=by["publisher"],
+        by_area=by["area"],
+        spots_offered=spots_by_status.get(open_status, 0),
+        spots_by_status=spots_by_status,
+        upcoming_deadlines=[
+            schemas.DeadlineWeek(week_start=date.fromisoformat(week), count=count)
+            for week, count in sorted(upcoming.items())
+        ],
+        median_approval_hours=histogram_median(approvals),
+    )
+
+
+def histogram_median(buckets: List[Tuple[int, int]]) -> Optional[float]:
+    total = sum(count for _, count in buckets)
+    if not total:
+        return None
+    # Middle element(s) of the expanded, sorted histogram
+    middle = [(total - 1) // 2, total // 2]
+    values, seen = [], 0
+    for value, count in sorted(buckets):
+        while middle and middle[0] < seen + count:
+            values.append(value)
+            middle.pop(0)
+        seen += count
+    return float(median(values))
+
+
+def main():
+    from .database import engine
+
+    with Session(engine) as db:
+        rows = recompute(db)
+        db.commit()
+    print(f"Recomputed {rows} statistics rows")
+
+
+if __name__ == "__main__":
+    main()
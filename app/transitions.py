@@ -0,0 +1,138 @@
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import update
+from sqlmodel import Session
+
+from . import models
+
+Status = models.ScholarshipStatus
+
+# Allowed moves: current status -> statuses it can move to
+TRANSITIONS: Dict[Status, Set[Status]] = {
+    Status.draft: {Status.under_review},
+    # (re)submit, secretary approval, secretary rejection
+    Status.under_review: {Status.under_review, Status.open, Status.draft},
+    # deadline passed
+    Status.open: {Status.jury_evaluation},
+    # jury results received
+    Status.jury_evaluation: {Status.closed},
+    Status.closed: set(),
+}
+
+
+# Called for every batch of rows a transition() moved: (db, ids, source,
+# target), inside the caller's transaction (e.g. to invalidate caches or
+# update counters)
+TransitionListener = Callable[[Session, List[int], Status, Status], None]
+_listeners: List[TransitionListener] = []
+
+
+def on_transition(listener: TransitionListener) -> TransitionListener:
+    _listeners.append(listener)
+    return listener
+
+
+class InvalidTransition(Exception):
+    def __init__(self, current: Optional[Status], target: Status):
+        self.current = current
+        self.target = target
+        if current is None:
+            message = "Scholarship not found"
+        else:
+            message = (
+                f"Cannot change scholarship status from '{current.value}' to '{target.value}'"
+            )
+        super().__init__(message)
+
+
+def sources(target: Status) -> List[Status]:
+    """Statuses a scholarship may be in to move to `target`."""
+    return [status for status, targets in TRANSITIONS.items() if target in targets]
+
+
+def can_transition(current: Status, target: Status) -> bool:
+    return target in TRANSITIONS[Status(current)]
+
+
+def transition(
+    db: Session,
+    ids: Iterable[int],
+    target: Status,
+    expected: Optional[Iterable[Status]] = None,
+    changed_by: Optional[str] = None,
+    where: Iterable = (),
+) -> List[int]:
+    """Move scholarships to `target` and return the ids that actually moved.
+
+    Each allowed source status is applied as one compare-and-swap
+    UPDATE ... WHERE id IN (...) AND status = :expected, so concurrent
+    writers (API calls, the deadline job, the results consumer) can never
+    apply a transition to a row that already left the expected status.
+    Extra `where` criteria are added to every UPDATE. The caller commits.
+    """
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return []
+
+    now = datetime.now()
+    values = {"status": target}
+    if target == Status.open:
+        values["approved_at"] = now
+    elif target == Status.closed:
+        values["results_at"] = now
+
+    allowed = sources(target)
+    if expected is not None:
+        allowed = [status for status in expected if status in allowed]
+
+    moved: List[int] = []
+    history = []
+    for source in allowed:
+        moved_set = set(moved)
+        remaining = [i for i in ids if i not in moved_set]
+        if not remaining:
+            break
+        moved_now = list(
+            db.exec(
+                update(models.Scholarship)
+                .where(
+                    models.Scholarship.id.in_(remaining),
+                    models.Scholarship.status == source,
+                    *where,
+                )
+                .values(**values)
+                .returning(models.Scholarship.id)
+            ).scalars()
+        )
+        moved.extend(moved_now)
+        if moved_now:
+            for listener in _listeners:
+                listener(db, moved_now, source, target)
+        history.extend(
+            models.ScholarshipStatusHistory(
+                scholarship_id=scholarship_id,
+                from_status=source,
+                to_status=target,
+                changed_at=now,
+                changed_by=changed_by,
+            )
+            for scholarship_id in moved_now
+        )
+
+    db.add_all(history)
+    return moved
+
+
+def transition_one(
+    db: Session,
+    scholarship_id: int,
+    target: Status,
+    expected: Optional[Iterable[Status]] = None,
+    changed_by: Optional[str] = None,
+) -> None:
+    """Single-row transition that raises InvalidTransition when it does not apply."""
+    if transition(db, [scholarship_id], target, expected, changed_by):
+        return
+    scholarship = db.get(models.Scholarship, scholarship_id, populate_existing=True)
+    raise InvalidTransition(Status(scholarship.status) if scholarship else None, target)
@@ -0,0 +1,89 @@
+"""Direct-to-S3 uploads.
+
+Instead of sending edicts and document templates through the API, clients
+ask POST /scholarships/uploads for a presigned POST per file, upload the
+bytes straight to S3 and then pass the returned keys as edict_key /
+document_key when creating or updating a proposal. The presigned policy
+limits each upload to its declared content type and size; the API checks
+the stored object with head_object before recording it.
+
+Presigned PUT URLs are not offered because they cannot enforce a size limit.
+"""
+import re
+import uuid
+from typing import List
+
+from botocore.exceptions import ClientError
+
+from . import config, schemas
+
+PREFIX = "uploads/"
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def safe_filename(filename: str) -> str:
+    name = filename.replace("\\", "/").rsplit("/", 1)[-1]
+    name = _UNSAFE.sub("_", name).strip("._")
+    return name[-200:] or "file"
+
+
+def new_key(filename: str) -> str:
+    return f"{PREFIX}{uuid.uuid4().hex}/{safe_filename(filename)}"
+
+
+def filename_from_key(key: str) -> str:
+    return key.rsplit("/", 1)[-1]
+
+
+def check_file(settings: config.Settings, content_type: str, size: int):
+    if content_type not in settings.upload_content_types:
+        raise ValueError(f"Content type '{content_type}' is not accepted.")
+    if size > settings.upload_max_bytes:
+        raise ValueError(f"Files must be at most {settings.upload_max_bytes} bytes.")
+
+
+def presign(s3, bucket: str, settings: config.Settings, request: schemas.UploadRequest) -> List[schemas.UploadTicket]:
+    """Validate the declared files and return a presigned POST for each one."""
+    for file in request.files:
+        try:
+            check_file(settings, file.content_type, file.size)
+        except ValueError as e:
+            raise ValueError(f"{file.filename}: {e}")
+
+    tickets = []
+    for file in request.files:
+        key = new_key(file.filename)
+        post = s3.generate_presigned_post(
+            Bucket=bucket,
+            Key=key,
+            Fields={"Content-Type": file.content_type},
+            Conditions=[
+                {"Content-Type": file.content_type},
+                ["content-length-range", 1, file.size],
+            ],
+            ExpiresIn=settings.upload_url_ttl,
+        )
+        tickets.append(
+            schemas.UploadTicket(
+                filename=file.filename,
+                key=key,
+                url=post["url"],
+                fields=post["fields"],
+                expires_in=settings.upload_url_ttl,
+            )
+        )
+    return tickets
+
+
+def verify(s3, bucket: str, settings: config.Settings, key: str):
+    """Check that `key` is a finished upload that respects the limits."""
+    if not key.startswith(PREFIX) or ".." in key:
+        raise ValueError(f"'{key}' is not an upload key.")
+    try:
+        head = s3.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey", "NotFound"):
+            raise
+        raise ValueError(f"'{key}' has not been uploaded.")
+    check_file(settings, head.get("ContentType", ""), head.get("ContentLength", 0))
@@ -0,0 +1,236 @@
+"""Consumer for the jury evaluation results queue (RESULTS_QUEUE_URL).
+
+Runs separately from the API so it can be scaled on its own:
+
+    python -m app.worker
+
+Messages are long-polled in batches of 10 and handled concurrently. Handled
+messages are deleted in one batch call, and the visibility of slow messages
+is extended while they run. Failing messages are left on the queue to be
+retried. After WORKER_MAX_RECEIVES attempts, or straight away for messages
+that can never succeed, they go to DEAD_LETTER_QUEUE_URL (when set) and are
+deleted. SIGTERM/SIGINT stop the loop once the current batch is done.
+
+Message body: {"type": "jury_results", "scholarship_id": 1}
+"""
+import asyncio
+import json
+import signal
+import time
+from typing import Callable, Dict, List, Optional, Union
+
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Session
+
+from . import config, database, hooks, instrumentation, metrics, models, providers, transitions
+
+Status = models.ScholarshipStatus
+
+# SQS returns at most 10 messages per ReceiveMessage call
+BATCH_SIZE = 10
+
+
+class PermanentError(Exception):
+    """The message can never be handled; dead-letter it without retrying."""
+
+
+def handle_jury_results(db: Session, body: dict):
+    try:
+        scholarship_id = int(body["scholarship_id"])
+    except (KeyError, TypeError, ValueError):
+        raise PermanentError("Message has no valid scholarship_id")
+
+    if transitions.transition(
+        db, [scholarship_id], Status.closed, expected=[Status.jury_evaluation], changed_by="jury-results"
+    ):
+        db.commit()
+        return
+
+    scholarship = db.get(models.Scholarship, scholarship_id)
+    if scholarship is None:
+        raise PermanentError(f"Scholarship {scholarship_id} not found")
+    if scholarship.status == Status.closed:
+        # Redelivered message: the results were already applied
+        return
+    # e.g. results that arrived before the deadline job moved the scholarship;
+    # retried until the scholarship reaches jury_evaluation or the message is dead-lettered
+    raise ValueError(
+        f"Scholarship {scholarship_id} is '{Status(scholarship.status).value}', expected 'jury_evaluation'"
+    )
+
+
+Handler = Callable[[Session, dict], None]
+
+HANDLERS: Dict[str, Handler] = {
+    "jury_results": handle_jury_results,
+}
+
+
+class Worker:
+    def __init__(
+        self,
+        aws: providers.Providers,
+        bind: Union[Engine, Connection],
+        queue_url: str,
+        dead_letter_queue_url: str = "",
+        concurrency: int = 10,
+        visibility_timeout: int = 60,
+        max_receives: int = 5,
+        wait_time: int = 20,
+    ):
+        self.aws = aws
+        self.bind = bind
+        self.queue_url = queue_url
+        self.dead_letter_queue_url = dead_letter_queue_url
+        self.visibility_timeout = visibility_timeout
+        self.max_receives = max_receives
+        self.wait_time = wait_time
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.stopping = asyncio.Event()
+
+    def stop(self):
+        self.stopping.set()
+
+    async def run(self, stop_when_empty: bool = False):
+        while not self.stopping.is_set():
+            messages = await self.receive()
+            if not messages:
+                if stop_when_empty:
+                    break
+                continue
+            await self.process_batch(messages)
+        print("Worker stopped")
+
+    async def receive(self) -> List[dict]:
+        response = await self.aws.sqs_async.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=BATCH_SIZE,
+            WaitTimeSeconds=self.wait_time,
+            VisibilityTimeout=self.visibility_timeout,
+            AttributeNames=["ApproximateReceiveCount"],
+        )
+        return response.get("Messages", [])
+
+    async def process_batch(self, messages: List[dict]):
+        done = await asyncio.gather(*(self.process(message) for message in messages))
+        await self.delete([message for message, ok in zip(messages, done) if ok])
+
+    async def process(self, message: dict) -> bool:
+        """Handle one message; True when it should be deleted from the queue."""
+        message_type = "unknown"
+        try:
+            try:
+                body = json.loads(message["Body"])
+                message_type = body.get("type", "jury_results")
+                handler = HANDLERS[message_type]
+            except (ValueError, AttributeError, KeyError):
+                raise PermanentError(f"Unknown or malformed message: {message['Body'][:200]}")
+
+            async with self.semaphore:
+                heartbeat = asyncio.create_task(self.extend_visibility(message["ReceiptHandle"]))
+                start = time.perf_counter()
+                try:
+                    await asyncio.to_thread(self.handle, handler, body)
+                finally:
+                    heartbeat.cancel()
+                    metrics.QUEUE_HANDLER_LATENCY.labels(message_type).observe(time.perf_counter() - start)
+        except PermanentError as e:
+            await self.dead_letter(message, str(e))
+            metrics.QUEUE_MESSAGES.labels(message_type, "dead_lettered").inc()
+            return True
+        except Exception as e:
+            receives = int(message.get("Attributes", {}).get("ApproximateReceiveCount", "1"))
+            if receives >= self.max_receives:
+                await self.dead_letter(message, f"Failed {receives} times: {str(e)}")
+                metrics.QUEUE_MESSAGES.labels(message_type, "dead_lettered").inc()
+                return True
+            print(f"Error handling message {message['MessageId']} (attempt {receives}): {str(e)}")
+            metrics.QUEUE_MESSAGES.labels(message_type, "retried").inc()
+            return False
+
+        metrics.QUEUE_MESSAGES.labels(message_type, "handled").inc()
+        return True
+
+    def handle(self, handler: Handler, body: dict):
+        with Session(self.bind) as db:
+            handler(db, body)
+
+    async def extend_visibility(self, receipt_handle: str):
+        # Keep a slow message hidden from other consumers while it is handled
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 2)
+            try:
+                await self.aws.sqs_async.change_message_visibility(
+                    QueueUrl=self.queue_url,
+                    ReceiptHandle=receipt_handle,
+                    VisibilityTimeout=self.visibility_timeout,
+                )
+            except Exception as e:
+                print(f"Error extending message visibility: {str(e)}")
+
+    async def dead_letter(self, message: dict, reason: str):
+        print(f"Dead-lettering message {message['MessageId']}: {reason}")
+        if not self.dead_letter_queue_url:
+            return
+        await self.aws.sqs_async.send_message(
+            QueueUrl=self.dead_letter_queue_url,
+            MessageBody=message["Body"],
+            MessageAttributes={"reason": {"DataType": "String", "StringValue": reason[:1000]}},
+        )
+
+    async def delete(self, messages: List[dict]):
+        if not messages:
+            return
+        response = await self.aws.sqs_async.delete_message_batch(
+            QueueUrl=self.queue_url,
+            Entries=[
+                {"Id": str(index), "ReceiptHandle": message["ReceiptHandle"]}
+                for index, message in enumerate(messages)
+            ],
+        )
+        for failure in response.get("Failed", []):
+            print(f"Error deleting message: {failure}")
+
+
+def create_worker(settings: config.Settings, aws: Optional[providers.Providers] = None) -> Worker:
+    if not settings.results_queue_url:
+        raise SystemExit("RESULTS_QUEUE_URL is not set")
+    # Closing a scholarship updates the counters and the API replicas' caches
+    hooks.install()
+    engine = database.get_engine(settings.database_url)
+    instrumentation.instrument_engine(engine)
+    return Worker(
+        aws or providers.from_settings(settings),
+        engine,
+        settings.results_queue_url,
+        dead_letter_queue_url=settings.dead_letter_queue_url,
+        concurrency=settings.worker_concurrency,
+        visibility_timeout=settings.worker_visibility_timeout,
+        max_receives=settings.worker_max_receives,
+        wait_time=settings.worker_wait_time,
+    )
+
+
+async def serve(settings: config.Settings):
+    worker = create_worker(settings)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+    print(f"Consuming {settings.results_queue_url}")
+    try:
+        await worker.run()
+    finally:
+        worker.aws.shutdown()
+
+
+def main():
+    settings = config.get_settings()
+    if settings.worker_metrics_port:
+        from prometheus_client import start_http_server
+
+        start_http_server(settings.worker_metrics_port)
+    asyncio.run(serve(settings))
+
+
+if __name__ == "__main__":
+    main()
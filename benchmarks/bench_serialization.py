@@ -0,0 +1,90 @@
+"""Micro-benchmark: FastAPI response_model serialization vs app.serialization.
+
+Run with:  python -m benchmarks.bench_serialization
+"""
+import asyncio
+import os
+import timeit
+from datetime import date, datetime, timedelta
+from typing import List
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+
+from app import models, schemas, serialization  # noqa: E402
+
+PAGE_SIZES = (10, 100, 1000)
+
+
+def build_scholarships(count: int) -> List[models.Scholarship]:
+    areas = [models.ScientificArea(id=i, name=f"Area {i}") for i in range(1, 6)]
+    jury = [models.Jury(id=f"juror-{i}", name=f"Juror {i}") for i in range(1, 4)]
+    scholarships = []
+    for i in range(1, count + 1):
+        edict = models.Edict(
+            id=i, name=f"Edict {i}", file_path=f"https://bucket/edict-{i}.pdf"
+        )
+        scholarship = models.Scholarship(
+            id=i,
+            name=f"Scholarship {i}",
+            description="Lorem ipsum dolor sit amet " * 4,
+            publisher="University of Aveiro",
+            type="Research",
+            spots=3,
+            deadline=date.today() + timedelta(days=i % 90),
+            created_at=datetime.now(),
+            status=models.ScholarshipStatus.open,
+            edict=edict,
+            scientific_areas=areas[: 1 + i % 3],
+            jury=jury,
+            documents=[
+                models.DocumentTemplate(
+                    id=i * 10 + d,
+                    scholarship_id=i,
+                    name=f"Document {d}",
+                    file_path=f"https://bucket/doc-{i}-{d}.pdf",
+                    required=True,
+                    template=d % 2 == 0,
+                )
+                for d in range(2)
+            ],
+        )
+        scholarships.append(scholarship)
+    return scholarships
+
+
+def current_path(field, scholarships) -> bytes:
+    content = asyncio.run(
+        serialize_response(field=field, response_content=scholarships)
+    )
+    return JSONResponse(content).body
+
+
+def fast_path(scholarships) -> bytes:
+    return serialization.scholarships_response(scholarships).body
+
+
+def main():
+    field = create_model_field(
+        name="Response", type_=List[schemas.Scholarship], mode="serialization"
+    )
+    print(f"{'page':>6} {'current (ms)':>14} {'fast (ms)':>12} {'speedup':>9}")
+    for size in PAGE_SIZES:
+        scholarships = build_scholarships(size)
+        number = max(1, 2000 // size)
+        current = min(
+            timeit.repeat(lambda: current_path(field, scholarships), number=number, repeat=5)
+        ) / number
+        fast = min(
+            timeit.repeat(lambda: fast_path(scholarships), number=number, repeat=5)
+        ) / number
+        print(
+            f"{size:>6} {current * 1000:>14.3f} {fast * 1000:>12.3f} {current / fast:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Cold-start benchmark: time to import app.main, run the lifespan and serve
+the first request, each run in a fresh interpreter.
+
+    python -m benchmarks.bench_startup --runs 10
+    python -m benchmarks.bench_startup --provider memory --warm
+
+No AWS calls are made with the default provider: the boto3 clients are built
+lazily and the health check does not need them.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+CHILD = r"""
+import json, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    started = time.perf_counter()
+    client.get("/scholarships/health")
+    served = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "lifespan": started - imported,
+    "first_request": served - started,
+    "total": served - start,
+}))
+"""
+
+
+def run_once(env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], env=env, check=True, capture_output=True, text=True
+    ).stdout
+    # The app prints warm-up progress; the timings are the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the service's cold start")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--provider", choices=["aws", "memory"], default="aws")
+    parser.add_argument("--database-url", help="Defaults to a temporary SQLite file")
+    parser.add_argument("--warm", action="store_true", help="Enable the JWKS and jury cache warm-ups")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "AWS_PROVIDER": args.provider,
+            "DATABASE_URL": args.database_url or f"sqlite:///{os.path.join(tmp, 'startup.db')}",
+            "SCHEDULER_ENABLED": "false",
+            "APPLICATION_FILES_DIR": os.path.join(tmp, "application_files"),
+            "EDICT_FILES_DIR": os.path.join(tmp, "edict_files"),
+        }
+        env.setdefault("REGION", "eu-west-1")
+        if args.warm:
+            env.update(WARM_JWKS="true", WARM_JURY_CACHE="true")
+
+        # The first run also fills the bytecode cache; it is not measured
+        run_once(env)
+        runs = [run_once(env) for _ in range(args.runs)]
+
+    print(f"{'phase':<16} {'median ms':>10} {'max ms':>10}")
+    for phase in ("import", "lifespan", "first_request", "total"):
+        samples = [run[phase] * 1000 for run in runs]
+        print(f"{phase:<16} {statistics.median(samples):>10.1f} {max(samples):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
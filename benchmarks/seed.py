@@ -0,0 +1,158 @@
+"""Seed a database with a realistic scholarship catalog for benchmarking.
+
+    python -m benchmarks.seed --database-url sqlite:///bench.db --count 10000
+"""
+import argparse
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, insert, text
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app import models
+
+AREAS = [
+    "Biology", "Chemistry", "Physics", "Mathematics", "Computer Science",
+    "Data Science", "Electronics", "Mechanical Engineering", "Civil Engineering",
+    "Economics", "Management", "Law", "Medicine", "Nursing", "Psychology",
+    "Sociology", "History", "Philosophy", "Languages", "Arts", "Music", "Design",
+    "Architecture", "Geology", "Oceanography", "Environmental Science",
+    "Materials Science", "Biotechnology", "Education", "Communication",
+]
+TYPES = ["Research", "Research Initiation", "Post-Doctoral", "Doctoral", "Exchange", "Merit"]
+PUBLISHERS = [f"Publisher {i}" for i in range(1, 41)]
+JURORS = 300
+BATCH_SIZE = 5000
+
+# Weights roughly matching a live catalog: most calls are closed or open
+STATUSES = [
+    (models.ScholarshipStatus.closed, 45),
+    (models.ScholarshipStatus.open, 25),
+    (models.ScholarshipStatus.jury_evaluation, 15),
+    (models.ScholarshipStatus.under_review, 10),
+    (models.ScholarshipStatus.draft, 5),
+]
+
+
+def _insert(db: Session, model, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.exec(insert(model), params=rows[start:start + BATCH_SIZE])
+
+
+def _advance_sequences(db: Session, *models_with_ids):
+    """Move PostgreSQL id sequences past the ids the seed assigned itself."""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for model in models_with_ids:
+        table = model.__tablename__
+        db.exec(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 0) + 1 FROM {table}), false)"
+        ))
+
+
+def seed(engine, count: int, random_seed: int = 42, past_deadlines: int = 0):
+    """Insert `count` scholarships with area, jury and document fan-out.
+
+    `past_deadlines` open scholarships get a deadline in the past, so the
+    deadline sweep has work to do.
+    """
+    rng = random.Random(random_seed)
+    SQLModel.metadata.create_all(engine)
+    statuses, weights = zip(*STATUSES)
+    today = date.today()
+    overdue = 0
+
+    with Session(engine) as db:
+        existing_areas = set(db.exec(select(models.ScientificArea.name)).all())
+        _insert(db, models.ScientificArea, [{"name": n} for n in AREAS if n not in existing_areas])
+        existing_jury = set(db.exec(select(models.Jury.id)).all())
+        _insert(db, models.Jury, [
+            {"id": f"bench-juror-{i}", "name": f"Juror {i}"}
+            for i in range(JURORS) if f"bench-juror-{i}" not in existing_jury
+        ])
+        area_ids = db.exec(select(models.ScientificArea.id)).all()
+        jury_ids = [f"bench-juror-{i}" for i in range(JURORS)]
+        first_id = (db.exec(select(func.max(models.Scholarship.id))).one() or 0) + 1
+        first_edict = (db.exec(select(func.max(models.Edict.id))).one() or 0) + 1
+        db.commit()
+
+        for chunk_start in range(0, count, BATCH_SIZE):
+            chunk = range(chunk_start, min(chunk_start + BATCH_SIZE, count))
+            edicts, scholarships, area_links, jury_links, documents = [], [], [], [], []
+            for i in chunk:
+                scholarship_id = first_id + i
+                edict_id = first_edict + i
+                status = rng.choices(statuses, weights)[0]
+                deadline = today + timedelta(days=rng.randint(-365, 180))
+                if status == models.ScholarshipStatus.open:
+                    deadline = today + timedelta(days=rng.randint(1, 180))
+                    if overdue < past_deadlines:
+                        deadline = today - timedelta(days=rng.randint(1, 30))
+                        overdue += 1
+                created_at = datetime.now() - timedelta(days=rng.randint(1, 700))
+                edicts.append({
+                    "id": edict_id,
+                    "name": f"Edict {scholarship_id}",
+                    "file_path": f"https://storage.bench/edicts/{scholarship_id}.pdf",
+                    "publication_date": created_at,
+                })
+                scholarships.append({
+                    "id": scholarship_id,
+                    "name": f"{rng.choice(TYPES)} scholarship {scholarship_id}",
+                    "description": "Benchmark scholarship description. " * rng.randint(1, 6),
+                    "publisher": rng.choice(PUBLISHERS),
+                    "type": rng.choice(TYPES),
+                    "spots": rng.randint(1, 10),
+                    "deadline": deadline,
+                    "created_at": created_at,
+                    "approved_at": (
+                        created_at + timedelta(days=rng.randint(1, 20))
+                        if status not in (models.ScholarshipStatus.draft, models.ScholarshipStatus.under_review)
+                        else None
+                    ),
+                    "edict_id": edict_id,
+                    "status": status,
+                })
+                for area_id in rng.sample(area_ids, rng.randint(1, 3)):
+                    area_links.append({"scholarship_id": scholarship_id, "scientific_area_id": area_id})
+                for jury_id in rng.sample(jury_ids, rng.randint(2, 4)):
+                    jury_links.append({"scholarship_id": scholarship_id, "jury_id": jury_id})
+                for d in range(rng.randint(1, 5)):
+                    template = d == 0 or rng.random() < 0.3
+                    documents.append({
+                        "scholarship_id": scholarship_id,
+                        "name": f"Document {d}",
+                        "file_path": f"https://storage.bench/docs/{scholarship_id}-{d}.pdf" if template else "",
+                        "required": rng.random() < 0.7,
+                        "template": template,
+                    })
+            _insert(db, models.Edict, edicts)
+            _insert(db, models.Scholarship, scholarships)
+            _insert(db, models.ScholarshipScientificAreaLink, area_links)
+            _insert(db, models.ScholarshipJuryLink, jury_links)
+            _insert(db, models.DocumentTemplate, documents)
+            db.commit()
+
+        _advance_sequences(db, models.Edict, models.Scholarship)
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a benchmark database")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///bench.db"))
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--past-deadlines", type=int, default=0)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    start = time.perf_counter()
+    seed(engine, args.count, args.seed, args.past_deadlines)
+    print(f"Seeded {args.count} scholarships in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
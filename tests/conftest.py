@@ -1,39 +1,148 @@
-# tests/conftest.py
 import os
-import tempfile
+from dataclasses import replace
 import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+# Requests over their query budget fail the test instead of only logging
+os.environ.setdefault("QUERY_BUDGET_MODE", "raise")
+# S3, SQS and Cognito are served by in-process fakes
+os.environ.setdefault("AWS_PROVIDER", "memory")
+# No deadline job running in the background of the tests
+os.environ.setdefault("SCHEDULER_ENABLED", "false")
+# Background jobs are run explicitly by the tests that need them
+os.environ.setdefault("JOBS_ENABLED", "false")
+
+
+def worker_database_url(url: str, worker: str) -> str:
+    """Give each pytest-xdist worker (gw0, gw1, ...) its own database."""
+    database_url = make_url(url)
+    if database_url.get_backend_name() == "sqlite":
+        if database_url.database in (None, "", ":memory:"):
+            return url
+        root, ext = os.path.splitext(database_url.database)
+        return database_url.set(database=f"{root}_{worker}{ext}").render_as_string(hide_password=False)
+
+    name = f"{database_url.database}_{worker}"
+    admin = create_engine(database_url, isolation_level="AUTOCOMMIT")
+    with admin.connect() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM pg_database WHERE datname = :name"), {"name": name}
+        ).scalar()
+        if not exists:
+            connection.execute(text(f'CREATE DATABASE "{name}"'))
+    admin.dispose()
+    return database_url.set(database=name).render_as_string(hide_password=False)
+
+
+# Must happen before app.database creates its engine
+if os.getenv("PYTEST_XDIST_WORKER") and os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = worker_database_url(
+        os.environ["DATABASE_URL"], os.environ["PYTEST_XDIST_WORKER"]
+    )
+
+from sqlalchemy import event
 from sqlmodel import SQLModel, Session
 from fastapi.testclient import TestClient
-from app.main import get_session
-from app.database import engine
+from app import config
+from app.main import create_app, get_engine, get_session, verify_token
+
+# The app is built once; tests only swap dependency overrides
+@pytest.fixture(name="app", scope="session")
+def app_fixture():
+    return create_app(replace(config.Settings.from_env(), scheduler_enabled=False))
 
-# Create a test database in memory
 @pytest.fixture(name="engine", scope="session")
-def engine_fixture():
+def engine_fixture(app):
+    engine = app.state.engine
+    if engine.dialect.name == "sqlite":
+        # pysqlite opens transactions lazily, which breaks SAVEPOINT; let
+        # SQLAlchemy emit BEGIN itself
+        @event.listens_for(engine, "connect")
+        def disable_pysqlite_transactions(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine, "begin")
+        def begin(connection):
+            connection.exec_driver_sql("BEGIN")
+
+        engine.dispose()
     SQLModel.metadata.create_all(engine)
     yield engine
     SQLModel.metadata.drop_all(engine)
 
-# Create a new session for each test
+# Each test runs inside a transaction that is rolled back at the end; commits
+# made by the code under test only release a SAVEPOINT
+@pytest.fixture(name="connection", scope="function")
+def connection_fixture(engine):
+    connection = engine.connect()
+    transaction = connection.begin()
+    yield connection
+    transaction.rollback()
+    connection.close()
+
 @pytest.fixture(name="session", scope="function")
-def session_fixture(engine):
-    with Session(engine) as session:
+def session_fixture(connection):
+    with Session(bind=connection, join_transaction_mode="create_savepoint") as session:
         yield session
 
-    session.rollback()
+# Insert a committed scholarship; any column can be overridden:
+#     create_scholarship(models.ScholarshipStatus.open, spots=3, jury=[juror])
+@pytest.fixture(name="create_scholarship", scope="function")
+def create_scholarship_fixture(session):
+    from app import models
+
+    def create(status, **fields):
+        scholarship = models.Scholarship(
+            name=fields.pop("name", "Test Scholarship"),
+            publisher=fields.pop("publisher", "University"),
+            type=fields.pop("type", "Research"),
+            spots=fields.pop("spots", 1),
+            status=status,
+            **fields,
+        )
+        session.add(scholarship)
+        session.commit()
+        session.refresh(scholarship)
+        return scholarship
 
-# Create a TestClient that uses the test session
+    return create
+
+@pytest.fixture(name="test_client", scope="session")
+def test_client_fixture(app, engine):
+    with TestClient(app) as client:
+        yield client
+
+# The TestClient with the app bound to the test transaction
 @pytest.fixture(name="client", scope="function")
-def client_fixture(session):
-    # Override the get_session dependency
+def client_fixture(app, test_client, connection, session):
     def get_session_override():
         yield session
 
-    from importlib import reload
-    import app.main
-    reload(app.main)
+    app.dependency_overrides[get_session] = get_session_override
+    # Sessions the app opens itself (streamed exports) join the same transaction
+    app.dependency_overrides[get_engine] = lambda: connection
+    test_client.cookies.clear()
+    # Cached details would outlive the rolled back rows, whose ids get reused
+    app.state.detail_cache.invalidate()
+    yield test_client
+    app.dependency_overrides.clear()
 
-    app.main.app.dependency_overrides[get_session] = get_session_override
-    with TestClient(app.main.app) as client:
-        yield client
-    app.main.app.dependency_overrides.clear()
+# A TestClient whose requests pass token verification as the given user
+@pytest.fixture(name="authorized_client", scope="function")
+def authorized_client_fixture(app, client):
+    app.dependency_overrides[verify_token] = lambda: {
+        "username": "test-user",
+        "sub": "test-user",
+    }
+    yield client
+
+# Count the SQL statements issued inside a block:
+#     with query_counter() as queries: ...
+#     assert queries.count <= 3
+@pytest.fixture(name="query_counter", scope="function")
+def query_counter_fixture(engine):
+    from app import instrumentation
+
+    instrumentation.instrument_engine(engine)
+    return instrumentation.count_queries
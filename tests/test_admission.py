@@ -0,0 +1,105 @@
+# tests/test_admission.py
+import asyncio
+from dataclasses import replace
+
+import httpx
+from fastapi import Body, FastAPI
+
+from app import config
+from app.admission import AdmissionMiddleware
+
+
+def make_app(**settings):
+    app = FastAPI()
+    app.state.release = None
+
+    @app.get("/slow")
+    async def slow():
+        await app.state.release.wait()
+        return {"ok": True}
+
+    @app.get("/fast")
+    async def fast():
+        return {"ok": True}
+
+    @app.post("/echo")
+    async def echo(data: dict = Body(...)):
+        return {"size": len(data["text"])}
+
+    @app.get("/scholarships/health")
+    async def health():
+        return {"status": "ok"}
+
+    limits = dict(
+        admission_reads_limit=1,
+        admission_reads_queue=1,
+        admission_queue_timeout=5.0,
+        admission_body_limit=100,
+    )
+    limits.update(settings)
+    app.add_middleware(AdmissionMiddleware, settings=replace(config.Settings.from_env(), **limits))
+    return app
+
+
+def run(app, scenario):
+    async def main():
+        app.state.release = asyncio.Event()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await scenario(client, app.state.release)
+
+    return asyncio.run(main())
+
+
+def test_saturated_class_is_shed_with_retry_after():
+    async def scenario(client, release):
+        running = asyncio.create_task(client.get("/slow"))
+        queued = asyncio.create_task(client.get("/fast"))
+        await asyncio.sleep(0.05)
+        rejected = await client.get("/fast")
+        # Exempt paths still answer
+        health = await client.get("/scholarships/health")
+        release.set()
+        return rejected, health, await running, await queued
+
+    rejected, health, running, queued = run(make_app(), scenario)
+    assert rejected.status_code == 503
+    assert rejected.headers["Retry-After"] == "5"
+    assert health.status_code == 200
+    assert running.status_code == 200
+    assert queued.status_code == 200
+
+
+def test_queued_requests_give_up_after_the_timeout():
+    async def scenario(client, release):
+        running = asyncio.create_task(client.get("/slow"))
+        await asyncio.sleep(0.05)
+        timed_out = await client.get("/fast")
+        release.set()
+        await running
+        # The slot is free again
+        return timed_out, await client.get("/fast")
+
+    timed_out, after = run(make_app(admission_queue_timeout=0.05), scenario)
+    assert timed_out.status_code == 503
+    assert after.status_code == 200
+
+
+def test_request_bodies_are_capped():
+    async def chunks():
+        for _ in range(5):
+            yield b'{"text": "' + b"x" * 40 + b'",'
+
+    async def scenario(client, release):
+        small = await client.post("/echo", json={"text": "x" * 10})
+        declared = await client.post("/echo", json={"text": "x" * 200})
+        # No Content-Length: counted while the body streams in
+        streamed = await client.post(
+            "/echo", content=chunks(), headers={"Content-Type": "application/json"}
+        )
+        return small, declared, streamed
+
+    small, declared, streamed = run(make_app(), scenario)
+    assert small.status_code == 200
+    assert declared.status_code == 413
+    assert streamed.status_code == 413
@@ -0,0 +1,108 @@
+# tests/test_bulk_import.py
+import asyncio
+import io
+import json
+import zipfile
+
+from sqlmodel import select
+
+from app import bulk_import, models
+
+
+def make_archive(*names):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name in names:
+            archive.writestr(name, b"%PDF-1.4 dummy")
+    buffer.seek(0)
+    return buffer
+
+
+def fake_upload(key, content):
+    return f"https://storage.test/{key}"
+
+
+def test_parse_csv_manifest():
+    manifest = (
+        b"name,publisher,type,spots,edict,scientific_areas,jury\n"
+        b"Import A,UA,Research,2,a.pdf,Biology; Physics,j1:Juror One\n"
+    )
+    rows = bulk_import.parse_manifest(manifest, "manifest.csv")
+    valid, errors = bulk_import.validate_rows(rows, zipfile.ZipFile(make_archive("a.pdf")))
+    assert errors == {}
+    assert valid[1].scientific_areas == ["Biology", "Physics"]
+    assert valid[1].jury[0].id == "j1"
+
+
+def test_validate_rows_reports_missing_files_and_fields():
+    rows = [
+        {"name": "No edict", "publisher": "UA", "type": "Research", "spots": 1, "edict": "missing.pdf"},
+        {"publisher": "UA", "type": "Research", "spots": 1, "edict": "a.pdf"},
+    ]
+    valid, errors = bulk_import.validate_rows(rows, zipfile.ZipFile(make_archive("a.pdf")))
+    assert valid == {}
+    assert "not found in archive" in errors[1][0]
+    assert errors[2][0].startswith("name")
+
+
+def test_import_proposals(session):
+    manifest = b"\n".join(
+        json.dumps(row).encode()
+        for row in [
+            {
+                "name": f"Imported {i}",
+                "publisher": "Import Publisher",
+                "type": "Research",
+                "spots": 1,
+                "edict": "edict.pdf",
+                "scientific_areas": ["Bulk Area"],
+                "jury": [{"id": "bulk-juror", "name": "Bulk Juror"}],
+                "documents": [{"name": "CV", "file": "cv.pdf", "template": True}],
+            }
+            for i in range(3)
+        ]
+        + [{"name": "Broken", "publisher": "Import Publisher", "type": "Research", "spots": "x", "edict": "edict.pdf"}]
+    )
+
+    report = asyncio.run(
+        bulk_import.import_proposals(
+            session, manifest, "manifest.ndjson", make_archive("edict.pdf", "cv.pdf"), fake_upload
+        )
+    )
+
+    assert report.created == 3
+    assert report.failed == 1
+    assert report.rows[3].status == "invalid"
+
+    scholarship = session.get(models.Scholarship, report.rows[0].scholarship_id)
+    assert [area.name for area in scholarship.scientific_areas] == ["Bulk Area"]
+    assert [juror.id for juror in scholarship.jury] == ["bulk-juror"]
+    assert scholarship.documents[0].file_path.startswith("https://storage.test/uploads/")
+    assert scholarship.documents[0].file_path.endswith("/cv.pdf")
+    areas = session.exec(
+        select(models.ScientificArea).where(models.ScientificArea.name == "Bulk Area")
+    ).all()
+    assert len(areas) == 1
+
+
+def test_files_with_the_same_name_get_distinct_keys(session):
+    manifest = b"\n".join(
+        json.dumps({
+            "name": f"Same name {folder}", "publisher": "P", "type": "Research", "spots": 1,
+            "edict": f"{folder}/edict.pdf",
+        }).encode()
+        for folder in ("a", "b")
+    )
+
+    report = asyncio.run(
+        bulk_import.import_proposals(
+            session, manifest, "manifest.ndjson", make_archive("a/edict.pdf", "b/edict.pdf"), fake_upload
+        )
+    )
+
+    assert report.created == 2
+    paths = {
+        session.get(models.Scholarship, row.scholarship_id).edict.file_path for row in report.rows
+    }
+    assert len(paths) == 2
+    assert all(path.endswith("/edict.pdf") for path in paths)
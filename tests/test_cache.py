@@ -0,0 +1,41 @@
+# tests/test_cache.py
+import time
+
+from app.cache import TTLCache
+
+
+def test_entries_expire():
+    cache = TTLCache(ttl=0.05)
+    cache.set("key", 1)
+    assert cache.get("key") == 1
+
+    time.sleep(0.06)
+    assert cache.get("key") is None
+
+
+def test_get_or_set_calls_the_factory_once():
+    cache = TTLCache(ttl=60)
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return "value"
+
+    assert cache.get_or_set("key", factory) == "value"
+    assert cache.get_or_set("key", factory) == "value"
+    assert len(calls) == 1
+
+    cache.invalidate("key")
+    cache.get_or_set("key", factory)
+    assert len(calls) == 2
+
+
+def test_maxsize_evicts_the_oldest_entry():
+    cache = TTLCache(ttl=60, maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+
+    assert len(cache) == 2
+    assert cache.get("a") is None
+    assert cache.get("c") == 3
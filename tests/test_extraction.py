@@ -0,0 +1,160 @@
+# tests/test_extraction.py
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, inspect, text, update
+
+from app import database, extraction, models, providers
+
+BUCKET = "test-bucket"
+
+
+def make_pdf(*pages: str) -> bytes:
+    """A minimal PDF with one line of Helvetica text per page."""
+    count = len(pages)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(count)), count),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, page in enumerate(pages):
+        stream = b"BT /F1 12 Tf 72 720 Td (%s) Tj ET" % page.encode()
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (5 + 2 * i)
+        )
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+
+    pdf, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return pdf
+
+
+def stored(aws, key: str, content: bytes) -> str:
+    aws.s3.put_object(Bucket=BUCKET, Key=key, Body=content)
+    return aws.s3.generate_presigned_url("get_object", Params={"Bucket": BUCKET, "Key": key})
+
+
+def test_extract_text_reads_every_page():
+    content, pages = extraction.extract_text(make_pdf("Call for applications", "Second page"), 1000)
+    assert pages == 2
+    assert "Call for applications" in content and "Second page" in content
+
+    assert extraction.extract_text(make_pdf("Call for applications"), 4) == ("Call", 1)
+
+
+def test_object_key_from_presigned_urls():
+    assert extraction.object_key("https://b.s3.amazonaws.com/edicts/a%20b.pdf?X-Amz-Signature=1", "b") == "edicts/a b.pdf"
+    assert extraction.object_key("https://s3.eu-west-1.amazonaws.com/b/edict.pdf?X-Amz-Signature=1", "b") == "edict.pdf"
+    assert extraction.object_key("", "b") is None
+
+
+def test_pending_files_are_extracted_retried_or_skipped(connection, session):
+    aws = providers.create_providers("memory", None, "")
+    edict = models.Edict(name="Edict", file_path=stored(aws, "edict.pdf", make_pdf("Research grant rules")))
+    missing = models.Edict(name="Missing", file_path=f"https://{BUCKET}.s3.memory.local/missing.pdf")
+    corrupt = models.Edict(name="Corrupt", file_path=stored(aws, "corrupt.pdf", b"%PDF-1.4 garbage"))
+    scholarship = models.Scholarship(name="S", publisher="P", type="Research", spots=1)
+    session.add_all([edict, missing, corrupt, scholarship])
+    session.commit()
+    no_file = models.DocumentTemplate(
+        scholarship_id=scholarship.id, name="CV", file_path="", required=True, template=False
+    )
+    word = models.DocumentTemplate(
+        scholarship_id=scholarship.id, name="Form", file_path=stored(aws, "form.docx", b"PK\x03\x04"),
+        required=True, template=True,
+    )
+    session.add_all([no_file, word])
+    session.commit()
+
+    # Threads stand in for worker processes; the pool is exercised below
+    with ThreadPoolExecutor(2) as executor:
+        extractor = extraction.Extractor(connection, aws, BUCKET, max_attempts=2, executor=executor)
+        assert extractor.run_batch() == 5
+        # The missing file is not due again until its retry delay has passed
+        assert extractor.run_batch() == 0
+
+    for record in (edict, missing, corrupt, no_file, word):
+        session.refresh(record)
+    assert (edict.extraction_status, edict.page_count) == (extraction.DONE, 1)
+    assert "Research grant rules" in edict.text_content
+    assert missing.extraction_status == extraction.PENDING
+    assert missing.extraction_attempts == 1
+    assert missing.extraction_next_at is not None and missing.extraction_error
+    assert corrupt.extraction_status == extraction.FAILED
+    assert no_file.extraction_status == extraction.SKIPPED
+    assert word.extraction_status == extraction.SKIPPED
+
+    # The last attempt gives up
+    missing.extraction_next_at = None
+    session.add(missing)
+    session.commit()
+    with ThreadPoolExecutor(1) as executor:
+        extraction.Extractor(connection, aws, BUCKET, max_attempts=2, executor=executor).run_until_idle()
+    session.refresh(missing)
+    assert missing.extraction_status == extraction.FAILED
+    assert missing.extraction_attempts == 2
+
+
+def test_process_pool_extracts_and_backfill_queues_old_rows(connection, session):
+    aws = providers.create_providers("memory", None, "")
+    old = models.Edict(name="Old", file_path=stored(aws, "old.pdf", make_pdf("Archived edict")))
+    session.add(old)
+    session.commit()
+    # As if created before extraction existed
+    session.exec(update(models.Edict).where(models.Edict.id == old.id).values(extraction_status=None))
+    session.commit()
+
+    assert extraction.backfill(connection) == {"edict": 1, "document": 0}
+    extractor = extraction.Extractor(connection, aws, BUCKET, processes=1)
+    try:
+        assert extractor.run_until_idle() == 1
+    finally:
+        extractor.shutdown()
+
+    session.refresh(old)
+    assert old.extraction_status == extraction.DONE
+    assert "Archived edict" in old.text_content
+
+
+def test_search_matches_extracted_text(client, session):
+    edict = models.Edict(name="Edict", file_path="", text_content="Candidates must hold a master's degree")
+    session.add(edict)
+    session.commit()
+    session.add_all([
+        models.Scholarship(
+            name="Searched", publisher="P", type="Research", spots=1,
+            status=models.ScholarshipStatus.open, edict_id=edict.id,
+        ),
+        models.Scholarship(name="Other", publisher="P", type="Research", spots=1, status=models.ScholarshipStatus.open),
+    ])
+    session.commit()
+
+    response = client.get("/scholarships", params={"q": "MASTER'S DEGREE", "view": "summary"})
+    assert response.status_code == 200
+    assert [s["name"] for s in response.json()] == ["Searched"]
+
+
+def test_create_all_adds_missing_columns(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE edict (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, "
+            "file_path VARCHAR NOT NULL, publication_date DATETIME NOT NULL)"
+        ))
+        connection.execute(text("INSERT INTO edict VALUES (1, 'Old', '', '2024-01-01 00:00:00')"))
+
+    database.create_all(engine)
+
+    columns = {column["name"] for column in inspect(engine).get_columns("edict")}
+    assert {"text_content", "page_count", "extraction_status", "extraction_attempts"} <= columns
+    with engine.connect() as connection:
+        row = connection.execute(text("SELECT extraction_status, extraction_attempts FROM edict")).one()
+    assert tuple(row) == (None, 0)
+    engine.dispose()
@@ -0,0 +1,146 @@
+# tests/test_idempotency.py
+import asyncio
+import json
+from dataclasses import replace
+
+from fastapi import HTTPException
+from sqlmodel import func, select
+from starlette.requests import Request
+
+from app import config, idempotency, main, models, serialization
+
+PROPOSAL = {"name": "Idempotent Scholarship", "publisher": "P", "type": "Research", "spots": "1"}
+
+
+def count_scholarships(session):
+    return session.exec(
+        select(func.count()).select_from(models.Scholarship).where(models.Scholarship.name == PROPOSAL["name"])
+    ).one()
+
+
+def test_retried_proposal_is_created_once(authorized_client, session):
+    s3 = authorized_client.app.state.aws.s3
+
+    def post(key="retry-1", **data):
+        return authorized_client.post(
+            "/scholarships/proposals",
+            data={**PROPOSAL, **data},
+            files={"edict_file": ("edict.pdf", b"%PDF-1.4 edict", "application/pdf")},
+            headers={"Idempotency-Key": key},
+        )
+
+    first = post()
+    assert first.status_code == 200
+    objects = len(s3.objects)
+
+    retry = post()
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert count_scholarships(session) == 1
+    # Nothing uploaded again
+    assert len(s3.objects) == objects
+
+    # The same key for another request is refused
+    assert post(spots="2").status_code == 422
+
+
+def test_failed_request_releases_its_key(authorized_client, session):
+    headers = {"Idempotency-Key": "retry-2"}
+    # No edict: rejected before anything is written
+    response = authorized_client.post("/scholarships/proposals", data=PROPOSAL, headers=headers)
+    assert response.status_code == 400
+
+    response = authorized_client.post(
+        "/scholarships/proposals",
+        data={**PROPOSAL, "description": "fixed"},
+        files={"edict_file": ("edict.pdf", b"%PDF-1.4 edict", "application/pdf")},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert "Idempotent-Replayed" not in response.headers
+    assert count_scholarships(session) == 1
+
+
+def test_failed_document_step_leaves_no_proposal_behind(authorized_client, session, monkeypatch):
+    create_document = main.create_document
+    failures = []
+
+    async def failing_once(*args, **kwargs):
+        if not failures:
+            failures.append(True)
+            raise HTTPException(status_code=500, detail="Storage unavailable")
+        return await create_document(*args, **kwargs)
+
+    monkeypatch.setattr(main, "create_document", failing_once)
+    edicts = session.exec(select(func.count()).select_from(models.Edict)).one()
+
+    def post():
+        return authorized_client.post(
+            "/scholarships/proposals",
+            data={**PROPOSAL, "document_name": "CV", "document_template": "false"},
+            files={"edict_file": ("edict.pdf", b"%PDF-1.4 edict", "application/pdf")},
+            headers={"Idempotency-Key": "retry-3"},
+        )
+
+    # The document fails after the scholarship and edict were written
+    assert post().status_code == 500
+    # As closing the request's own session does
+    session.rollback()
+    assert count_scholarships(session) == 0
+
+    response = post()
+    assert response.status_code == 200
+    assert [document["name"] for document in response.json()["documents"]] == ["CV"]
+    assert count_scholarships(session) == 1
+    assert session.exec(select(func.count()).select_from(models.Edict)).one() == edicts + 1
+
+
+def json_request(body: dict) -> Request:
+    content = json.dumps(body).encode()
+
+    async def receive():
+        return {"type": "http.request", "body": content, "more_body": False}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/scholarships/uploads",
+        "headers": [(b"content-type", b"application/json")],
+        "query_string": b"",
+    }
+    return Request(scope, receive)
+
+
+def test_concurrent_duplicate_waits_for_the_first_request(connection):
+    settings = replace(config.Settings.from_env(), idempotency_wait_timeout=5)
+
+    async def scenario():
+        first = await idempotency.claim(json_request({"a": 1, "b": 2}), connection, "user", "k", settings)
+        # Same JSON in another key order: the same request
+        duplicate = asyncio.create_task(
+            idempotency.claim(json_request({"b": 2, "a": 1}), connection, "user", "k", settings)
+        )
+        await asyncio.sleep(0.1)
+        assert not duplicate.done()
+        await first.complete(serialization.ORJSONResponse({"created": 1}, status_code=201))
+        try:
+            await duplicate
+        except idempotency.Replay as e:
+            return e.response
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 201
+    assert json.loads(response.body) == {"created": 1}
+    assert response.headers[idempotency.REPLAYED_HEADER] == "true"
+
+
+def test_abandoned_claims_are_taken_over(connection):
+    settings = replace(config.Settings.from_env(), idempotency_wait_timeout=0, idempotency_lock_timeout=0)
+
+    async def scenario():
+        await idempotency.claim(json_request({"a": 1}), connection, "user", "k", settings)
+        # The first request's process died: its claim has expired
+        return await idempotency.claim(json_request({"a": 1}), connection, "user", "k", settings)
+
+    assert asyncio.run(scenario()).key == "k"
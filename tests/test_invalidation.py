@@ -0,0 +1,96 @@
+# tests/test_invalidation.py
+import json
+
+from app import cache, details, invalidation, models, worker
+
+
+def recorder(entity):
+    evicted = []
+    invalidation.register(entity, evicted.append)
+    return evicted
+
+
+def test_events_are_delivered_on_commit_only(session):
+    evicted = recorder("test-commit")
+
+    # Events are published from inside a transaction, alongside the change
+    session.connection()
+    invalidation.publish(session, "test-commit", [1, 2])
+    session.rollback()
+    assert evicted == []
+
+    invalidation.publish(session, "test-commit", [3, None])
+    assert evicted == []
+    session.commit()
+    assert evicted == [[3]]
+
+
+def test_listener_applies_remote_events():
+    evicted = recorder("test-remote")
+    listener = invalidation.Listener(engine=None)
+
+    listener.handle(json.dumps({"origin": "other-replica", "events": [["test-remote", 7, 0], ["test-remote", 8, 0]]}))
+    # Events this process published were already applied locally
+    listener.handle(json.dumps({"origin": invalidation.ORIGIN, "events": [["test-remote", 9, 0]]}))
+    listener.handle("not json")
+
+    assert evicted == [[7, 8]]
+
+
+def test_scholarship_changes_evict_cached_details(client, session):
+    scholarship = models.Scholarship(
+        name="Cached", publisher="P", type="Research", spots=1, status=models.ScholarshipStatus.open
+    )
+    session.add(scholarship)
+    session.commit()
+    assert client.get(f"/scholarships/{scholarship.id}/details").json()["name"] == "Cached"
+
+    scholarship.name = "Renamed"
+    session.add(scholarship)
+    session.commit()
+    assert client.app.state.detail_cache.get(scholarship.id) is None
+    assert client.get(f"/scholarships/{scholarship.id}/details").json()["name"] == "Renamed"
+
+    # A remote event clears the entry just the same
+    assert client.app.state.detail_cache.get(scholarship.id) is not None
+    invalidation.Listener(engine=None).handle(
+        json.dumps({"origin": "other-replica", "events": [["scholarship", scholarship.id, 0]]})
+    )
+    assert client.app.state.detail_cache.get(scholarship.id) is None
+
+
+def test_details_loaded_before_an_invalidation_are_not_cached(session, monkeypatch):
+    scholarship = models.Scholarship(
+        name="Racing", publisher="P", type="Research", spots=1, status=models.ScholarshipStatus.open
+    )
+    session.add(scholarship)
+    session.commit()
+    detail_cache = cache.TTLCache(ttl=60)
+    load = details.load
+
+    def load_then_change(db, ids):
+        loaded = load(db, ids)
+        # Another request commits a change while these rows are being encoded
+        details.evict(detail_cache, ids)
+        return loaded
+
+    monkeypatch.setattr(details, "load", load_then_change)
+    assert scholarship.id in details.get_many(detail_cache, session, [scholarship.id])
+    assert detail_cache.get(scholarship.id) is None
+
+
+def test_worker_transitions_publish_invalidations(session):
+    juror = models.Jury(id="worker-juror", name="Juror")
+    scholarship = models.Scholarship(
+        name="Evaluated", publisher="P", type="Research", spots=1,
+        status=models.ScholarshipStatus.jury_evaluation, jury=[juror],
+    )
+    session.add(scholarship)
+    session.commit()
+    scholarships, jurors = recorder("scholarship"), recorder("juror")
+
+    # The same events are sent with NOTIFY to the API replicas on PostgreSQL
+    worker.handle_jury_results(session, {"type": "jury_results", "scholarship_id": scholarship.id})
+
+    assert scholarships == [[scholarship.id]]
+    assert jurors == [["worker-juror"]]
@@ -0,0 +1,183 @@
+# tests/test_jobs.py
+import json
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+from sqlmodel import select
+
+from app import jobs, models
+
+ran = []
+
+
+@jobs.handler("test-record")
+def record(db, payload, state):
+    ran.append(payload["name"])
+
+
+@jobs.handler("test-flaky")
+def flaky(db, payload, state):
+    # Writes of a failed attempt are rolled back with it
+    jobs.enqueue(db, "test-record", {"name": "lost"})
+    raise RuntimeError("temporary failure")
+
+
+@jobs.handler("test-chain")
+def chain(db, payload, state):
+    jobs.enqueue(db, "test-record", {"name": "follow-up"})
+
+
+def job_rows(session, kind):
+    session.expire_all()
+    return session.exec(select(models.Job).where(models.Job.kind == kind).order_by(models.Job.id)).all()
+
+
+def test_jobs_run_once_committed_by_priority(connection, session):
+    ran.clear()
+    jobs.enqueue(session, "test-record", {"name": "rolled back"})
+    session.rollback()
+
+    jobs.enqueue(session, "test-record", {"name": "low"})
+    jobs.enqueue(session, "test-record", {"name": "high"}, priority=10)
+    jobs.enqueue(session, "test-record", {"name": "later"}, run_at=datetime.now() + timedelta(hours=1))
+    session.commit()
+
+    assert jobs.Runner(connection).run_pending() == 2
+    assert ran == ["high", "low"]
+    assert [job.status for job in job_rows(session, "test-record")] == [jobs.DONE, jobs.DONE, jobs.QUEUED]
+
+
+def test_failed_jobs_are_retried_then_given_up(connection, session):
+    ran.clear()
+    jobs.enqueue(session, "test-flaky", {}, max_attempts=2)
+    session.commit()
+    runner = jobs.Runner(connection, retry_delay=0)
+
+    assert runner.run_pending() == 2
+    job = job_rows(session, "test-flaky")[0]
+    assert (job.status, job.attempts) == (jobs.FAILED, 2)
+    assert "temporary failure" in job.last_error
+    assert job_rows(session, "test-record") == []
+
+
+def test_handlers_enqueue_follow_up_work(connection, session):
+    ran.clear()
+    jobs.enqueue(session, "test-chain", {})
+    session.commit()
+
+    assert jobs.Runner(connection).run_pending() == 2
+    assert ran == ["follow-up"]
+
+
+def test_lost_jobs_are_claimed_again(connection, session):
+    ran.clear()
+    jobs.enqueue(session, "test-record", {"name": "lost worker"})
+    session.commit()
+    runner = jobs.Runner(connection, visibility_timeout=0)
+    # Claimed by a worker that died before finishing it
+    assert runner.claim() is not None
+
+    assert runner.run_pending() == 1
+    assert ran == ["lost worker"]
+    assert job_rows(session, "test-record")[0].attempts == 2
+
+
+def test_bulk_review_notifies_in_the_background(authorized_client, session, connection, monkeypatch):
+    state = authorized_client.app.state
+    monkeypatch.setattr(state, "settings", replace(state.settings, review_queue_url="memory://reviews"))
+    scholarship = models.Scholarship(
+        name="Reviewed", publisher="P", type="Research", spots=1, status=models.ScholarshipStatus.under_review
+    )
+    session.add(scholarship)
+    session.commit()
+    sqs = authorized_client.app.state.aws.sqs
+    sent = sum(len(messages) for messages in sqs.queues.values())
+
+    response = authorized_client.put(
+        "/scholarships/secretary/status/bulk",
+        json={"scholarship_ids": [scholarship.id], "accepted": True},
+    )
+    assert response.status_code == 200
+    # Nothing was sent on the request path
+    assert sum(len(messages) for messages in sqs.queues.values()) == sent
+
+    assert jobs.Runner(connection, state=authorized_client.app.state).run_pending() == 1
+    assert sum(len(messages) for messages in sqs.queues.values()) == sent + 1
+
+
+def test_overrunning_workers_do_not_overwrite_the_new_claim(connection, session):
+    jobs.enqueue(session, "test-chain", {})
+    session.commit()
+    runner = jobs.Runner(connection, visibility_timeout=0)
+    stale = runner.claim()
+    # The first worker overran the visibility timeout; another one took over
+    current = runner.claim()
+    runner.execute(current)
+
+    runner.execute(stale)
+
+    job = job_rows(session, "test-chain")[0]
+    assert (job.status, job.attempts) == (jobs.DONE, 2)
+    # The stale run's follow-up job was undone with it
+    assert len(job_rows(session, "test-record")) == 1
+
+
+def test_only_failed_sqs_messages_are_sent_again(authorized_client, session, connection, monkeypatch):
+    from app import main
+
+    state = authorized_client.app.state
+    sqs = state.aws.sqs
+    send_message_batch = sqs.send_message_batch
+    sent = []
+
+    def flaky_batch(QueueUrl, Entries, **kwargs):
+        # Message 1 fails the first time
+        entries = [entry for entry in Entries if entry["Id"] != "1" or sent]
+        sent.extend(json.loads(entry["MessageBody"])["n"] for entry in entries)
+        response = send_message_batch(QueueUrl=QueueUrl, Entries=entries)
+        response.setdefault("Failed", []).extend(
+            {"Id": entry["Id"], "Code": "InternalError"} for entry in Entries if entry not in entries
+        )
+        return response
+
+    monkeypatch.setattr(sqs, "send_message_batch", flaky_batch)
+    main.queue_sqs_messages(session, [{"n": n} for n in range(12)])
+    session.commit()
+
+    assert jobs.Runner(connection, state=state, retry_delay=0).run_pending() == 2
+    assert sorted(sent) == list(range(12))
+    job = job_rows(session, "sqs_messages")[-1]
+    assert job.status == jobs.DONE
+    assert json.loads(job.payload) == {"queue": "jury", "messages": [{"n": 1}]}
+
+
+def test_single_and_bulk_reviews_send_the_same_event(authorized_client, session, connection, monkeypatch):
+    state = authorized_client.app.state
+    monkeypatch.setattr(state, "settings", replace(state.settings, review_queue_url="memory://reviews"))
+    single, bulk = (
+        models.Scholarship(
+            name="Reviewed", publisher="P", type="Research", spots=1, status=models.ScholarshipStatus.under_review
+        )
+        for _ in range(2)
+    )
+    session.add_all([single, bulk])
+    session.commit()
+
+    response = authorized_client.put(
+        "/scholarships/secretary/status", params={"scholarship_id": single.id, "accepted": True}
+    )
+    assert response.status_code == 200
+    response = authorized_client.put(
+        "/scholarships/secretary/status/bulk", json={"scholarship_ids": [bulk.id], "accepted": True}
+    )
+    assert response.status_code == 200
+    jobs.Runner(connection, state=state).run_pending()
+
+    events = [json.loads(message.body) for message in state.aws.sqs.queues["memory://reviews"][-2:]]
+    assert [event["scholarship_id"] for event in events] == [single.id, bulk.id]
+    for event in events:
+        assert event.keys() == {"event", "scholarship_id", "status", "reviewed_by", "reviewed_at"}
+        assert (event["event"], event["status"]) == ("scholarship_reviewed", "Open")
+    # The jury queue's consumer never sees review events
+    jury_queue = state.aws.sqs.queues.get(state.settings.queue_url, [])
+    assert not any("event" in json.loads(message.body) for message in jury_queue)
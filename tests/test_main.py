@@ -1,7 +1,9 @@
 # tests/test_main.py
+import json
 import os
 
 from starlette.datastructures import MultiDict
+from sqlmodel import select
 
 def test_create_dummy_scholarships(client):
     response = client.post("/scholarships/dummy")
@@ -415,3 +417,337 @@ def test_upload_invalid_file(client):
     data = response.json()
     assert response.status_code == 400
     assert "Invalid filename." in data["detail"]
+
+def test_get_scholarships_fast_serialization(client):
+    response = client.get("/scholarships", params={"limit": 5})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert isinstance(response.json(), list)
+
+def test_openapi_documents_every_scholarship_list_shape(client):
+    schema = client.get("/openapi.json").json()
+    responses = schema["paths"]["/scholarships"]["get"]["responses"]
+    shapes = responses["200"]["content"]["application/json"]["schema"]["anyOf"]
+    refs = [shape["items"].get("$ref") for shape in shapes]
+    assert refs[:2] == ["#/components/schemas/Scholarship", "#/components/schemas/ScholarshipSummary"]
+    assert "ScholarshipSummary" in schema["components"]["schemas"]
+
+def test_export_scholarships_csv(client):
+    response = client.get("/scholarships/export", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    header = response.text.splitlines()[0]
+    assert header.startswith("id,name,description,publisher")
+
+def test_export_scholarships_ndjson(client, session):
+    from app import models
+
+    area = models.ScientificArea(name="Export Area")
+    exported = [
+        models.Scholarship(
+            name=f"Exported {i}", publisher="P", type="Research", spots=1,
+            status=models.ScholarshipStatus.open, scientific_areas=[area],
+        )
+        for i in range(2)
+    ]
+    session.add_all(exported)
+    session.commit()
+
+    response = client.get("/scholarships/export", params={"format": "ndjson", "name": "Exported"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 2
+    assert sorted(row["id"] for row in rows) == sorted(scholarship.id for scholarship in exported)
+    assert all(row["scientific_areas"] == ["Export Area"] for row in rows)
+
+def test_export_scholarships_invalid_format(client):
+    response = client.get("/scholarships/export", params={"format": "xml"})
+    assert response.status_code == 422
+
+def test_bulk_review_proposals(authorized_client, session, create_scholarship):
+    from app import models
+
+    pending = [create_scholarship(models.ScholarshipStatus.under_review) for _ in range(2)]
+    already_open = create_scholarship(models.ScholarshipStatus.open)
+    ids = [pending[0].id, already_open.id, 999999, pending[1].id]
+
+    response = authorized_client.put(
+        "/scholarships/secretary/status/bulk",
+        json={"scholarship_ids": ids, "accepted": True},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["updated"] == 2
+    assert [result["id"] for result in data["results"]] == ids
+    assert [result["success"] for result in data["results"]] == [True, False, False, True]
+    assert data["results"][2]["detail"] == "Scholarship not found"
+
+    session.expire_all()
+    scholarship = session.get(models.Scholarship, pending[0].id)
+    assert scholarship.status == models.ScholarshipStatus.open
+    assert scholarship.approved_at is not None
+
+def test_get_scholarships_under_review_paginated(authorized_client, create_scholarship):
+    from app import models
+
+    for _ in range(3):
+        create_scholarship(models.ScholarshipStatus.under_review)
+
+    response = authorized_client.get(
+        "/scholarships/secretary/under_review", params={"page": 1, "limit": 2}
+    )
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+    assert all(s["status"] == "Under Review" for s in response.json())
+
+def test_jury_dashboard_is_scoped_to_the_caller(authorized_client, create_scholarship):
+    from app import models
+
+    juror = models.Jury(id="test-user", name="Test User")
+    other = models.Jury(id="other-juror", name="Other Juror")
+    evaluating = create_scholarship(models.ScholarshipStatus.jury_evaluation, jury=[juror])
+    create_scholarship(models.ScholarshipStatus.open, jury=[juror])
+    create_scholarship(models.ScholarshipStatus.jury_evaluation, jury=[other])
+    authorized_client.app.state.dashboard_cache.invalidate()
+
+    response = authorized_client.get("/scholarships/jury/dashboard", params={"status": "Jury Evaluation"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["counts"] == {"Jury Evaluation": 1, "Open": 1}
+    assert data["total"] == 1
+    assert [a["id"] for a in data["assignments"]] == [evaluating.id]
+
+    # Other jurors' assignments are off limits through the old endpoint too
+    assert authorized_client.get("/scholarships/jury/other-juror").status_code == 403
+    assert authorized_client.get("/scholarships/jury/test-user").status_code == 200
+
+def test_jury_dashboard_cache_follows_status_changes(
+    authorized_client, session, query_counter, create_scholarship
+):
+    from app import models, transitions
+
+    juror = models.Jury(id="test-user", name="Test User")
+    scholarship = create_scholarship(models.ScholarshipStatus.jury_evaluation, jury=[juror])
+    authorized_client.app.state.dashboard_cache.invalidate()
+
+    assert authorized_client.get("/scholarships/jury/dashboard").json()["counts"] == {"Jury Evaluation": 1}
+    with query_counter() as queries:
+        authorized_client.get("/scholarships/jury/dashboard")
+    assert queries.count == 0
+
+    transitions.transition(session, [scholarship.id], models.ScholarshipStatus.closed)
+    session.commit()
+
+    assert authorized_client.get("/scholarships/jury/dashboard").json()["counts"] == {"Closed": 1}
+    authorized_client.app.state.dashboard_cache.invalidate()
+
+def test_create_proposal_from_presigned_uploads(authorized_client):
+    response = authorized_client.post(
+        "/scholarships/uploads",
+        json={"files": [
+            {"filename": "My Edict.pdf", "content_type": "application/pdf", "size": 100},
+            {"filename": "../form.docx", "content_type": "application/msword", "size": 50},
+        ]},
+    )
+    assert response.status_code == 200
+    edict, form = response.json()
+    assert edict["key"].startswith("uploads/") and edict["key"].endswith("/My_Edict.pdf")
+    assert form["key"].endswith("/form.docx")
+    assert edict["fields"]["Content-Type"] == "application/pdf"
+    assert '["content-length-range", 1, 100]' in edict["fields"]["policy"]
+
+    # The client uploads straight to S3
+    s3, bucket = authorized_client.app.state.aws.s3, authorized_client.app.state.settings.s3_bucket_name
+    s3.put_object(Bucket=bucket, Key=edict["key"], Body=b"x" * 100, ContentType="application/pdf")
+    s3.put_object(Bucket=bucket, Key=form["key"], Body=b"x" * 50, ContentType="application/msword")
+
+    data = {
+        "name": "Presigned Scholarship", "publisher": "P", "type": "Research", "spots": "1",
+        "edict_key": edict["key"], "document_key": form["key"],
+        "document_name": "Form", "document_template": "true",
+    }
+    response = authorized_client.post("/scholarships/proposals", data=data)
+    assert response.status_code == 200
+    assert response.json()["edict"]["name"] == "My_Edict"
+    assert edict["key"] in response.json()["edict"]["file_path"]
+    assert form["key"] in response.json()["documents"][0]["file_path"]
+
+    # Keys that were never uploaded, or outside the uploads prefix, are rejected
+    for key in ("uploads/missing/edict.pdf", "other/edict.pdf"):
+        response = authorized_client.post("/scholarships/proposals", data={**data, "edict_key": key})
+        assert response.status_code == 400
+
+def test_presigned_uploads_enforce_limits(authorized_client):
+    s3, bucket = authorized_client.app.state.aws.s3, authorized_client.app.state.settings.s3_bucket_name
+
+    response = authorized_client.post(
+        "/scholarships/uploads",
+        json={"files": [{"filename": "run.exe", "content_type": "application/x-msdownload", "size": 10}]},
+    )
+    assert response.status_code == 400
+    response = authorized_client.post(
+        "/scholarships/uploads",
+        json={"files": [{"filename": "big.pdf", "content_type": "application/pdf", "size": 10**12}]},
+    )
+    assert response.status_code == 400
+
+    # An object whose stored type differs from the declared one is refused
+    key = authorized_client.post(
+        "/scholarships/uploads",
+        json={"files": [{"filename": "edict.pdf", "content_type": "application/pdf", "size": 10}]},
+    ).json()[0]["key"]
+    s3.put_object(Bucket=bucket, Key=key, Body=b"x" * 10, ContentType="text/html")
+    response = authorized_client.post(
+        "/scholarships/proposals",
+        data={"name": "N", "publisher": "P", "type": "T", "spots": "1", "edict_key": key},
+    )
+    assert response.status_code == 400
+
+def test_update_proposal_diffs_relationships(authorized_client, session, create_scholarship):
+    from app import models, stats
+
+    physics = models.ScientificArea(name="Diff Physics")
+    biology = models.ScientificArea(name="Diff Biology")
+    kept, dropped = models.Jury(id="kept-juror", name="Kept"), models.Jury(id="dropped-juror", name="Dropped")
+    session.add(models.Jury(id="new-juror", name="New"))
+    scholarship = create_scholarship(
+        models.ScholarshipStatus.draft, scientific_areas=[physics, biology], jury=[kept, dropped]
+    )
+    replaced = models.DocumentTemplate(
+        scholarship_id=scholarship.id, name="Form", file_path="", required=False, template=False
+    )
+    removed = models.DocumentTemplate(
+        scholarship_id=scholarship.id, name="Old", file_path="", required=False, template=False
+    )
+    session.add_all([replaced, removed])
+    session.commit()
+
+    response = authorized_client.put(
+        f"/scholarships/proposals/{scholarship.id}",
+        data={
+            "type": "Innovation",
+            "scientific_areas": ["Diff Physics", "Diff Chemistry"],
+            "jury": ["kept-juror", "new-juror"],
+            "document_id": [str(replaced.id), ""],
+            "document_name": ["Renamed Form", "Added"],
+            "document_required": ["true", "false"],
+            "document_template": ["false", "false"],
+            "remove_document_id": [str(removed.id)],
+        },
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert sorted(area["name"] for area in data["scientific_areas"]) == ["Diff Chemistry", "Diff Physics"]
+    assert sorted(juror["id"] for juror in data["jury"]) == ["kept-juror", "new-juror"]
+    assert sorted((d["id"], d["name"], d["required"]) for d in data["documents"]) == [
+        (replaced.id, "Renamed Form", True),
+        (max(d["id"] for d in data["documents"]), "Added", False),
+    ]
+
+    incremental = stats.read(session)
+    stats.recompute(session)
+    assert stats.read(session) == incremental
+
+    # Unknown jurors and documents are rejected before anything changes
+    for data in ({"jury": ["missing-juror"]}, {"remove_document_id": ["999999"]}):
+        response = authorized_client.put(f"/scholarships/proposals/{scholarship.id}", data=data)
+        assert response.status_code == 404
+
+def test_failed_update_changes_nothing(authorized_client, session, monkeypatch, create_scholarship):
+    from fastapi import HTTPException
+
+    from app import main, models
+
+    scholarship = create_scholarship(models.ScholarshipStatus.draft)
+    edicts = len(session.exec(select(models.Edict)).all())
+
+    async def failing_upload(*args):
+        raise HTTPException(status_code=500, detail="Error uploading file")
+
+    monkeypatch.setattr(main, "uploaded_file_url", failing_upload)
+    response = authorized_client.put(
+        f"/scholarships/proposals/{scholarship.id}",
+        data={"name": "Half Updated", "document_name": ["Form"], "document_template": ["true"],
+              "document_required": ["true"]},
+        files={
+            "edict_file": ("edict.pdf", b"edict content", "application/pdf"),
+            "document_file": ("form.pdf", b"form content", "application/pdf"),
+        },
+    )
+    assert response.status_code == 500
+
+    session.rollback()
+    session.expire_all()
+    scholarship = session.get(models.Scholarship, scholarship.id)
+    assert (scholarship.name, scholarship.edict_id) == ("Test Scholarship", None)
+    assert len(session.exec(select(models.Edict)).all()) == edicts
+
+def test_get_scholarships_summary_view(client, query_counter, create_scholarship):
+    from app import models
+
+    area = models.ScientificArea(name="Summary Area")
+    create_scholarship(models.ScholarshipStatus.open, name="Summary Card", scientific_areas=[area])
+
+    with query_counter() as queries:
+        response = client.get("/scholarships", params={"view": "summary", "name": "Summary Card"})
+    assert response.status_code == 200
+    assert response.json() == [{
+        "id": response.json()[0]["id"],
+        "name": "Summary Card",
+        "type": "Research",
+        "deadline": None,
+        "status": "Open",
+        "scientific_areas": ["Summary Area"],
+    }]
+    # One query for the columns, one for the area names
+    assert queries.count == 2
+
+def test_get_scholarships_sparse_fields(client, query_counter, create_scholarship):
+    from app import models
+
+    juror = models.Jury(id="fields-juror", name="Fields Juror")
+    create_scholarship(models.ScholarshipStatus.open, name="Sparse", spots=3, jury=[juror])
+
+    with query_counter() as queries:
+        response = client.get("/scholarships", params={"fields": "name,spots,jury", "name": "Sparse"})
+    assert response.status_code == 200
+    [row] = response.json()
+    assert set(row) == {"id", "name", "spots", "jury"}
+    assert row["jury"] == [{"id": "fields-juror", "name": "Fields Juror"}]
+    assert queries.count == 2
+
+    response = client.get("/scholarships", params={"fields": "name,password"})
+    assert response.status_code == 400
+
+def test_get_scholarships_batch(client, session, query_counter, create_scholarship):
+    from app import models, transitions
+
+    first = create_scholarship(models.ScholarshipStatus.open, name="Batch A")
+    second = create_scholarship(models.ScholarshipStatus.open, name="Batch B")
+    # Warm the cache for one of them
+    assert client.get(f"/scholarships/{second.id}/details").status_code == 200
+
+    with query_counter() as queries:
+        response = client.get("/scholarships/batch", params={"ids": f"{second.id},999999,{first.id}"})
+    assert response.status_code == 200
+    assert [(item["id"], item["found"]) for item in response.json()] == [
+        (second.id, True), (999999, False), (first.id, True)
+    ]
+    assert response.json()[2]["scholarship"]["name"] == "Batch A"
+    assert response.json()[1]["scholarship"] is None
+    # The cold ids are loaded with one IN query plus one per relationship
+    assert queries.count == 5
+
+    with query_counter() as queries:
+        client.get("/scholarships/batch", params={"ids": [first.id, second.id]})
+    assert queries.count == 0
+
+    # Committed changes drop the cached entries
+    transitions.transition(session, [first.id], models.ScholarshipStatus.jury_evaluation)
+    session.commit()
+    response = client.get(f"/scholarships/{first.id}/details")
+    assert response.json()["status"] == "Jury Evaluation"
+
+    assert client.get("/scholarships/batch", params={"ids": "1,x"}).status_code == 400
+    assert client.get("/scholarships/batch", params={"ids": ",".join(["1"] * 101)}).status_code == 400
@@ -0,0 +1,72 @@
+# tests/test_metrics.py
+import time
+
+
+def test_metrics_endpoint_reports_route_templates(client):
+    client.get("/scholarships/9999/details")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'route="/scholarships/{id}/details"' in body
+    assert "http_request_db_queries_bucket" in body
+
+
+def test_request_query_count_is_recorded(client):
+    from app import metrics
+
+    client.get("/scholarships/filters")
+    count = metrics.REQUEST_QUERIES.labels("/scholarships/filters")._sum.get()
+    assert count >= 4
+
+
+def test_query_counter_fixture(client, query_counter):
+    with query_counter() as queries:
+        client.get("/scholarships/filters")
+    assert queries.count == 4
+
+
+def test_query_budget_fails_request_in_tests(client, monkeypatch):
+    import pytest
+
+    from app import instrumentation
+
+    monkeypatch.setitem(instrumentation.QUERY_BUDGETS, "/scholarships/filters", 1)
+    with pytest.raises(instrumentation.QueryBudgetExceeded):
+        client.get("/scholarships/filters")
+
+
+def test_slow_query_is_logged(client, monkeypatch, caplog):
+    from app import instrumentation
+
+    monkeypatch.setattr(instrumentation, "SLOW_QUERY_MS", 0)
+    with caplog.at_level("WARNING", logger="app.instrumentation"):
+        client.get("/scholarships/filters")
+    assert any(
+        "Slow query" in record.message and "/scholarships/filters" in record.message
+        for record in caplog.records
+    )
+
+
+def test_failed_statements_do_not_skew_timings(engine):
+    from sqlalchemy import text
+    from sqlalchemy.exc import DBAPIError
+
+    from app import instrumentation
+
+    timings = []
+    callback = instrumentation.on_query(lambda statement, parameters, elapsed, stats: timings.append(elapsed))
+    try:
+        with engine.connect() as connection:
+            for _ in range(3):
+                try:
+                    connection.execute(text("SELECT * FROM no_such_table"))
+                except DBAPIError:
+                    connection.rollback()
+            start = time.perf_counter()
+            connection.execute(text("SELECT 1"))
+            assert timings and timings[-1] <= time.perf_counter() - start
+            assert "query_start_time" not in connection.info
+    finally:
+        instrumentation._query_callbacks.remove(callback)
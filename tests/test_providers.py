@@ -0,0 +1,148 @@
+# tests/test_providers.py
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from app import providers
+
+QUEUE_URL = "memory://queue"
+
+
+def test_queue_is_fifo_and_batches():
+    queue = providers.InMemoryQueue()
+    queue.send_message_batch(
+        QueueUrl=QUEUE_URL,
+        Entries=[{"Id": str(i), "MessageBody": json.dumps({"n": i})} for i in range(10)],
+    )
+    queue.send_message(QueueUrl=QUEUE_URL, MessageBody=json.dumps({"n": 10}))
+
+    received = queue.receive_message(QueueUrl=QUEUE_URL, MaxNumberOfMessages=10)["Messages"]
+    assert [json.loads(m["Body"])["n"] for m in received] == list(range(10))
+
+    # In-flight messages stay hidden until deleted or their visibility expires
+    rest = queue.receive_message(QueueUrl=QUEUE_URL, MaxNumberOfMessages=10)["Messages"]
+    assert [json.loads(m["Body"])["n"] for m in rest] == [10]
+
+    queue.delete_message_batch(
+        QueueUrl=QUEUE_URL,
+        Entries=[{"Id": m["MessageId"], "ReceiptHandle": m["ReceiptHandle"]} for m in received],
+    )
+    queue.change_message_visibility(
+        QueueUrl=QUEUE_URL, ReceiptHandle=rest[0]["ReceiptHandle"], VisibilityTimeout=0
+    )
+    again = queue.receive_message(QueueUrl=QUEUE_URL)["Messages"]
+    assert again[0]["Attributes"]["ApproximateReceiveCount"] == "2"
+
+
+def test_object_store_round_trip():
+    store = providers.InMemoryObjectStore()
+    store.put_object(Bucket="bucket", Key="edict.pdf", Body=b"pdf", ContentType="application/pdf")
+
+    assert store.head_object(Bucket="bucket", Key="edict.pdf")["ContentLength"] == 3
+    assert store.get_object(Bucket="bucket", Key="edict.pdf")["Body"].read() == b"pdf"
+    with pytest.raises(ClientError):
+        store.head_object(Bucket="bucket", Key="missing.pdf")
+
+
+def test_providers_are_built_on_first_use():
+    aws = providers.create_providers("aws", "eu-west-1", "https://example.com/jwks.json")
+    assert aws._clients == {}
+
+    s3 = aws.s3
+    assert aws.s3 is s3
+    assert list(aws._clients) == ["s3"]
+
+
+def test_user_pool_tokens_are_accepted_by_the_api(app, client):
+    app.state.jury_members_cache.invalidate()
+    pool = app.state.aws.user_pool
+    pool.add_user("proposer", groups=("proposers",))
+    pool.add_user("juror-1", "Juror One", groups=("jury",))
+    token = pool.issue_token("proposer")
+
+    response = client.get(
+        "/scholarships/jury-members", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert response.json() == [{"id": "juror-1", "name": "Juror One"}]
+
+    response = client.get(
+        "/scholarships/jury-members", headers={"Authorization": "Bearer not-a-token"}
+    )
+    assert response.status_code == 401
+
+
+def test_lifespan_warms_up_jwks_and_jury_members(app, engine):
+    from dataclasses import replace
+    from fastapi.testclient import TestClient
+
+    from app import main
+
+    warm_app = main.create_app(
+        replace(app.state.settings, warm_jwks=True, warm_jury_cache=True)
+    )
+    warm_app.state.aws.user_pool.add_user("juror-2", "Juror Two", groups=("jury",))
+
+    with TestClient(warm_app):
+        members = warm_app.state.jury_members_cache.get("jury")
+        assert {"id": "juror-2", "name": "Juror Two"} in [m.model_dump() for m in members]
+
+
+def test_botocore_config_uses_adaptive_retries_and_pool_size():
+    aws = providers.create_providers(
+        "aws", "eu-west-1", "https://example.com/jwks.json", max_pool_connections=20, max_attempts=4
+    )
+    config = aws.botocore_config()
+
+    assert config.max_pool_connections == 20
+    assert config.retries == {"max_attempts": 4, "mode": "adaptive"}
+    assert aws.s3.meta.config.max_pool_connections == 20
+
+
+def test_async_clients_run_on_the_aws_thread_pool():
+    import asyncio
+    import threading
+
+    aws = providers.create_providers("memory", None, "")
+    threads = []
+    original = aws.s3.put_object
+
+    def put_object(**kwargs):
+        threads.append(threading.current_thread().name)
+        return original(**kwargs)
+
+    aws.s3.put_object = put_object
+
+    async def upload():
+        await asyncio.gather(
+            *(aws.s3_async.put_object(Bucket="bucket", Key=f"{i}.pdf", Body=b"pdf") for i in range(5))
+        )
+
+    asyncio.run(upload())
+    aws.shutdown()
+
+    assert len(aws.s3.objects) == 5
+    assert all(name.startswith("aws") for name in threads)
+
+
+def test_apps_use_the_settings_they_are_built_with(app):
+    from dataclasses import replace
+    from fastapi.testclient import TestClient
+
+    from app import main
+
+    other = main.create_app(
+        replace(app.state.settings, s3_bucket_name="other-bucket", detail_cache_ttl=1, jury_dashboard_ttl=2)
+    )
+    assert other.state.aws is not app.state.aws
+    assert (other.state.detail_cache.ttl, other.state.dashboard_cache.ttl) == (1, 2)
+    other.dependency_overrides[main.verify_token] = lambda: {"username": "u", "sub": "u"}
+
+    with TestClient(other) as client:
+        response = client.post(
+            "/scholarships/uploads",
+            json={"files": [{"filename": "edict.pdf", "content_type": "application/pdf", "size": 10}]},
+        )
+    assert response.status_code == 200
+    assert response.json()[0]["url"] == "https://other-bucket.s3.memory.local/"
@@ -0,0 +1,70 @@
+# tests/test_singleflight.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.singleflight import Group
+
+
+def start_leader(group, key, release, result=b"result", error=None):
+    """Run a call for `key` in a thread, blocked until `release` is set."""
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        if error:
+            raise error
+        return result
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    future = pool.submit(group.do, key, slow)
+    started.wait(5)
+    pool.shutdown(wait=False)
+    return future
+
+
+def test_concurrent_calls_share_one_computation():
+    group, release = Group(), threading.Event()
+    leader = start_leader(group, "key", release)
+    calls = []
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        followers = [pool.submit(group.do, "key", lambda: calls.append(1)) for _ in range(5)]
+        other = group.do("other", lambda: b"other")
+        # Let the followers reach the in-flight call before it finishes
+        time.sleep(0.1)
+        release.set()
+        assert [f.result(5) for f in followers] == [b"result"] * 5
+
+    assert leader.result(5) == b"result"
+    assert other == b"other"
+    assert calls == []
+    assert len(group) == 0
+    # Once finished, the next call computes again
+    assert group.do("key", lambda: b"fresh") == b"fresh"
+
+
+def test_waiters_give_up_after_the_timeout():
+    group, release = Group(timeout=0.05), threading.Event()
+    leader = start_leader(group, "key", release)
+
+    assert group.do("key", lambda: b"own") == b"own"
+    release.set()
+    assert leader.result(5) == b"result"
+
+
+def test_errors_are_shared():
+    group, release = Group(), threading.Event()
+    leader = start_leader(group, "key", release, error=LookupError("missing"))
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        follower = pool.submit(group.do, "key", lambda: b"unused")
+        time.sleep(0.1)
+        release.set()
+        with pytest.raises(LookupError):
+            follower.result(5)
+    with pytest.raises(LookupError):
+        leader.result(5)
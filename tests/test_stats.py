@@ -0,0 +1,84 @@
+# tests/test_stats.py
+from datetime import date, datetime, timedelta
+
+from app import models, stats, transitions
+
+Status = models.ScholarshipStatus
+
+
+def test_incremental_counters_match_a_full_recompute(session, create_scholarship):
+    physics = models.ScientificArea(name="Stats Physics")
+    biology = models.ScientificArea(name="Stats Biology")
+    next_week = date.today() + timedelta(days=7)
+    reviewed = create_scholarship(Status.under_review, scientific_areas=[physics], spots=2, deadline=next_week)
+    edited = create_scholarship(Status.under_review, scientific_areas=[physics, biology], type="Innovation")
+    removed = create_scholarship(Status.draft, scientific_areas=[biology], spots=5)
+    create_scholarship(
+        Status.open, scientific_areas=[biology], publisher="Institute", spots=2, deadline=next_week
+    )
+
+    reviewed.created_at = datetime.now() - timedelta(hours=30)
+    session.add(reviewed)
+    session.commit()
+    transitions.transition(session, [reviewed.id], Status.open)
+    transitions.transition(session, [edited.id], Status.draft)
+    session.commit()
+
+    session.refresh(edited)
+    edited.type = "Research"
+    edited.spots = 4
+    edited.scientific_areas.remove(biology)
+    session.add(edited)
+    session.delete(removed)
+    session.commit()
+
+    incremental = stats.read(session)
+    stats.recompute(session)
+    session.commit()
+    assert stats.read(session) == incremental
+
+    assert incremental.total == 3
+    assert incremental.by_status == {Status.open.value: 2, Status.draft.value: 1}
+    assert incremental.by_type == {"Research": 3}
+    assert incremental.by_publisher == {"University": 2, "Institute": 1}
+    assert incremental.by_area == {"Stats Physics": 2, "Stats Biology": 1}
+    assert incremental.spots_offered == 4
+    assert [(w.week_start, w.count) for w in incremental.upcoming_deadlines] == [
+        (stats.week_start(next_week), 2)
+    ]
+    assert incremental.median_approval_hours == 30
+
+
+def test_histogram_median():
+    assert stats.histogram_median([]) is None
+    assert stats.histogram_median([(3, 1)]) == 3
+    assert stats.histogram_median([(1, 1), (5, 1)]) == 3
+    assert stats.histogram_median([(1, 2), (2, 1), (10, 1)]) == 1.5
+
+
+def test_stats_endpoint(authorized_client, query_counter, create_scholarship):
+    create_scholarship(Status.open, spots=2)
+
+    with query_counter() as queries:
+        response = authorized_client.get("/scholarships/stats")
+    assert response.status_code == 200
+    assert response.json()["by_status"] == {"Open": 1}
+    assert response.json()["spots_offered"] == 2
+    # One read of the summary table, regardless of catalog size
+    assert queries.count == 1
+
+
+def test_stats_after_deadline_update(authorized_client, create_scholarship):
+    scholarship = create_scholarship(Status.open)
+    deadline = date.today() + timedelta(days=14)
+
+    response = authorized_client.put(
+        f"/scholarships/proposals/{scholarship.id}", data={"deadline": deadline.isoformat()}
+    )
+    assert response.status_code == 200
+
+    response = authorized_client.get("/scholarships/stats")
+    assert response.status_code == 200
+    assert {"week_start": stats.week_start(deadline).isoformat(), "count": 1} in response.json()[
+        "upcoming_deadlines"
+    ]
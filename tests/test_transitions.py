@@ -0,0 +1,54 @@
+# tests/test_transitions.py
+import pytest
+from sqlmodel import select
+
+from app import models, transitions
+
+Status = models.ScholarshipStatus
+
+
+def test_transition_stamps_and_records_history(session, create_scholarship):
+    scholarship = create_scholarship(Status.under_review)
+
+    moved = transitions.transition(session, [scholarship.id], Status.open, changed_by="secretary")
+    session.commit()
+
+    assert moved == [scholarship.id]
+    session.refresh(scholarship)
+    assert scholarship.status == Status.open
+    assert scholarship.approved_at is not None
+    history = session.exec(
+        select(models.ScholarshipStatusHistory).where(
+            models.ScholarshipStatusHistory.scholarship_id == scholarship.id
+        )
+    ).all()
+    assert [(h.from_status, h.to_status, h.changed_by) for h in history] == [
+        (Status.under_review, Status.open, "secretary")
+    ]
+
+
+def test_transition_skips_rows_not_in_expected_status(session, create_scholarship):
+    scholarship = create_scholarship(Status.draft)
+
+    # draft -> open is not an allowed move
+    assert transitions.transition(session, [scholarship.id], Status.open) == []
+    with pytest.raises(transitions.InvalidTransition) as e:
+        transitions.transition_one(session, scholarship.id, Status.open)
+    assert e.value.current == Status.draft
+
+
+def test_transition_is_compare_and_swap(session, create_scholarship):
+    scholarship = create_scholarship(Status.open)
+
+    first = transitions.transition(session, [scholarship.id], Status.jury_evaluation)
+    second = transitions.transition(session, [scholarship.id], Status.jury_evaluation)
+    session.commit()
+
+    assert first == [scholarship.id]
+    assert second == []
+
+
+def test_transition_one_not_found(session):
+    with pytest.raises(transitions.InvalidTransition) as e:
+        transitions.transition_one(session, 987654, Status.open)
+    assert e.value.current is None
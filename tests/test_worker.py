@@ -0,0 +1,114 @@
+# tests/test_worker.py
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+from app import models, providers, stats
+from app.worker import Worker
+
+Status = models.ScholarshipStatus
+
+RESULTS_QUEUE = "memory://results"
+DEAD_LETTER_QUEUE = "memory://results-dlq"
+
+
+def make_worker(connection, **options):
+    aws = providers.create_providers("memory", None, "")
+    # Handlers share the test connection, so they must not overlap
+    worker = Worker(
+        aws, connection, RESULTS_QUEUE, DEAD_LETTER_QUEUE, concurrency=1, wait_time=0, **options
+    )
+    return aws, worker
+
+
+def send(aws, *bodies):
+    for body in bodies:
+        aws.sqs.send_message(QueueUrl=RESULTS_QUEUE, MessageBody=json.dumps(body))
+
+
+def test_results_close_scholarships_idempotently(connection, session, create_scholarship):
+    evaluated = create_scholarship(Status.jury_evaluation)
+    aws, worker = make_worker(connection)
+    # The second message is a duplicate delivery
+    send(aws, *[{"type": "jury_results", "scholarship_id": evaluated.id}] * 2)
+
+    asyncio.run(worker.run(stop_when_empty=True))
+
+    session.refresh(evaluated)
+    assert evaluated.status == Status.closed
+    assert evaluated.results_at is not None
+    assert aws.sqs.queues[RESULTS_QUEUE] == []
+    assert aws.sqs.queues.get(DEAD_LETTER_QUEUE, []) == []
+
+
+def test_failing_messages_are_retried_then_dead_lettered(connection, session, create_scholarship):
+    still_open = create_scholarship(Status.open)
+    aws, worker = make_worker(connection, visibility_timeout=0, max_receives=2)
+    send(aws, {"scholarship_id": still_open.id}, {"scholarship_id": 999999}, {"type": "unknown"})
+
+    asyncio.run(worker.run(stop_when_empty=True))
+
+    # Unknown scholarships and message types are dead-lettered at once; the
+    # open scholarship is retried until max_receives
+    assert aws.sqs.queues[RESULTS_QUEUE] == []
+    dead = [json.loads(m.body) for m in aws.sqs.queues[DEAD_LETTER_QUEUE]]
+    assert {"scholarship_id": still_open.id} in dead
+    assert len(dead) == 3
+    session.refresh(still_open)
+    assert still_open.status == Status.open
+
+
+def test_stop_finishes_the_current_batch(connection, session, create_scholarship):
+    evaluated = create_scholarship(Status.jury_evaluation)
+    aws, worker = make_worker(connection)
+    send(aws, {"scholarship_id": evaluated.id})
+
+    async def run():
+        messages = await worker.receive()
+        worker.stop()
+        await worker.process_batch(messages)
+        await worker.run()
+
+    asyncio.run(run())
+
+    session.refresh(evaluated)
+    assert evaluated.status == Status.closed
+    assert aws.sqs.queues[RESULTS_QUEUE] == []
+
+
+def test_closing_updates_the_statistics(connection, session, create_scholarship):
+    evaluated = create_scholarship(Status.jury_evaluation)
+    before = stats.read(session).by_status
+    aws, worker = make_worker(connection)
+    send(aws, {"scholarship_id": evaluated.id})
+
+    asyncio.run(worker.run(stop_when_empty=True))
+
+    after = stats.read(session).by_status
+    assert after.get(Status.closed.value, 0) == before.get(Status.closed.value, 0) + 1
+    assert after.get(Status.jury_evaluation.value, 0) == before.get(Status.jury_evaluation.value, 0) - 1
+
+
+def test_worker_installs_the_transaction_hooks():
+    # A fresh interpreter: importing the API in the tests installed them already
+    code = (
+        "from dataclasses import replace\n"
+        "from sqlalchemy import event\n"
+        "from sqlalchemy.orm import Session\n"
+        "from app import config, details, jobs, jury, stats, transitions, worker\n"
+        "assert not event.contains(Session, 'after_commit', jobs._after_commit)\n"
+        "worker.create_worker(replace(config.Settings.from_env(), results_queue_url='memory://results'))\n"
+        "hooks = (stats._status_changed, details._status_changed, jury._status_changed)\n"
+        "print(all(hook in transitions._listeners for hook in hooks)\n"
+        "      and event.contains(Session, 'after_commit', jobs._after_commit))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        env={**os.environ, "DATABASE_URL": "sqlite:///:memory:"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "True"